@@ -1,24 +1,192 @@
+import asyncio
+import functools
 import sqlite3
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
 
 
 _PROJECT_ROOT = Path(__file__).resolve().parent
 DB_PATH = Path(os.getenv("SAVVFASTAPI_DB_PATH", str(_PROJECT_ROOT / "savvfastapi.db")))
 
+# Connection tuning applied to every connection (pooled or not).
+# cache_size is negative => KiB, so -16000 is a ~16 MB page cache per connection.
+_CONNECTION_PRAGMAS = (
+	"PRAGMA journal_mode=WAL",
+	"PRAGMA synchronous=NORMAL",
+	"PRAGMA cache_size=-16000",
+	"PRAGMA temp_store=MEMORY",
+	"PRAGMA busy_timeout=5000",
+)
+# sqlite3 keeps compiled statements per connection; helpers below use constant SQL
+# strings so a long-lived pooled connection re-uses the prepared statements.
+_STATEMENT_CACHE_SIZE = 256
+
+# One long-lived connection per thread (uvicorn worker threads, script main thread).
+_pool_local = threading.local()
+_pool_lock = threading.Lock()
+_pool_connections: List[sqlite3.Connection] = []
+_pool_generation = 0
+
+# Dedicated worker threads for DB calls made from async handlers (see run_db).
+DB_EXECUTOR_WORKERS = int(os.getenv("SAVVFASTAPI_DB_WORKERS", "8"))
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_executor_lock = threading.Lock()
+
+T = TypeVar("T")
+
 
 def set_db_path(path: Union[str, Path]) -> None:
 	global DB_PATH
 	DB_PATH = Path(path)
+	close_connection_pool()
 
 
-def get_connection() -> sqlite3.Connection:
-	conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+def _open_connection() -> sqlite3.Connection:
+	conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=_STATEMENT_CACHE_SIZE)
 	conn.row_factory = sqlite3.Row
+	for pragma in _CONNECTION_PRAGMAS:
+		conn.execute(pragma)
+	return conn
+
+
+def get_connection() -> sqlite3.Connection:
+	"""
+	Open a new, caller-owned connection (the caller must close it).
+	"""
+	return _open_connection()
+
+
+def get_pooled_connection() -> sqlite3.Connection:
+	"""
+	Return the long-lived connection of the current thread, opening it on first use.
+	Callers must NOT close it; use `with conn:` for commit/rollback.
+	"""
+	conn = getattr(_pool_local, "conn", None)
+	if conn is not None and getattr(_pool_local, "generation", None) == _pool_generation:
+		return conn
+
+	conn = _open_connection()
+	with _pool_lock:
+		_pool_connections.append(conn)
+		_pool_local.conn = conn
+		_pool_local.generation = _pool_generation
 	return conn
 
 
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+	"""
+	Unit of work on this thread's pooled connection.
+
+	Insert helpers called inside the block join this transaction, so several
+	rows (e.g. setpallet request + response + log) share one commit; any
+	exception rolls all of them back. Nested blocks join the outer one.
+	"""
+	conn = get_pooled_connection()
+	if conn.in_transaction:
+		yield conn
+		return
+	conn.execute("BEGIN")
+	try:
+		yield conn
+	except BaseException:
+		conn.rollback()
+		raise
+	conn.commit()
+
+
+def close_connection_pool() -> None:
+	"""
+	Close all pooled connections (DB path change, app shutdown).
+	Threads transparently reopen a connection on their next call.
+	"""
+	global _pool_generation
+	with _pool_lock:
+		_pool_generation += 1
+		conns = list(_pool_connections)
+		_pool_connections.clear()
+	for conn in conns:
+		try:
+			conn.close()
+		except sqlite3.Error:
+			pass
+
+
+def fix_mojibake_text(value: str) -> str:
+	"""
+	Fix UTF-8 text that was decoded as latin-1/cp1252, which appears as
+	sequences like 'Ð¡ÑÑ ...'.
+
+	Only lossless repairs are applied: the text must re-encode strictly to
+	bytes that are strictly valid UTF-8. Anything else is returned unchanged,
+	since the repaired value is written back to the database.
+	"""
+	if not isinstance(value, str):
+		return value
+	if "Ð" not in value and "Ñ" not in value:
+		return value
+	for encoding in ("cp1252", "latin1"):
+		try:
+			fixed = value.encode(encoding).decode("utf-8")
+		except UnicodeError:
+			continue
+		if any("\u0400" <= ch <= "\u04FF" for ch in fixed):
+			return fixed
+	return value
+
+
+def fix_palletes_scan_text(
+	id_point: str,
+	sscc: str,
+	details: str,
+	status: str,
+	result: str,
+	msg: str,
+) -> Tuple[str, str, str, str, str, str]:
+	"""
+	Normalize a palletes_scan row's text columns for writing. SSCC is kept
+	verbatim: clients look rows up by the exact SSCC they sent.
+	"""
+	return (
+		fix_mojibake_text(id_point),
+		sscc,
+		fix_mojibake_text(details),
+		fix_mojibake_text(status),
+		fix_mojibake_text(result),
+		fix_mojibake_text(msg),
+	)
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+	global _db_executor
+	if _db_executor is None:
+		with _db_executor_lock:
+			if _db_executor is None:
+				_db_executor = ThreadPoolExecutor(max_workers=max(1, DB_EXECUTOR_WORKERS), thread_name_prefix="db")
+	return _db_executor
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+	"""
+	Run a blocking DB helper on the DB worker threads and await the result,
+	so async handlers never block the event loop on SQLite.
+	"""
+	loop = asyncio.get_running_loop()
+	return await loop.run_in_executor(_get_db_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_db_executor() -> None:
+	global _db_executor
+	with _db_executor_lock:
+		executor, _db_executor = _db_executor, None
+	if executor is not None:
+		executor.shutdown(wait=True)
+
+
 def _ensure_table_schema(conn: sqlite3.Connection, table: str, create_sql: str) -> None:
 	"""
 	SQLite doesn't apply schema changes for existing tables when using
@@ -29,6 +197,7 @@ def _ensure_table_schema(conn: sqlite3.Connection, table: str, create_sql: str)
 	exists = cur.fetchone() is not None
 	if not exists:
 		conn.execute(create_sql)
+		_reset_schema_version(conn)
 		return
 
 	# Compare existing column names to expected column names.
@@ -68,6 +237,92 @@ def _ensure_table_schema(conn: sqlite3.Connection, table: str, create_sql: str)
 		select_sql = ", ".join(select_exprs)
 		conn.execute(f"INSERT INTO {table} ({insert_cols}) SELECT {select_sql} FROM {tmp}")
 	conn.execute(f"DROP TABLE {tmp}")
+	# Rebuilt tables lose their indexes; re-run the migrations.
+	_reset_schema_version(conn)
+
+
+def _normalize_palletes_scan_text(conn: sqlite3.Connection) -> None:
+	"""
+	Repair mojibake in existing palletes_scan rows once, so reads need no re-decoding.
+	"""
+	cols = ("IDPoint", "Details", "Status", "Result", "Msg")
+	suspect = " OR ".join(f"instr({c}, 'Ð') > 0 OR instr({c}, 'Ñ') > 0" for c in cols)
+	rows = conn.execute(f"SELECT id, {', '.join(cols)} FROM palletes_scan WHERE {suspect}").fetchall()
+	for row in rows:
+		fixed = [fix_mojibake_text(row[c]) for c in cols]
+		if fixed != [row[c] for c in cols]:
+			conn.execute(
+				f"UPDATE palletes_scan SET {', '.join(f'{c} = ?' for c in cols)} WHERE id = ?",
+				(*fixed, row["id"]),
+			)
+
+
+# Schema migrations applied once per database, tracked in PRAGMA user_version.
+# Entry N (1-based) upgrades a database from version N-1 to N; steps (SQL strings
+# or callables taking the connection) must be idempotent because a table rebuild
+# resets the version to 0.
+_SCHEMA_MIGRATIONS: Tuple[Tuple[Union[str, Callable[[sqlite3.Connection], None]], ...], ...] = (
+	# 1: palletes_scan lookups by SSCC / Status, newest first (ORDER BY id DESC).
+	(
+		"CREATE INDEX IF NOT EXISTS idx_palletes_scan_sscc_id ON palletes_scan(SSCC, id)",
+		"CREATE INDEX IF NOT EXISTS idx_palletes_scan_status_id ON palletes_scan(Status, id)",
+	),
+	# 2: per-SSCC change counter maintained by triggers, so caches can detect
+	# palletes_scan writes from any process (API, ingest/analyze scripts).
+	(
+		"""
+		CREATE TABLE IF NOT EXISTS palletes_scan_changes (
+			SSCC TEXT PRIMARY KEY,
+			version INTEGER NOT NULL
+		)
+		""",
+		"""
+		CREATE TRIGGER IF NOT EXISTS trg_palletes_scan_changes_insert AFTER INSERT ON palletes_scan
+		BEGIN
+			INSERT INTO palletes_scan_changes(SSCC, version) VALUES (NEW.SSCC, 1)
+			ON CONFLICT(SSCC) DO UPDATE SET version = version + 1;
+		END
+		""",
+		"""
+		CREATE TRIGGER IF NOT EXISTS trg_palletes_scan_changes_update AFTER UPDATE ON palletes_scan
+		BEGIN
+			INSERT INTO palletes_scan_changes(SSCC, version) VALUES (OLD.SSCC, 1)
+			ON CONFLICT(SSCC) DO UPDATE SET version = version + 1;
+			INSERT INTO palletes_scan_changes(SSCC, version) VALUES (NEW.SSCC, 1)
+			ON CONFLICT(SSCC) DO UPDATE SET version = version + 1;
+		END
+		""",
+		"""
+		CREATE TRIGGER IF NOT EXISTS trg_palletes_scan_changes_delete AFTER DELETE ON palletes_scan
+		BEGIN
+			INSERT INTO palletes_scan_changes(SSCC, version) VALUES (OLD.SSCC, 1)
+			ON CONFLICT(SSCC) DO UPDATE SET version = version + 1;
+		END
+		""",
+	),
+	# 3: text is normalized on write; repair rows stored before that.
+	(_normalize_palletes_scan_text,),
+)
+SCHEMA_VERSION = len(_SCHEMA_MIGRATIONS)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+	return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def _reset_schema_version(conn: sqlite3.Connection) -> None:
+	conn.execute("PRAGMA user_version = 0")
+
+
+def _apply_schema_migrations(conn: sqlite3.Connection) -> None:
+	version = get_schema_version(conn)
+	for target, statements in enumerate(_SCHEMA_MIGRATIONS[version:], start=version + 1):
+		for statement in statements:
+			if callable(statement):
+				statement(conn)
+			else:
+				conn.execute(statement)
+		conn.execute(f"PRAGMA user_version = {target}")
 
 
 def init_db() -> None:
@@ -165,6 +420,7 @@ def init_db() -> None:
 			);
 			""",
 		)
+		_apply_schema_migrations(conn)
 		conn.commit()
 	finally:
 		conn.close()
@@ -178,8 +434,7 @@ def insert_log(
 	client_ip: Optional[str],
 	user_agent: Optional[str],
 ) -> None:
-	conn = get_connection()
-	try:
+	with transaction() as conn:
 		conn.execute(
 			"""
 			INSERT INTO request_logs(method, path, status_code, duration_ms, client_ip, user_agent)
@@ -187,58 +442,66 @@ def insert_log(
 			""",
 			(method, path, status_code, duration_ms, client_ip, user_agent),
 		)
-		conn.commit()
-	finally:
-		conn.close()
 
 
-def fetch_logs(limit: int = 50) -> Iterable[Tuple]:
-	conn = get_connection()
-	try:
-		cur = conn.execute(
+def insert_logs(rows: Iterable[Tuple]) -> int:
+	"""
+	Bulk-insert request log rows in one transaction.
+	Each row is (method, path, status_code, duration_ms, client_ip, user_agent).
+	"""
+	rows = list(rows)
+	if not rows:
+		return 0
+	with transaction() as conn:
+		conn.executemany(
 			"""
-			SELECT id, method, path, status_code, duration_ms, client_ip, user_agent, created_at
-			FROM request_logs
-			ORDER BY id DESC
-			LIMIT ?
+			INSERT INTO request_logs(method, path, status_code, duration_ms, client_ip, user_agent)
+			VALUES (?, ?, ?, ?, ?, ?)
 			""",
-			(limit,),
+			rows,
+		)
+	return len(rows)
+
+
+def fetch_logs(limit: int = 50) -> Iterable[Tuple]:
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"""
+		SELECT id, method, path, status_code, duration_ms, client_ip, user_agent, created_at
+		FROM request_logs
+		ORDER BY id DESC
+		LIMIT ?
+		""",
+		(limit,),
+	)
+	for row in cur.fetchall():
+		yield (
+			row["id"],
+			row["method"],
+			row["path"],
+			row["status_code"],
+			row["duration_ms"],
+			row["client_ip"],
+			row["user_agent"],
+			row["created_at"],
 		)
-		for row in cur.fetchall():
-			yield (
-				row["id"],
-				row["method"],
-				row["path"],
-				row["status_code"],
-				row["duration_ms"],
-				row["client_ip"],
-				row["user_agent"],
-				row["created_at"],
-			)
-	finally:
-		conn.close()
 
 
 # Insert helpers for endpoint payloads
 
 def insert_set_pallet_request(sscc: str, id_point: str, message: str, weight: float) -> None:
-	conn = get_connection()
-	try:
+	with transaction() as conn:
 		conn.execute(
 			"""
 			INSERT INTO set_pallet_requests(SSCC, IDPoint, Message, Weight)
 			VALUES(?, ?, ?, ?)
 			""",
-			(sscc, id_point, message, weight),
+			(sscc, fix_mojibake_text(id_point), fix_mojibake_text(message), weight),
 		)
-		conn.commit()
-	finally:
-		conn.close()
 
 
 def insert_set_pallet_response(sscc: str, status: str) -> None:
-	conn = get_connection()
-	try:
+	with transaction() as conn:
 		conn.execute(
 			"""
 			INSERT INTO set_pallet_responses(SSCC, Status)
@@ -246,14 +509,39 @@ def insert_set_pallet_response(sscc: str, status: str) -> None:
 			""",
 			(sscc, status),
 		)
-		conn.commit()
-	finally:
-		conn.close()
+
+
+def insert_set_pallets(items: Iterable[Tuple[str, str, str, float]], status: str = "Ok") -> int:
+	"""
+	Bulk-persist setpallet requests and their responses in one transaction.
+	Each item is (SSCC, IDPoint, Message, Weight).
+	"""
+	items = list(items)
+	if not items:
+		return 0
+	with transaction() as conn:
+		conn.executemany(
+			"""
+			INSERT INTO set_pallet_requests(SSCC, IDPoint, Message, Weight)
+			VALUES(?, ?, ?, ?)
+			""",
+			[
+				(sscc, fix_mojibake_text(id_point), fix_mojibake_text(message), weight)
+				for sscc, id_point, message, weight in items
+			],
+		)
+		conn.executemany(
+			"""
+			INSERT INTO set_pallet_responses(SSCC, Status)
+			VALUES(?, ?)
+			""",
+			[(item[0], status) for item in items],
+		)
+	return len(items)
 
 
 def insert_get_camera_res_request(sscc: str) -> None:
-	conn = get_connection()
-	try:
+	with transaction() as conn:
 		conn.execute(
 			"""
 			INSERT INTO get_camera_res_requests(SSCC)
@@ -261,9 +549,6 @@ def insert_get_camera_res_request(sscc: str) -> None:
 			""",
 			(sscc,),
 		)
-		conn.commit()
-	finally:
-		conn.close()
 
 
 def insert_get_camera_res_response(
@@ -274,8 +559,7 @@ def insert_get_camera_res_response(
 	degree: str,
 	result: str,
 ) -> None:
-	conn = get_connection()
-	try:
+	with transaction() as conn:
 		conn.execute(
 			"""
 			INSERT INTO get_camera_res_responses(IDPoint, SSCC, Status, Probability, Degree, Result)
@@ -283,9 +567,6 @@ def insert_get_camera_res_response(
 			""",
 			(id_point, sscc, status, probability, degree, result),
 		)
-		conn.commit()
-	finally:
-		conn.close()
 
 
 def insert_palletes_scan(
@@ -296,67 +577,123 @@ def insert_palletes_scan(
 	result: str,
 	msg: str,
 ) -> None:
-	conn = get_connection()
-	try:
+	with transaction() as conn:
 		conn.execute(
 			"""
 			INSERT INTO palletes_scan(IDPoint, SSCC, Details, Status, Result, Msg)
 			VALUES(?, ?, ?, ?, ?, ?)
 			""",
-			(id_point, sscc, details, status, result, msg),
+			fix_palletes_scan_text(id_point, sscc, details, status, result, msg),
 		)
-		conn.commit()
-	finally:
-		conn.close()
+	_notify_palletes_scan_listeners(sscc)
+
+
+# Callbacks run (with the SSCC) after this process commits a palletes_scan row.
+_palletes_scan_listeners: List[Callable[[str], None]] = []
+
+
+def add_palletes_scan_listener(callback: Callable[[str], None]) -> None:
+	if callback not in _palletes_scan_listeners:
+		_palletes_scan_listeners.append(callback)
+
+
+def remove_palletes_scan_listener(callback: Callable[[str], None]) -> None:
+	if callback in _palletes_scan_listeners:
+		_palletes_scan_listeners.remove(callback)
+
+
+def _notify_palletes_scan_listeners(sscc: str) -> None:
+	for callback in list(_palletes_scan_listeners):
+		try:
+			callback(sscc)
+		except Exception:
+			# A listener must never fail the write that already committed.
+			pass
 
 
 # Database viewer functions
 def fetch_latest_palletes_scan_by_sscc(sscc: str) -> Optional[dict]:
-	conn = get_connection()
-	try:
-		cur = conn.execute(
-			"""
-			SELECT id, IDPoint, SSCC, Details, Status, Result, Msg, created_at
-			FROM palletes_scan
-			WHERE SSCC = ?
-			ORDER BY id DESC
-			LIMIT 1
-			""",
-			(sscc,)
-		)
-		row = cur.fetchone()
-		return dict(row) if row else None
-	finally:
-		conn.close()
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"""
+		SELECT id, IDPoint, SSCC, Details, Status, Result, Msg, created_at
+		FROM palletes_scan
+		WHERE SSCC = ?
+		ORDER BY id DESC
+		LIMIT 1
+		""",
+		(sscc,)
+	)
+	row = cur.fetchone()
+	return dict(row) if row else None
 
 
 def fetch_palletes_scan_by_sscc(sscc: str, limit: int = 50):
-	conn = get_connection()
-	try:
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"""
+		SELECT id, IDPoint, SSCC, Details, Status, Result, Msg, created_at
+		FROM palletes_scan
+		WHERE SSCC = ?
+		ORDER BY id DESC
+		LIMIT ?
+		""",
+		(sscc, limit),
+	)
+	return [dict(row) for row in cur.fetchall()]
+
+
+def fetch_palletes_scan_version(sscc: str) -> int:
+	"""
+	Change counter for this SSCC's palletes_scan rows (0 = never written).
+	"""
+	conn = get_pooled_connection()
+	row = conn.execute(
+		"SELECT version FROM palletes_scan_changes WHERE SSCC = ?",
+		(sscc,),
+	).fetchone()
+	return int(row["version"]) if row else 0
+
+
+def fetch_palletes_scan_versions(ssccs: Iterable[str]) -> Dict[str, int]:
+	"""
+	Change counters for several SSCCs at once; unknown SSCCs are omitted.
+	"""
+	ssccs = list(ssccs)
+	if not ssccs:
+		return {}
+	placeholders = ", ".join("?" for _ in ssccs)
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		f"SELECT SSCC, version FROM palletes_scan_changes WHERE SSCC IN ({placeholders})",
+		ssccs,
+	)
+	return {row["SSCC"]: int(row["version"]) for row in cur.fetchall()}
+
+
+def fetch_palletes_scan_analyzed(limit: int = 500, offset: int = 0, after_id: Optional[int] = None):
+	"""
+	Return newest analyzed scan rows (id + SSCC + Msg) with pagination.
+
+	With `after_id` (keyset mode) rows older than that id are returned and
+	`offset` is ignored; pass the last row id of a page to get the next one.
+	"""
+	conn = get_pooled_connection()
+	if after_id is not None:
 		cur = conn.execute(
 			"""
-			SELECT id, IDPoint, SSCC, Details, Status, Result, Msg, created_at
+			SELECT id, SSCC, Msg
 			FROM palletes_scan
-			WHERE SSCC = ?
+			WHERE Status = ? AND id < ?
 			ORDER BY id DESC
 			LIMIT ?
 			""",
-			(sscc, limit),
+			("analyzed", after_id, limit),
 		)
-		return [dict(row) for row in cur.fetchall()]
-	finally:
-		conn.close()
-
-
-def fetch_palletes_scan_analyzed(limit: int = 500, offset: int = 0):
-	"""
-	Return newest analyzed scan rows (SSCC + Msg only) with pagination.
-	"""
-	conn = get_connection()
-	try:
+	else:
 		cur = conn.execute(
 			"""
-			SELECT SSCC, Msg
+			SELECT id, SSCC, Msg
 			FROM palletes_scan
 			WHERE Status = ?
 			ORDER BY id DESC
@@ -364,55 +701,80 @@ def fetch_palletes_scan_analyzed(limit: int = 500, offset: int = 0):
 			""",
 			("analyzed", limit, offset),
 		)
-		return [dict(row) for row in cur.fetchall()]
-	finally:
-		conn.close()
+	return [dict(row) for row in cur.fetchall()]
 
-def fetch_set_pallet_requests(limit: int = 100):
+
+def iter_palletes_scan_analyzed(since: Optional[str] = None, batch_size: int = 1000) -> Iterator[dict]:
+	"""
+	Stream all analyzed scan rows (newest first) without materializing them.
+
+	Uses its own connection (not the thread pool) because streaming responses
+	may resume the generator on different worker threads. `since` filters on
+	created_at ('YYYY-MM-DD HH:MM:SS', inclusive).
+	"""
 	conn = get_connection()
 	try:
-		cur = conn.execute(
-			"SELECT * FROM set_pallet_requests ORDER BY id DESC LIMIT ?",
-			(limit,)
-		)
-		return [dict(row) for row in cur.fetchall()]
+		if since is not None:
+			cur = conn.execute(
+				"""
+				SELECT id, SSCC, Msg, created_at
+				FROM palletes_scan
+				WHERE Status = ? AND created_at >= ?
+				ORDER BY id DESC
+				""",
+				("analyzed", since),
+			)
+		else:
+			cur = conn.execute(
+				"""
+				SELECT id, SSCC, Msg, created_at
+				FROM palletes_scan
+				WHERE Status = ?
+				ORDER BY id DESC
+				""",
+				("analyzed",),
+			)
+		while True:
+			rows = cur.fetchmany(batch_size)
+			if not rows:
+				break
+			for row in rows:
+				yield dict(row)
 	finally:
 		conn.close()
 
 
+def fetch_set_pallet_requests(limit: int = 100):
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"SELECT * FROM set_pallet_requests ORDER BY id DESC LIMIT ?",
+		(limit,)
+	)
+	return [dict(row) for row in cur.fetchall()]
+
+
 def fetch_set_pallet_responses(limit: int = 100):
-	conn = get_connection()
-	try:
-		cur = conn.execute(
-			"SELECT * FROM set_pallet_responses ORDER BY id DESC LIMIT ?",
-			(limit,)
-		)
-		return [dict(row) for row in cur.fetchall()]
-	finally:
-		conn.close()
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"SELECT * FROM set_pallet_responses ORDER BY id DESC LIMIT ?",
+		(limit,)
+	)
+	return [dict(row) for row in cur.fetchall()]
 
 
 def fetch_get_camera_res_requests(limit: int = 100):
-	conn = get_connection()
-	try:
-		cur = conn.execute(
-			"SELECT * FROM get_camera_res_requests ORDER BY id DESC LIMIT ?",
-			(limit,)
-		)
-		return [dict(row) for row in cur.fetchall()]
-	finally:
-		conn.close()
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"SELECT * FROM get_camera_res_requests ORDER BY id DESC LIMIT ?",
+		(limit,)
+	)
+	return [dict(row) for row in cur.fetchall()]
 
 
 def fetch_get_camera_res_responses(limit: int = 100):
-	conn = get_connection()
-	try:
-		cur = conn.execute(
-			"SELECT * FROM get_camera_res_responses ORDER BY id DESC LIMIT ?",
-			(limit,)
-		)
-		return [dict(row) for row in cur.fetchall()]
-	finally:
-		conn.close()
-
-
+	conn = get_pooled_connection()
+	cur = conn.execute(
+		"SELECT * FROM get_camera_res_responses ORDER BY id DESC LIMIT ?",
+		(limit,)
+	)
+	return [dict(row) for row in cur.fetchall()]
@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import db
+
+
+T = TypeVar("T")
+
+_STOP = object()
+
+
+class GroupCommitter:
+	"""
+	Coalesces concurrent write units into one SQLite commit.
+
+	`submit(work)` queues a callable that runs db insert helpers and blocks until
+	its rows are durable. A writer thread collects units arriving within
+	`window_ms` of the first one (up to `max_batch`) and runs them in a single
+	db.transaction(), each under its own SAVEPOINT so a failing unit is rolled
+	back alone while the rest of the group still commits.
+	"""
+
+	def __init__(self, window_ms: float = 2.0, max_batch: int = 256):
+		self.window_s = max(0.0, float(window_ms)) / 1000.0
+		self.max_batch = max(1, int(max_batch))
+		self._queue: "queue.Queue" = queue.Queue()
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+		self._batches = 0
+		self._units = 0
+
+	def start(self) -> None:
+		if self._thread is not None and self._thread.is_alive():
+			return
+		with self._lock:
+			if self._thread is not None and self._thread.is_alive():
+				return
+			self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+			self._thread.start()
+
+	def submit(self, work: Callable[[], T], timeout: Optional[float] = 10.0) -> T:
+		"""
+		Run `work` in the next group commit and return its result.
+
+		If the unit is still queued after `timeout` seconds it is cancelled and
+		TimeoutError means nothing was written. A unit the writer has already
+		picked up cannot be cancelled, so then the call waits for its commit.
+		"""
+		self.start()
+		fut: "Future[T]" = Future()
+		self._queue.put((work, fut))
+		try:
+			return fut.result(timeout)
+		except FutureTimeoutError:
+			if fut.cancel():
+				raise
+			return fut.result()
+
+	def stop(self, timeout: float = 5.0) -> None:
+		thread = self._thread
+		if thread is None or not thread.is_alive():
+			return
+		self._queue.put(_STOP)
+		thread.join(timeout)
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {"batches": self._batches, "units": self._units}
+
+	def _collect(self, first: Tuple) -> Tuple[List[Tuple], bool]:
+		batch = [first]
+		deadline = time.monotonic() + self.window_s
+		while len(batch) < self.max_batch:
+			remaining = deadline - time.monotonic()
+			try:
+				item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+			except queue.Empty:
+				break
+			if item is _STOP:
+				return batch, True
+			batch.append(item)
+		return batch, False
+
+	def _commit(self, batch: List[Tuple]) -> None:
+		# Drop units whose submitter timed out; the rest can no longer be cancelled.
+		batch = [(work, fut) for work, fut in batch if fut.set_running_or_notify_cancel()]
+		if not batch:
+			return
+		outcomes = []
+		try:
+			with db.transaction() as conn:
+				for work, fut in batch:
+					conn.execute("SAVEPOINT group_unit")
+					try:
+						result = work()
+					except Exception as exc:
+						conn.execute("ROLLBACK TO group_unit")
+						conn.execute("RELEASE group_unit")
+						outcomes.append((fut, None, exc))
+						continue
+					conn.execute("RELEASE group_unit")
+					outcomes.append((fut, result, None))
+		except Exception as exc:
+			# The shared commit failed: nothing in this group was persisted.
+			for _work, fut in batch:
+				fut.set_exception(exc)
+			return
+
+		with self._lock:
+			self._batches += 1
+			self._units += len(batch)
+		for fut, result, exc in outcomes:
+			if exc is not None:
+				fut.set_exception(exc)
+			else:
+				fut.set_result(result)
+
+	def _run(self) -> None:
+		while True:
+			first = self._queue.get()
+			if first is _STOP:
+				return
+			batch, stop = self._collect(first)
+			self._commit(batch)
+			if stop:
+				return
@@ -1,24 +1,34 @@
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import FileResponse, HTMLResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import Literal
-from typing import List
+from typing import Any, Dict, List, Optional
 from fastapi import Request
+import asyncio
 import time
+from datetime import datetime
 import logging
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 import json
+import os
 import sys
+from email.utils import formatdate, parsedate_to_datetime
 
 _SCRIPTS_DIR = Path(__file__).resolve().parent / "scripts"
 if str(_SCRIPTS_DIR) not in sys.path:
 	sys.path.insert(0, str(_SCRIPTS_DIR))
 
+import db
 from db import (
 	init_db, 
+	close_connection_pool,
+	run_db,
+	shutdown_db_executor,
+	transaction,
 	insert_set_pallet_request, 
 	insert_set_pallet_response, 
+	insert_set_pallets,
 	insert_get_camera_res_request, 
 	insert_get_camera_res_response, 
 	fetch_logs,
@@ -28,10 +38,20 @@ from db import (
 	fetch_get_camera_res_responses,
 	fetch_latest_palletes_scan_by_sscc,
 	fetch_palletes_scan_by_sscc,
+	fetch_palletes_scan_version,
+	fetch_palletes_scan_versions,
+	add_palletes_scan_listener,
+	fix_mojibake_text,
 	fetch_palletes_scan_analyzed,
+	iter_palletes_scan_analyzed,
 )
-from version import get_version_info
-from file_search import find_png_file, validate_png_filename
+from version import get_cached_version_info
+from request_log_writer import RequestLogWriter
+from result_cache import VersionedLRUCache
+from scan_notifier import ScanNotifier
+from group_commit import GroupCommitter
+from file_search import find_png_file, find_png_files, get_file_index, shutdown_stat_executor, validate_png_filename
+from thumbnails import get_thumbnail, thumbnail_etag, validate_thumbnail_params
 
 
 def _setup_request_logger() -> logging.Logger:
@@ -82,23 +102,30 @@ def _setup_request_logger() -> logging.Logger:
 
 request_logger_file = _setup_request_logger()
 
+# request_logs rows are written in batches off the request path.
+request_log_writer = RequestLogWriter()
 
-def _fix_mojibake_text(value: str) -> str:
-	"""
-	Best-effort fix for UTF-8 text that was decoded as latin-1/cp1252,
-	which appears as sequences like 'Ð¡ÑÑ ...'.
-	"""
-	if not isinstance(value, str):
-		return value
-	if "Ð" not in value and "Ñ" not in value:
-		return value
-	try:
-		fixed = value.encode("latin1", errors="ignore").decode("utf-8", errors="ignore")
-		if any("\u0400" <= ch <= "\u04FF" for ch in fixed):
-			return fixed
-	except Exception:
-		pass
-	return value
+# Wakes /api/getcamerares long-polls when scan rows for the SSCC appear.
+scan_notifier = ScanNotifier(fetch_palletes_scan_versions)
+add_palletes_scan_listener(scan_notifier.notify)
+
+# Group commit for /api/setpallet: writes arriving within this many ms share one
+# commit (0 = each request commits its own unit of work).
+SETPALLET_GROUP_COMMIT_MS = float(os.getenv("SAVVFASTAPI_SETPALLET_GROUP_COMMIT_MS", "0") or 0)
+set_pallet_committer = GroupCommitter(window_ms=SETPALLET_GROUP_COMMIT_MS) if SETPALLET_GROUP_COMMIT_MS > 0 else None
+
+# Upper bound for GetCameraResRequest.wait_seconds.
+MAX_CAMERA_RES_WAIT_SECONDS = 60.0
+
+
+# palletes_scan text is repaired on write (db.fix_mojibake_text + schema migration),
+# so reads pass it through. Set SAVVFASTAPI_FIX_MOJIBAKE_ON_READ=1 for databases
+# filled by tools that bypass the db helpers.
+FIX_MOJIBAKE_ON_READ = os.getenv("SAVVFASTAPI_FIX_MOJIBAKE_ON_READ", "0") == "1"
+
+
+def _read_text(value: str) -> str:
+	return fix_mojibake_text(value) if FIX_MOJIBAKE_ON_READ else value
 
 class SetPalletRequest(BaseModel):
 	SSCC: str
@@ -111,6 +138,48 @@ class SetPalletResponse(BaseModel):
 	SSCC: str
 	Status: Literal["Ok"]
 
+class SetPalletBatchItemResult(BaseModel):
+	Index: int
+	SSCC: Optional[str] = None
+	Status: Literal["Ok", "Invalid"]
+	Detail: Optional[str] = None
+
+
+class SetPalletBatchResponse(BaseModel):
+	Count: int
+	Accepted: int
+	Rejected: int
+	Results: List[SetPalletBatchItemResult]
+
+
+class FileMetadataRequest(BaseModel):
+	filenames: List[str]
+
+
+class FileMetadataRecord(BaseModel):
+	Filename: str
+	Status: Literal["Found", "NotFound", "Invalid"]
+	Name: Optional[str] = None
+	SizeBytes: Optional[int] = None
+	Modified: Optional[str] = None
+	Created: Optional[str] = None
+	SearchRoot: Optional[str] = None
+	ETag: Optional[str] = None
+	Detail: Optional[str] = None
+
+
+class FileMetadataResponse(BaseModel):
+	Count: int
+	Found: int
+	Records: List[FileMetadataRecord]
+
+
+# Upper bound for one /api/get_file/metadata call.
+MAX_FILE_METADATA_BATCH = 5_000
+
+# Upper bound for one /api/setpallet/batch call.
+MAX_SET_PALLET_BATCH = 20_000
+
 app = FastAPI(
     title="Vercel + FastAPI",
     description="Vercel + FastAPI",
@@ -121,10 +190,25 @@ app = FastAPI(
 @app.on_event("startup")
 def on_startup():
 	init_db()
+	request_log_writer.start()
+	scan_notifier.start()
+	# Resolve git/version info once so /api/health stays in-memory.
+	get_cached_version_info()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+	request_log_writer.stop()
+	scan_notifier.stop()
+	if set_pallet_committer is not None:
+		set_pallet_committer.stop()
+	shutdown_db_executor()
+	shutdown_stat_executor()
+	close_connection_pool()
 
 @app.get("/api/health")
 def health_check():
-    version_info = get_version_info()
+    version_info = get_cached_version_info()
     return {
         "status": "healthy",
         "version": version_info["version"],
@@ -135,18 +219,64 @@ def health_check():
         "api_name": version_info["api_name"]
     }
 
+def _persist_set_pallet(payload: SetPalletRequest, response: SetPalletResponse) -> None:
+	# Request + response rows form one unit of work (single commit). The request
+	# log row is written by the batched request_log_writer.
+	with transaction():
+		insert_set_pallet_request(payload.SSCC, payload.IDPoint, payload.Message, payload.Weight)
+		insert_set_pallet_response(response.SSCC, response.Status)
+
+
 @app.post("/api/setpallet", response_model=SetPalletResponse)
 def set_pallet(payload: SetPalletRequest) -> SetPalletResponse:
-	# persist request
-	insert_set_pallet_request(payload.SSCC, payload.IDPoint, payload.Message, payload.Weight)
-	# build and persist response
 	response = SetPalletResponse(SSCC=payload.SSCC, Status="Ok")
-	insert_set_pallet_response(response.SSCC, response.Status)
+	if set_pallet_committer is not None:
+		set_pallet_committer.submit(lambda: _persist_set_pallet(payload, response))
+	else:
+		_persist_set_pallet(payload, response)
 	return response
 
 
+@app.post("/api/setpallet/batch", response_model=SetPalletBatchResponse)
+def set_pallet_batch(payload: List[Any]) -> SetPalletBatchResponse:
+	"""
+	Persist many SetPalletRequest payloads (e.g. replayed PLC gateway buffer) at once.
+	Items are validated individually; valid ones are written in one transaction and
+	invalid ones are reported per index without failing the whole batch.
+	"""
+	if len(payload) > MAX_SET_PALLET_BATCH:
+		raise HTTPException(status_code=413, detail=f"batch too large (max {MAX_SET_PALLET_BATCH} items)")
+
+	valid = []
+	results: List[SetPalletBatchItemResult] = []
+	for index, item in enumerate(payload):
+		try:
+			req = SetPalletRequest.model_validate(item)
+		except ValidationError as exc:
+			# Non-object items (e.g. "junk", null) fail validation like any other item.
+			sscc = item.get("SSCC") if isinstance(item, dict) and isinstance(item.get("SSCC"), str) else None
+			detail = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors())
+			results.append(SetPalletBatchItemResult(Index=index, SSCC=sscc, Status="Invalid", Detail=detail))
+			continue
+		valid.append((req.SSCC, req.IDPoint, req.Message, req.Weight))
+		results.append(SetPalletBatchItemResult(Index=index, SSCC=req.SSCC, Status="Ok"))
+
+	insert_set_pallets(valid)
+	return SetPalletBatchResponse(
+		Count=len(results),
+		Accepted=len(valid),
+		Rejected=len(results) - len(valid),
+		Results=results,
+	)
+
+
 class GetCameraResRequest(BaseModel):
 	SSCC: str
+	# Long-poll: when > 0, wait up to this many seconds for the SSCC's scan rows
+	# to change from `since_version` before answering.
+	wait_seconds: float = 0
+	# `Version` from the previous response; 0 = wait for the first scan row.
+	since_version: int = 0
 
 
 class GetCameraResRecord(BaseModel):
@@ -163,6 +293,8 @@ class GetCameraResResponse(BaseModel):
 	Status: Literal["PalletResult"]
 	Count: int
 	Records: List[GetCameraResRecord]
+	# palletes_scan change counter for the SSCC; pass back as `since_version` to long-poll.
+	Version: int = 0
 
 
 class GetAllAnalyzedRecord(BaseModel):
@@ -173,10 +305,12 @@ class GetAllAnalyzedRecord(BaseModel):
 class GetAllAnalyzedResponse(BaseModel):
 	Count: int
 	Records: List[GetAllAnalyzedRecord]
+	# Pass as `after_id` to fetch the next (older) page; None when this page is the last one.
+	next_cursor: Optional[int] = None
 
 
 @app.get("/api/getanalyzed", response_model=GetAllAnalyzedResponse)
-def get_analyzed(limit: int = 500, offset: int = 0) -> GetAllAnalyzedResponse:
+def get_analyzed(limit: int = 500, offset: int = 0, after_id: Optional[int] = None) -> GetAllAnalyzedResponse:
 	# Hard safety caps: DB can contain thousands+ rows.
 	if limit < 1:
 		limit = 1
@@ -185,36 +319,90 @@ def get_analyzed(limit: int = 500, offset: int = 0) -> GetAllAnalyzedResponse:
 	if offset < 0:
 		offset = 0
 
-	rows = fetch_palletes_scan_analyzed(limit=limit, offset=offset)
-	records = [GetAllAnalyzedRecord(SSCC=row["SSCC"], Msg=_fix_mojibake_text(row["Msg"])) for row in rows]
-	return GetAllAnalyzedResponse(Count=len(records), Records=records)
+	# after_id (keyset cursor) takes precedence over offset.
+	rows = fetch_palletes_scan_analyzed(limit=limit, offset=offset, after_id=after_id)
+	records = [GetAllAnalyzedRecord(SSCC=row["SSCC"], Msg=_read_text(row["Msg"])) for row in rows]
+	next_cursor = rows[-1]["id"] if len(rows) == limit else None
+	return GetAllAnalyzedResponse(Count=len(records), Records=records, next_cursor=next_cursor)
+
+
+def _analyzed_ndjson_lines(since: Optional[str]):
+	# Emit in chunks of lines so each write to the socket is reasonably sized.
+	chunk: List[str] = []
+	for row in iter_palletes_scan_analyzed(since=since):
+		record = {
+			"id": row["id"],
+			"SSCC": row["SSCC"],
+			"Msg": _read_text(row["Msg"]),
+			"created_at": row["created_at"],
+		}
+		chunk.append(json.dumps(record, ensure_ascii=False))
+		if len(chunk) >= 500:
+			yield ("\n".join(chunk) + "\n").encode("utf-8")
+			chunk = []
+	if chunk:
+		yield ("\n".join(chunk) + "\n").encode("utf-8")
+
+
+@app.get("/api/getanalyzed/stream")
+def get_analyzed_stream(
+	since: Optional[datetime] = Query(None, description="Only rows with created_at >= since (local time)"),
+) -> StreamingResponse:
+	"""
+	Export every analyzed record as NDJSON (one JSON object per line), newest first.
+	Rows are read through a DB cursor, so memory use does not grow with row count.
+	"""
+	if since is not None and since.tzinfo is not None:
+		# created_at is stored as naive local time; compare in the same clock.
+		since = since.astimezone().replace(tzinfo=None)
+	since_text = since.strftime("%Y-%m-%d %H:%M:%S") if since is not None else None
+	return StreamingResponse(_analyzed_ndjson_lines(since_text), media_type="application/x-ndjson")
 
 
-@app.post("/api/getcamerares", response_model=GetCameraResResponse)
-async def get_camera_res(payload: GetCameraResRequest) -> GetCameraResResponse:
-	# persist request
-	insert_get_camera_res_request(payload.SSCC)
-	rows = fetch_palletes_scan_by_sscc(payload.SSCC, limit=50)
+# Built /api/getcamerares responses per SSCC, keyed by the palletes_scan change counter.
+camera_res_cache: "VersionedLRUCache[GetCameraResResponse]" = VersionedLRUCache(max_entries=2048, ttl_seconds=300)
+
+
+def _build_camera_res(sscc: str) -> GetCameraResResponse:
+	# Read the version before the rows: a concurrent write then only makes the
+	# cached entry look stale, never hides the new rows. DB_PATH is part of the
+	# version because counters restart from 1 in a fresh database.
+	scan_version = fetch_palletes_scan_version(sscc)
+	version = (str(db.DB_PATH), scan_version)
+	cached = camera_res_cache.get(sscc, version)
+	if cached is not None:
+		return cached
+
+	rows = fetch_palletes_scan_by_sscc(sscc, limit=50)
 	records = [
 		GetCameraResRecord(
-			IDPoint=_fix_mojibake_text(row["IDPoint"]),
+			IDPoint=_read_text(row["IDPoint"]),
 			SSCC=row["SSCC"],
-			Details=_fix_mojibake_text(row["Details"]),
-			ScanStatus=_fix_mojibake_text(row["Status"]),
-			Result=_fix_mojibake_text(row["Result"]),
-			Msg=_fix_mojibake_text(row["Msg"]),
+			Details=_read_text(row["Details"]),
+			ScanStatus=_read_text(row["Status"]),
+			Result=_read_text(row["Result"]),
+			Msg=_read_text(row["Msg"]),
 			created_at=row["created_at"],
 		)
 		for row in rows
 	]
 
-	response = GetCameraResResponse(Status="PalletResult", Count=len(records), Records=records)
+	response = GetCameraResResponse(Status="PalletResult", Count=len(records), Records=records, Version=scan_version)
+	camera_res_cache.put(sscc, version, response)
+	return response
+
+
+def _get_camera_res(sscc: str) -> GetCameraResResponse:
+	# persist request
+	insert_get_camera_res_request(sscc)
+	response = _build_camera_res(sscc)
+	records = response.Records
 
 	latest_result = records[0].Result if records else "Not found"
 	latest_id_point = records[0].IDPoint if records else "ID1"
 	insert_get_camera_res_response(
 		latest_id_point,
-		payload.SSCC,
+		sscc,
 		response.Status,
 		latest_result,
 		latest_result,
@@ -223,6 +411,33 @@ async def get_camera_res(payload: GetCameraResRequest) -> GetCameraResResponse:
 	return response
 
 
+async def _wait_for_scan_change(sscc: str, since_version: int, wait_seconds: float) -> None:
+	# Any other version (also a lower one, e.g. after a DB reset) answers at once.
+	loop = asyncio.get_running_loop()
+	deadline = loop.time() + wait_seconds
+	while True:
+		version = await run_db(fetch_palletes_scan_version, sscc)
+		remaining = deadline - loop.time()
+		if version != since_version or remaining <= 0:
+			return
+		waiter = scan_notifier.subscribe(sscc, since_version)
+		try:
+			await asyncio.wait_for(waiter, timeout=remaining)
+		except asyncio.TimeoutError:
+			return
+		finally:
+			scan_notifier.unsubscribe(sscc, waiter)
+
+
+@app.post("/api/getcamerares", response_model=GetCameraResResponse)
+async def get_camera_res(payload: GetCameraResRequest) -> GetCameraResResponse:
+	wait_seconds = min(max(payload.wait_seconds, 0.0), MAX_CAMERA_RES_WAIT_SECONDS)
+	if wait_seconds > 0:
+		await _wait_for_scan_change(payload.SSCC, payload.since_version, wait_seconds)
+	# All SQLite work runs in one hop on the DB worker threads, off the event loop.
+	return await run_db(_get_camera_res, payload.SSCC)
+
+
 @app.middleware("http")
 async def request_logger(request: Request, call_next):
 	# Read body early so downstream handlers can still access it (Starlette caches it).
@@ -236,10 +451,9 @@ async def request_logger(request: Request, call_next):
 	response = await call_next(request)
 	duration_ms = (time.perf_counter() - start) * 1000.0
 	try:
-		from db import insert_log
 		client_ip = request.client.host if request.client else None
 		user_agent = request.headers.get("user-agent")
-		insert_log(request.method, request.url.path, response.status_code, duration_ms, client_ip, user_agent)
+		request_log_writer.submit(request.method, request.url.path, response.status_code, duration_ms, client_ip, user_agent)
 
 		# Human-friendly request timing + file logging
 		request_logger_file.info(
@@ -298,18 +512,50 @@ async def request_logger(request: Request, call_next):
 	return response
 
 
+def _is_not_modified(request: Request, etag: str, modified_at: datetime) -> bool:
+	"""
+	Evaluate If-None-Match / If-Modified-Since (If-None-Match wins when both are sent).
+	"""
+	if_none_match = request.headers.get("if-none-match")
+	if if_none_match is not None:
+		tags = [tag.strip() for tag in if_none_match.split(",")]
+		# Weak comparison: W/"x" matches "x".
+		return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+	if_modified_since = request.headers.get("if-modified-since")
+	if if_modified_since:
+		try:
+			since = parsedate_to_datetime(if_modified_since)
+		except (TypeError, ValueError):
+			return False
+		# HTTP dates have 1 s resolution.
+		return int(modified_at.timestamp()) <= int(since.timestamp())
+	return False
+
+
 @app.get("/api/get_file")
 def get_file(
+	request: Request,
 	filename: str = Query(..., description="PNG filename (basename only, not an absolute path)"),
+	max_width: Optional[int] = Query(None, description="Downscale to at most this width (px)"),
+	scale: Optional[float] = Query(None, description="Downscale factor in (0, 1]"),
+	image_format: str = Query("png", alias="format", description="Output format for downscaled variants: png or webp"),
 ):
 	"""
 	Return a PNG file from the first configured search root that contains it.
 
+	With max_width / scale (and optionally format=webp) a downscaled variant is
+	returned instead; variants are generated once and cached on disk.
+
 	File metadata is returned in response headers:
 	- X-File-Name, X-File-Size, X-File-Modified, X-File-Created (when available), X-Search-Root
+
+	Responses carry ETag / Last-Modified; matching If-None-Match / If-Modified-Since
+	requests get 304 without a body, and Range requests get 206 partial content.
 	"""
 	try:
 		validate_png_filename(filename)
+		validate_thumbnail_params(max_width, scale, image_format)
 	except ValueError as exc:
 		raise HTTPException(status_code=400, detail=str(exc)) from exc
 
@@ -325,17 +571,92 @@ def get_file(
 	}
 	if found.created_at is not None:
 		headers["X-File-Created"] = found.created_at.isoformat()
-
+	# Downscaled variants get their own ETag (source ETag + parameters).
+	variant = max_width is not None or scale is not None or image_format != "png"
+	etag = thumbnail_etag(found, max_width, scale, image_format) if variant else found.etag
+	headers["ETag"] = etag
+	headers["Last-Modified"] = formatdate(found.modified_at.timestamp(), usegmt=True)
+	# Clients may cache but must revalidate (cheap 304) before reuse.
+	headers["Cache-Control"] = "no-cache"
+
+	if _is_not_modified(request, etag, found.modified_at):
+		return Response(status_code=304, headers=headers)
+
+	path, media_type, download_name = found.path, "image/png", found.path.name
+	stat_result = None
+	if variant:
+		thumb = get_thumbnail(found, max_width=max_width, scale=scale, image_format=image_format)
+		try:
+			stat_result = os.stat(thumb.path)
+		except FileNotFoundError:
+			# Evicted by a concurrent request between lookup and stat: build it again.
+			thumb = get_thumbnail(found, max_width=max_width, scale=scale, image_format=image_format)
+			stat_result = os.stat(thumb.path)
+		path, media_type, download_name = thumb.path, thumb.media_type, thumb.filename
+
+	# FileResponse serves Range / If-Range requests (206) against the ETag above.
 	return FileResponse(
-		path=found.path,
-		media_type="image/png",
-		filename=found.path.name,
+		path=path,
+		media_type=media_type,
+		filename=download_name,
 		headers=headers,
+		stat_result=stat_result,
+	)
+
+
+@app.post("/api/get_file/metadata", response_model=FileMetadataResponse)
+def get_file_metadata(payload: FileMetadataRequest) -> FileMetadataResponse:
+	"""
+	Return the /api/get_file X-File-* metadata for many filenames in one call,
+	without transferring any file bodies. Records follow the request order;
+	invalid names are reported per record instead of failing the batch.
+	"""
+	if len(payload.filenames) > MAX_FILE_METADATA_BATCH:
+		raise HTTPException(status_code=413, detail=f"batch too large (max {MAX_FILE_METADATA_BATCH} items)")
+
+	invalid: Dict[str, str] = {}
+	valid: List[str] = []
+	for filename in payload.filenames:
+		try:
+			validate_png_filename(filename)
+		except ValueError as exc:
+			invalid[filename] = str(exc)
+		else:
+			valid.append(filename)
+
+	found_by_name = find_png_files(valid)
+
+	records: List[FileMetadataRecord] = []
+	for filename in payload.filenames:
+		if filename in invalid:
+			records.append(FileMetadataRecord(Filename=filename, Status="Invalid", Detail=invalid[filename]))
+			continue
+		found = found_by_name.get(filename)
+		if found is None:
+			records.append(FileMetadataRecord(Filename=filename, Status="NotFound"))
+			continue
+		records.append(FileMetadataRecord(
+			Filename=filename,
+			Status="Found",
+			Name=found.path.name,
+			SizeBytes=found.size_bytes,
+			Modified=found.modified_at.isoformat(),
+			Created=found.created_at.isoformat() if found.created_at is not None else None,
+			SearchRoot=str(found.root),
+			ETag=found.etag,
+		))
+
+	return FileMetadataResponse(
+		Count=len(records),
+		Found=sum(1 for r in records if r.Status == "Found"),
+		Records=records,
 	)
 
 
 @app.get("/api/logs")
 def get_logs(limit: int = 50) -> List[dict]:
+	# Make rows still sitting in the writer queue visible to this read.
+	request_log_writer.flush()
 	rows = []
 	for row in fetch_logs(limit=limit):
 		rows.append({
@@ -350,6 +671,17 @@ def get_logs(limit: int = 50) -> List[dict]:
 		})
 	return rows
 
+@app.get("/api/stats")
+def get_stats() -> dict:
+	return {
+		"camera_res_cache": camera_res_cache.stats(),
+		"request_log_writer": request_log_writer.stats(),
+		"camera_res_waiters": scan_notifier.waiting_count(),
+		"file_index": get_file_index().stats(),
+		"set_pallet_group_commit": set_pallet_committer.stats() if set_pallet_committer is not None else None,
+	}
+
+
 @app.get("/", response_class=HTMLResponse)
 def read_root():
     return """
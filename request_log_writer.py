@@ -0,0 +1,162 @@
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import db
+
+
+LogRow = Tuple[str, str, int, float, Optional[str], Optional[str]]
+
+_STOP = object()
+
+
+class RequestLogWriter:
+	"""
+	Background writer for request_logs.
+
+	The HTTP middleware only enqueues rows; a daemon thread drains the queue and
+	writes them with one executemany transaction per batch. A batch is flushed
+	when it reaches `batch_size` rows or `flush_interval_ms` after its first row.
+	When the bounded queue is full, rows are dropped (and counted) instead of
+	blocking the request path.
+	"""
+
+	def __init__(self, max_queue: int = 10_000, batch_size: int = 200, flush_interval_ms: float = 250.0):
+		self.batch_size = max(1, int(batch_size))
+		self.flush_interval_s = max(0.0, float(flush_interval_ms)) / 1000.0
+		self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(max_queue)))
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+		self._stopping = threading.Event()
+		self._written = 0
+		self._dropped = 0
+		self._failed = 0
+		self._batches = 0
+
+	def start(self) -> None:
+		if self._thread is not None and self._thread.is_alive():
+			return
+		with self._lock:
+			if self._thread is not None and self._thread.is_alive():
+				return
+			self._stopping.clear()
+			self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+			self._thread.start()
+
+	def submit(
+		self,
+		method: str,
+		path: str,
+		status_code: int,
+		duration_ms: float,
+		client_ip: Optional[str],
+		user_agent: Optional[str],
+	) -> bool:
+		"""
+		Enqueue one log row without blocking. Returns False when the row was dropped.
+		"""
+		self.start()
+		try:
+			self._queue.put_nowait((method, path, status_code, duration_ms, client_ip, user_agent))
+		except queue.Full:
+			with self._lock:
+				self._dropped += 1
+			return False
+		return True
+
+	def flush(self, timeout: float = 5.0) -> bool:
+		"""
+		Block until every row queued before this call is written (or timeout).
+		"""
+		if self._thread is None or not self._thread.is_alive():
+			return self._queue.empty()
+		done = threading.Event()
+		try:
+			self._queue.put(done, timeout=timeout)
+		except queue.Full:
+			return False
+		return done.wait(timeout)
+
+	def stop(self, timeout: float = 5.0) -> None:
+		"""
+		Flush pending rows and stop the writer thread (app shutdown).
+		"""
+		thread = self._thread
+		if thread is None or not thread.is_alive():
+			return
+		self._stopping.set()
+		try:
+			# Wakes an idle writer; a full queue means it is busy and sees the event next.
+			self._queue.put_nowait(_STOP)
+		except queue.Full:
+			pass
+		thread.join(timeout)
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {
+				"queued": self._queue.qsize(),
+				"written": self._written,
+				"dropped": self._dropped,
+				"failed": self._failed,
+				"batches": self._batches,
+			}
+
+	def _write(self, batch: List[LogRow]) -> None:
+		if not batch:
+			return
+		try:
+			db.insert_logs(batch)
+		except Exception:
+			# Logging must never take the app down; count and move on.
+			with self._lock:
+				self._failed += len(batch)
+		else:
+			with self._lock:
+				self._written += len(batch)
+				self._batches += 1
+		batch.clear()
+
+	def _drain(self, batch: List[LogRow]) -> None:
+		"""Write everything still queued (stop requested), releasing flush waiters."""
+		while True:
+			try:
+				item = self._queue.get_nowait()
+			except queue.Empty:
+				break
+			if isinstance(item, threading.Event):
+				item.set()
+			elif item is not _STOP:
+				batch.append(item)
+				if len(batch) >= self.batch_size:
+					self._write(batch)
+		self._write(batch)
+
+	def _run(self) -> None:
+		batch: List[LogRow] = []
+		deadline = 0.0
+		while True:
+			if self._stopping.is_set():
+				self._drain(batch)
+				return
+			timeout = max(0.0, deadline - time.monotonic()) if batch else None
+			try:
+				item = self._queue.get(timeout=timeout)
+			except queue.Empty:
+				self._write(batch)
+				continue
+
+			if item is _STOP:
+				self._drain(batch)
+				return
+			if isinstance(item, threading.Event):
+				self._write(batch)
+				item.set()
+				continue
+
+			if not batch:
+				deadline = time.monotonic() + self.flush_interval_s
+			batch.append(item)
+			if len(batch) >= self.batch_size:
+				self._write(batch)
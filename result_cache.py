@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+V = TypeVar("V")
+
+
+class VersionedLRUCache(Generic[V]):
+	"""
+	Small thread-safe LRU cache whose entries are tagged with a data version.
+
+	`get(key, version)` only returns an entry stored under the same version and
+	younger than `ttl_seconds`, so callers invalidate by bumping the version
+	(e.g. a per-key change counter in the DB) instead of tracking writers.
+	"""
+
+	def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+		self.max_entries = max(1, int(max_entries))
+		self.ttl_seconds = float(ttl_seconds)
+		self._entries: "OrderedDict[Hashable, Tuple[Any, float, V]]" = OrderedDict()
+		self._lock = threading.Lock()
+		self._hits = 0
+		self._misses = 0
+
+	def get(self, key: Hashable, version: Any) -> Optional[V]:
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				entry_version, stored_at, value = entry
+				expired = self.ttl_seconds > 0 and now - stored_at >= self.ttl_seconds
+				if entry_version == version and not expired:
+					self._entries.move_to_end(key)
+					self._hits += 1
+					return value
+				del self._entries[key]
+			self._misses += 1
+			return None
+
+	def put(self, key: Hashable, version: Any, value: V) -> None:
+		with self._lock:
+			self._entries[key] = (version, time.monotonic(), value)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def invalidate(self, key: Hashable) -> None:
+		with self._lock:
+			self._entries.pop(key, None)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+
+	def stats(self) -> Dict[str, int]:
+		with self._lock:
+			return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+VersionFetcher = Callable[[Iterable[str]], Dict[str, int]]
+
+# (event loop, future, palletes_scan version the waiter has already seen)
+_Waiter = Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]", int]
+
+
+def _resolve(fut: "asyncio.Future[None]") -> None:
+	if not fut.done():
+		fut.set_result(None)
+
+
+class ScanNotifier:
+	"""
+	Wakes long-polling requests when palletes_scan rows for an SSCC change.
+
+	In-process writers call `notify(sscc)`. Rows written by other processes
+	(ingest/analyze scripts) are picked up by a watcher thread that polls the
+	per-SSCC change counters, but only for SSCCs somebody is waiting on.
+	"""
+
+	def __init__(self, fetch_versions: VersionFetcher, poll_interval_s: float = 0.5):
+		self._fetch_versions = fetch_versions
+		self.poll_interval_s = poll_interval_s
+		self._waiters: Dict[str, List[_Waiter]] = {}
+		self._lock = threading.Lock()
+		self._stop = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+
+	def subscribe(self, sscc: str, seen_version: int) -> "asyncio.Future[None]":
+		"""
+		Register the calling coroutine's interest in `sscc`; the returned future
+		resolves once the SSCC's change counter moves past `seen_version`.
+		"""
+		self.start()
+		loop = asyncio.get_running_loop()
+		fut: "asyncio.Future[None]" = loop.create_future()
+		with self._lock:
+			self._waiters.setdefault(sscc, []).append((loop, fut, seen_version))
+		return fut
+
+	def unsubscribe(self, sscc: str, fut: "asyncio.Future[None]") -> None:
+		with self._lock:
+			waiters = self._waiters.get(sscc)
+			if not waiters:
+				return
+			waiters[:] = [w for w in waiters if w[1] is not fut]
+			if not waiters:
+				del self._waiters[sscc]
+
+	def notify(self, sscc: str) -> None:
+		"""
+		Wake every waiter for `sscc` (safe to call from any thread).
+		"""
+		with self._lock:
+			waiters = self._waiters.pop(sscc, [])
+		for loop, fut, _seen in waiters:
+			loop.call_soon_threadsafe(_resolve, fut)
+
+	def waiting_count(self) -> int:
+		with self._lock:
+			return sum(len(w) for w in self._waiters.values())
+
+	def start(self) -> None:
+		if self._thread is not None and self._thread.is_alive():
+			return
+		with self._lock:
+			if self._thread is not None and self._thread.is_alive():
+				return
+			self._stop.clear()
+			self._thread = threading.Thread(target=self._watch, name="scan-notifier", daemon=True)
+			self._thread.start()
+
+	def stop(self, timeout: float = 2.0) -> None:
+		self._stop.set()
+		thread = self._thread
+		if thread is not None:
+			thread.join(timeout)
+
+	def _check_versions(self) -> None:
+		with self._lock:
+			ssccs = list(self._waiters)
+		if not ssccs:
+			return
+		try:
+			versions = self._fetch_versions(ssccs)
+		except Exception:
+			# A transient DB error only delays wake-ups until the next poll.
+			return
+		for sscc in ssccs:
+			current = versions.get(sscc, 0)
+			with self._lock:
+				waiters = self._waiters.get(sscc, [])
+				ready = [w for w in waiters if w[2] != current]
+				if not ready:
+					continue
+				waiters[:] = [w for w in waiters if w[2] == current]
+				if not waiters:
+					del self._waiters[sscc]
+			for loop, fut, _seen in ready:
+				loop.call_soon_threadsafe(_resolve, fut)
+
+	def _watch(self) -> None:
+		while not self._stop.wait(self.poll_interval_s):
+			self._check_versions()
@@ -26,8 +26,7 @@ _spec = importlib.util.spec_from_file_location("find_similar_middle_particles",
 _fsmp = importlib.util.module_from_spec(_spec)
 assert _spec.loader is not None
 _spec.loader.exec_module(_fsmp)
-load_rgb = _fsmp.load_rgb
-stats_background_and_other = _fsmp.stats_background_and_other
+stats_for_png = _fsmp.stats_for_png
 
 # PNG examples:
 #   cube_26_03_16_02_13_cr10p_cheese_1_10cluster0p.png  -> stem matches .hdr in Msg
@@ -89,8 +88,7 @@ def resolve_source_row(filename: str) -> tuple[Optional[dict], str, str]:
 
 
 def process_file(path: Path, dry_run: bool) -> tuple[bool, str]:
-	img = load_rgb(path)
-	_bg, bg_pct, other_pct, _n_oc, _off, _n_bg, _n_o = stats_background_and_other(img)
+	_bg, bg_pct, other_pct, _n_oc, _off, _n_bg, _n_o = stats_for_png(path)
 	msg_value = f"{100.0 - bg_pct:.4f}"
 
 	prev, match_kind, key_used = resolve_source_row(path.name)
@@ -5,6 +5,7 @@ Steps:
 1) Load data from .npy / .npz / .json, or ENVI (.hdr / .img).
 2) Run k-means via spectral.kmeans on the FULL cube (preserves class structure).
 3) Save a colourised cluster map; optional crop overlay (edges = RGB preview).
+4) Save the label array + per-label summary next to the PNG (cluster_labels).
 """
 from __future__ import annotations
 
@@ -22,6 +23,8 @@ import logging
 import numpy as np
 import spectral as sp
 
+from cluster_labels import save_labels
+
 logger = logging.getLogger("batch_cluster")
 if not logger.handlers:
     handler = logging.StreamHandler()
@@ -36,13 +39,10 @@ def _load_array(path: Path) -> np.ndarray:
     suffix = path.suffix.lower()
 
     if suffix in {".hdr", ".img"}:
-        import spectral.io.envi as envi
+        from hsi_cube import open_cube
 
-        hdr_path = path.with_suffix(".hdr") if suffix == ".img" else path
-        if not hdr_path.is_file():
-            raise FileNotFoundError(f"ENVI header not found: {hdr_path}")
-        img = envi.open(str(hdr_path))
-        arr = np.asarray(img.load(), dtype=float)
+        # One conversion straight from the memory map (no intermediate float32 copy).
+        arr = open_cube(path).load(dtype=float)
         logger.info("ENVI cube shape: %s", arr.shape)
         return arr
 
@@ -194,10 +194,10 @@ def run_clustering(
     return labels
 
 
-def _discrete_label_rgb(labels: np.ndarray) -> np.ndarray:
+def _label_palette(labels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     """
-    Map each cluster label to one solid RGB (tab20). Output is HxWx3 uint8 —
-    only len(unique(labels)) distinct colours, no interpolation.
+    Compact labels to 0..n-1 and pick one solid RGB per label (tab20).
+    Returns (index array HxW, palette n x 3 uint8).
     """
     uniq = np.unique(labels)
     n = int(uniq.size)
@@ -208,6 +208,15 @@ def _discrete_label_rgb(labels: np.ndarray) -> np.ndarray:
         palette[i] = [int(round(rgba[j] * 255.0)) for j in range(3)]
 
     idx = np.searchsorted(uniq, labels)
+    return idx, palette
+
+
+def _discrete_label_rgb(labels: np.ndarray) -> np.ndarray:
+    """
+    Map each cluster label to one solid RGB (tab20). Output is HxWx3 uint8 —
+    only len(unique(labels)) distinct colours, no interpolation.
+    """
+    idx, palette = _label_palette(labels)
     return palette[idx]
 
 
@@ -283,7 +292,11 @@ def run_pipeline(
     cp = abs(int(crop_percent))
     if cp == 0:
         save_cluster_image(labels, tagged)
+        # Label sidecars let downstream stages skip decoding the PNG colours.
+        idx, palette = _label_palette(labels)
+        save_labels(tagged, idx, palette, full_frame=True)
     else:
+        # Overlays show RGB preview at the edges, not labels: no sidecars.
         base_rgb = _to_rgb(data)
         save_crop_overlay(labels, base_rgb, crop_percent, tagged)
     logger.info("Saved cluster image to: %s", tagged.resolve())
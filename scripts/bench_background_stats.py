@@ -0,0 +1,111 @@
+"""
+Micro-benchmark for find_similar_middle_particles.stats_background_and_other.
+
+Compares the packed-uint32 colour-key kernel with the previous
+np.unique(axis=0) implementation on synthetic cluster maps and prints
+milliseconds per image and megapixels per second for both.
+
+  python scripts/bench_background_stats.py --sizes 512 1024 2048 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+_SCRIPTS = Path(__file__).resolve().parent
+if str(_SCRIPTS) not in sys.path:
+    sys.path.insert(0, str(_SCRIPTS))
+
+from find_similar_middle_particles import stats_background_and_other  # noqa: E402
+
+
+def stats_background_and_other_legacy(img: np.ndarray) -> tuple:
+    """Previous implementation (row-wise np.unique over RGB triples), kept as the baseline."""
+    h, w = img.shape[:2]
+    total = h * w
+    pix = img.reshape(-1, 3).astype(np.uint8)
+    colors, counts = np.unique(pix, axis=0, return_counts=True)
+    if counts.size == 0:
+        return (0, 0, 0), 0.0, 0.0, 0, 0.0, 0, 0
+
+    i_max = int(np.argmax(counts))
+    bg = tuple(int(x) for x in colors[i_max])
+    n_bg = int(counts[i_max])
+    n_other = total - n_bg
+    bg_pct = (100.0 * n_bg / total) if total else 0.0
+    other_pct = (100.0 * n_other / total) if total else 0.0
+
+    bg_arr = np.array(bg, dtype=np.uint8)
+    mask_other = np.any(img != bg_arr, axis=2)
+    if not np.any(mask_other):
+        n_other_colors = 0
+        off_pct = 0.0
+    else:
+        other_pix = img[mask_other]
+        n_other_colors = len(np.unique(other_pix.reshape(-1, 3), axis=0))
+        ys, xs = np.where(mask_other)
+        mx, my = float(xs.mean()), float(ys.mean())
+        cx, cy = (w - 1) / 2.0, (h - 1) / 2.0
+        dist = float(np.hypot(mx - cx, my - cy))
+        half_diag = 0.5 * float(np.hypot(w, h))
+        off_pct = (100.0 * dist / half_diag) if half_diag > 0 else 0.0
+
+    return bg, bg_pct, other_pct, n_other_colors, off_pct, n_bg, n_other
+
+
+def synthetic_map(size: int, n_colors: int = 5, other_fraction: float = 0.1, seed: int = 0) -> np.ndarray:
+    """Square cluster map: one background colour plus scattered cluster colours."""
+    rng = np.random.default_rng(seed)
+    img = np.empty((size, size, 3), dtype=np.uint8)
+    img[:] = (31, 119, 180)
+    palette = rng.integers(0, 256, size=(n_colors, 3), dtype=np.uint8)
+    mask = rng.random((size, size)) < other_fraction
+    img[mask] = palette[rng.integers(0, n_colors, size=int(mask.sum()))]
+    return img
+
+
+def _time(fn, img: np.ndarray, repeat: int) -> float:
+    fn(img)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(img)
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark background/other colour statistics kernels.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048], help="Square image sizes (px)")
+    parser.add_argument("--colors", type=int, default=5, help="Non-background colours in the synthetic map")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per kernel and size")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the current kernel")
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'MPix':>6} {'legacy ms':>10} {'legacy MP/s':>12} {'new ms':>8} {'new MP/s':>9} {'speedup':>8}")
+    for size in args.sizes:
+        img = synthetic_map(size, n_colors=args.colors)
+        mpix = size * size / 1e6
+        new_s = _time(stats_background_and_other, img, args.repeat)
+        if args.skip_legacy:
+            print(f"{size:>6} {mpix:>6.2f} {'-':>10} {'-':>12} {new_s * 1e3:>8.2f} {mpix / new_s:>9.1f} {'-':>8}")
+            continue
+
+        new_res = stats_background_and_other(img)
+        old_res = stats_background_and_other_legacy(img)
+        if new_res[0] != old_res[0] or new_res[3] != old_res[3] or new_res[5:] != old_res[5:]:
+            print(f"MISMATCH at size {size}: new={new_res} legacy={old_res}")
+            return 1
+        old_s = _time(stats_background_and_other_legacy, img, args.repeat)
+        print(
+            f"{size:>6} {mpix:>6.2f} {old_s * 1e3:>10.2f} {mpix / old_s:>12.2f} "
+            f"{new_s * 1e3:>8.2f} {mpix / new_s:>9.1f} {old_s / new_s:>7.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,159 @@
+"""
+Label sidecars written next to cluster map PNGs by batch_cluster.
+
+For `<stem>.png` the clustering step also writes:
+  - `<stem>.labels.npy`  compact uint8/uint16 label array (0..n-1, H x W)
+  - `<stem>.labels.json` per-label pixel count, centroid and PNG colour
+
+Downstream scripts read these instead of decoding the PNG and sorting its RGB
+triples with np.unique; they fall back to the PNG when a sidecar is missing,
+older than the PNG, or the PNG is a crop overlay (edges are RGB preview, not labels).
+"""
+
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+LABELS_SUFFIX = ".labels.npy"
+SUMMARY_SUFFIX = ".labels.json"
+SUMMARY_VERSION = 1
+
+
+def sidecar_paths(png_path: Path) -> tuple[Path, Path]:
+    png_path = Path(png_path)
+    return (
+        png_path.with_name(png_path.stem + LABELS_SUFFIX),
+        png_path.with_name(png_path.stem + SUMMARY_SUFFIX),
+    )
+
+
+def is_sidecar(path: Path) -> bool:
+    name = Path(path).name.lower()
+    return name.endswith(LABELS_SUFFIX) or name.endswith(SUMMARY_SUFFIX)
+
+
+def copy_with_sidecars(src_png: Path, dst_png: Path) -> None:
+    """
+    Copy a cluster map PNG together with its sidecars (if any). copy2 keeps the
+    mtimes, so the copied summary is still current for the copied PNG.
+    """
+    shutil.copy2(src_png, dst_png)
+    for src_side, dst_side in zip(sidecar_paths(src_png), sidecar_paths(dst_png)):
+        if src_side.is_file():
+            shutil.copy2(src_side, dst_side)
+
+
+def save_labels(png_path: Path, labels: np.ndarray, colors: np.ndarray, *, full_frame: bool) -> tuple[Path, Path]:
+    """
+    Write the sidecars for `png_path`. `labels` holds 0..n-1 and `colors[i]` is
+    the RGB used for label i in the PNG.
+    """
+    labels = np.asarray(labels)
+    n = int(len(colors))
+    compact = labels.astype(np.uint8 if n <= 256 else np.uint16)
+    h, w = compact.shape
+
+    flat = compact.reshape(-1)
+    counts = np.bincount(flat, minlength=n)
+    ys, xs = np.divmod(np.arange(flat.size), w)
+    sum_x = np.bincount(flat, weights=xs, minlength=n)
+    sum_y = np.bincount(flat, weights=ys, minlength=n)
+
+    entries = []
+    for i in range(n):
+        c = int(counts[i])
+        entries.append(
+            {
+                "label": i,
+                "count": c,
+                "centroid": [float(sum_x[i] / c), float(sum_y[i] / c)] if c else None,
+                "color": [int(v) for v in colors[i]],
+            }
+        )
+
+    labels_path, summary_path = sidecar_paths(png_path)
+    labels_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(labels_path, compact, allow_pickle=False)
+    summary = {
+        "version": SUMMARY_VERSION,
+        "png": Path(png_path).name,
+        "shape": [h, w],
+        "full_frame": bool(full_frame),
+        "labels": entries,
+    }
+    # Summary last: its presence (and mtime) marks a complete, current artifact.
+    summary_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return labels_path, summary_path
+
+
+def load_summary(png_path: Path) -> dict | None:
+    """Summary for a full-frame label map PNG, or None if unusable (use the PNG)."""
+    png_path = Path(png_path)
+    _labels_path, summary_path = sidecar_paths(png_path)
+    try:
+        if png_path.exists() and summary_path.stat().st_mtime_ns < png_path.stat().st_mtime_ns:
+            return None
+        summary = json.loads(summary_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if summary.get("version") != SUMMARY_VERSION or not summary.get("full_frame"):
+        return None
+    return summary
+
+
+def load_labels(png_path: Path) -> tuple[np.ndarray, dict] | None:
+    """(labels memmap, summary) for a full-frame label map PNG, or None."""
+    summary = load_summary(png_path)
+    if summary is None:
+        return None
+    labels_path, _summary_path = sidecar_paths(png_path)
+    try:
+        labels = np.load(labels_path, mmap_mode="r", allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    if list(labels.shape) != summary["shape"]:
+        return None
+    return labels, summary
+
+
+def labels_by_count(summary: dict) -> list[dict]:
+    """
+    Non-empty labels, most pixels first; ties go to the smaller RGB (the order
+    np.unique over the PNG colours would give).
+    """
+    entries = [e for e in summary["labels"] if e["count"] > 0]
+    return sorted(entries, key=lambda e: (-e["count"], e["color"]))
+
+
+def background_stats(summary: dict) -> tuple[tuple[int, int, int], float, float, int, float, int, int]:
+    """
+    Same result as find_similar_middle_particles.stats_background_and_other,
+    computed from the summary alone (no pixel data).
+    """
+    h, w = summary["shape"]
+    total = h * w
+    ranked = labels_by_count(summary)
+    if not ranked:
+        return (0, 0, 0), 0.0, 0.0, 0, 0.0, 0, 0
+
+    bg = ranked[0]
+    others = ranked[1:]
+    n_bg = int(bg["count"])
+    n_other = total - n_bg
+    bg_pct = (100.0 * n_bg / total) if total else 0.0
+    other_pct = (100.0 * n_other / total) if total else 0.0
+
+    off_pct = 0.0
+    if others:
+        mx = sum(e["count"] * e["centroid"][0] for e in others) / n_other
+        my = sum(e["count"] * e["centroid"][1] for e in others) / n_other
+        cx, cy = (w - 1) / 2.0, (h - 1) / 2.0
+        dist = float(np.hypot(mx - cx, my - cy))
+        half_diag = 0.5 * float(np.hypot(w, h))
+        off_pct = (100.0 * dist / half_diag) if half_diag > 0 else 0.0
+
+    return tuple(bg["color"]), bg_pct, other_pct, len(others), off_pct, n_bg, n_other
@@ -0,0 +1,119 @@
+"""
+Per-cube manifest of clustering runs, used to skip unchanged work.
+
+`<detect dir>/cluster_manifest.json` maps each cheese HDR name to the input
+fingerprint it was clustered from (header SHA-256, data file size, mtime and
+SHA-256), the clustering parameters and the output PNG name. The manifest lives
+next to the outputs, so it moves with the cube folder (move_dirs_to_network).
+
+An HDR is up to date when the output exists and parameters and fingerprint
+match. A changed data-file mtime with an unchanged size (e.g. after a copy to
+a share with coarser timestamps) is settled by re-hashing instead of re-clustering.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from hsi_cube import find_data_file
+
+MANIFEST_NAME = "cluster_manifest.json"
+# Bump when the clustering output for the same inputs/parameters changes.
+MANIFEST_VERSION = 1
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def quick_fingerprint(hdr_path: Path) -> dict:
+    """Cheap part of the fingerprint: header hash plus data file size/mtime."""
+    data_path = find_data_file(hdr_path)
+    st = data_path.stat()
+    return {
+        "hdr_sha256": file_sha256(hdr_path),
+        "data_file": data_path.name,
+        "data_size": st.st_size,
+        "data_mtime_ns": st.st_mtime_ns,
+    }
+
+
+def full_fingerprint(hdr_path: Path) -> dict:
+    fp = quick_fingerprint(hdr_path)
+    fp["data_sha256"] = file_sha256(Path(hdr_path).with_name(fp["data_file"]))
+    return fp
+
+
+class ClusterManifest:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        self._dirty = False
+        try:
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if isinstance(raw, dict) and raw.get("version") == MANIFEST_VERSION:
+            self.entries = dict(raw.get("entries") or {})
+
+    @classmethod
+    def for_dir(cls, output_dir: Path) -> "ClusterManifest":
+        return cls(Path(output_dir) / MANIFEST_NAME)
+
+    def is_up_to_date(self, hdr_path: Path, output_dir: Path, params: dict) -> bool:
+        entry = self.entries.get(Path(hdr_path).name)
+        if not entry or entry.get("params") != params:
+            return False
+        output = Path(output_dir) / str(entry.get("output", ""))
+        if not entry.get("output") or not output.is_file():
+            return False
+        try:
+            current = quick_fingerprint(hdr_path)
+        except OSError:
+            return False
+        stored = entry.get("input") or {}
+        for key in ("hdr_sha256", "data_file", "data_size"):
+            if stored.get(key) != current[key]:
+                return False
+        if stored.get("data_mtime_ns") == current["data_mtime_ns"]:
+            return True
+        try:
+            same = file_sha256(Path(hdr_path).with_name(current["data_file"])) == stored.get("data_sha256")
+        except OSError:
+            return False
+        if same:
+            stored["data_mtime_ns"] = current["data_mtime_ns"]
+            self._dirty = True
+        return same
+
+    def record(self, hdr_path: Path, output: Path, params: dict, fingerprint: dict) -> None:
+        """`fingerprint` is full_fingerprint(hdr_path) taken before the output was built."""
+        self.entries[Path(hdr_path).name] = {
+            "input": dict(fingerprint),
+            "params": params,
+            "output": Path(output).name,
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"version": MANIFEST_VERSION, "entries": self.entries}, indent=2, sort_keys=True),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        self._dirty = False
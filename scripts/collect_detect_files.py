@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import argparse
-import shutil
 import sys
 from fnmatch import fnmatch
 from pathlib import Path
@@ -13,6 +12,7 @@ for _p in (_ROOT, _SCRIPTS):
 		sys.path.insert(0, str(_p))
 
 import ingest_hsm_capture as hsm  # noqa: E402
+from cluster_labels import copy_with_sidecars, is_sidecar  # noqa: E402
 
 
 def unique_target_path(target_dir: Path, src_name: str) -> Path:
@@ -79,13 +79,14 @@ def main() -> int:
 			continue
 		total_dirs += 1
 		for src in detect_dir.iterdir():
-			if not src.is_file():
+			if not src.is_file() or is_sidecar(src):
 				continue
 			total_files += 1
 			if not matches_wildcard(src.name, args.wildcard):
 				continue
 			dst = unique_target_path(out_dir, src.name)
-			shutil.copy2(src, dst)
+			# Label sidecars follow their PNG (renamed with it on collisions).
+			copy_with_sidecars(src, dst)
 			total_copied += 1
 
 	print(f"wildcard: {args.wildcard}")
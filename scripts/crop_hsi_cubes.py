@@ -24,8 +24,12 @@ for _p in (_ROOT, _SCRIPTS):
         sys.path.insert(0, str(_p))
 
 import ingest_hsm_capture as hsm  # noqa: E402
+from hsi_cube import EnviCube, open_cube  # noqa: E402
 
 
+# Copy buffer for streaming crops (per block of lines).
+DEFAULT_BUFFER_BYTES = 4 * 1024 * 1024
+
 CHEESE_RE = re.compile(r"^(?P<base>.+)_cheese_(?P<num>\d+)$", re.IGNORECASE)
 
 
@@ -73,12 +77,30 @@ def iter_cube_hdrs(cube_dir: Path, hdr_glob: str) -> Iterable[Path]:
             yield p
 
 
-def _dtype_from_envi_metadata(img: "envi.SpyFile") -> np.dtype:
-    md = img.metadata or {}
-    dtype_code = str(md.get("data type", "4"))
-    mapping = {code: dt for code, dt in envi.dtype_map}
-    # Default to float32 if unknown.
-    return np.dtype(mapping.get(dtype_code, np.float32))
+def _iter_window_blocks(cube: EnviCube, window: Tuple[int, int, int, int], buffer_bytes: int) -> Iterable[np.ndarray]:
+    """
+    Yield the cropped window in output file order, as blocks of whole lines
+    (whole band-lines for BSQ) of at most ~buffer_bytes each.
+    """
+    top, bottom, left, right = window
+    raw = cube.raw
+    itemsize = raw.dtype.itemsize
+    if cube.interleave == "bsq":
+        line_bytes = (right - left) * itemsize
+        step = max(1, buffer_bytes // max(1, line_bytes))
+        for b in range(raw.shape[0]):
+            for start in range(top, bottom, step):
+                yield raw[b, start:min(start + step, bottom), left:right]
+        return
+
+    line_bytes = (right - left) * cube.bands * itemsize
+    step = max(1, buffer_bytes // max(1, line_bytes))
+    for start in range(top, bottom, step):
+        stop = min(start + step, bottom)
+        if cube.interleave == "bil":
+            yield raw[start:stop, :, left:right]
+        else:
+            yield raw[start:stop, left:right, :]
 
 
 def crop_and_save_envi_cube(
@@ -88,9 +110,15 @@ def crop_and_save_envi_cube(
     crop_percent: int,
     tag_prefix: str = "cr",
     force: bool = False,
+    buffer_bytes: int = DEFAULT_BUFFER_BYTES,
 ) -> Optional[Path]:
     """
-    Load cube, crop center window, write ENVI output.
+    Stream the center crop window of a cube into a new ENVI .img/.hdr pair.
+
+    The source is memory-mapped and copied block by block (bounded by
+    buffer_bytes), keeping its dtype, byte order and interleave, so peak memory
+    does not grow with cube size. The .hdr is written last: an interrupted run
+    leaves no header and is redone on the next pass.
     Returns out_hdr_path on success, None on skip.
     """
     if out_hdr_path.exists() and not force:
@@ -98,60 +126,25 @@ def crop_and_save_envi_cube(
 
     out_hdr_path.parent.mkdir(parents=True, exist_ok=True)
 
-    img = envi.open(str(hdr_path))
-    md = img.metadata or {}
-
-    # Parse dimensions from metadata (avoids relying on the data payload).
-    h = int(md.get("lines", md.get("LINES", 0)))
-    w = int(md.get("samples", md.get("SAMPLES", 0)))
-    if h <= 0 or w <= 0:
-        # Fallback: load the array to figure shape.
-        arr_full = img.load()
-        if arr_full.ndim != 3:
-            raise ValueError(f"Unsupported cube array shape: {arr_full.shape} ({hdr_path})")
-        h, w = int(arr_full.shape[0]), int(arr_full.shape[1])
-    else:
-        # We'll still need the full array to crop.
-        arr_full = img.load()
-
-    if arr_full.ndim == 3:
-        lines, samples, bands = arr_full.shape
-    elif arr_full.ndim == 2:
-        lines, samples = arr_full.shape
-        bands = 1
-        arr_full = arr_full[:, :, None]
-    else:
-        raise ValueError(f"Unsupported cube array shape: {arr_full.shape} ({hdr_path})")
-
+    cube = open_cube(hdr_path)
+    lines, samples, bands = cube.shape
     top, bottom, left, right = compute_crop_window(lines, samples, crop_percent)
-    cropped = arr_full[top:bottom, left:right, :]
-
-    dtype = _dtype_from_envi_metadata(img)
-    cropped = np.asarray(cropped, dtype=dtype)
-
-    interleave = str(md.get("interleave", "bil")).lower()
-    byteorder_raw = md.get("byte order", 0)
-    try:
-        byteorder = int(byteorder_raw)
-    except Exception:
-        byteorder = 0
-
-    # Keep original metadata where possible, but fix dims for the new cube.
-    out_md = dict(md)
-    out_md["lines"] = str(cropped.shape[0])
-    out_md["samples"] = str(cropped.shape[1])
-    out_md["bands"] = str(cropped.shape[2])
-
-    # spectral will choose the `.img` extension by default.
-    envi.save_image(
-        str(out_hdr_path),
-        cropped,
-        dtype=dtype,
-        force=force,
-        interleave=interleave,
-        byteorder=byteorder,
-        metadata=out_md,
-    )
+
+    out_img_path = out_hdr_path.with_suffix(".img")
+    with out_img_path.open("wb") as f:
+        for block in _iter_window_blocks(cube, (top, bottom, left, right), buffer_bytes):
+            # Contiguous copy of one block only; written in the source byte order.
+            np.ascontiguousarray(block).tofile(f)
+
+    # Keep original metadata where possible, but fix dims/layout for the new cube.
+    out_md = dict(cube.metadata)
+    out_md["lines"] = str(bottom - top)
+    out_md["samples"] = str(right - left)
+    out_md["bands"] = str(bands)
+    out_md["header offset"] = "0"
+    out_md["interleave"] = cube.interleave
+    out_md["byte order"] = "1" if cube.dtype.byteorder == ">" else "0"
+    envi.write_envi_header(str(out_hdr_path), out_md)
     return out_hdr_path
 
 
@@ -164,6 +157,7 @@ def process_all_cubes(
     out_subdir: str,
     force: bool,
     limit: int,
+    buffer_bytes: int = DEFAULT_BUFFER_BYTES,
 ) -> int:
     root = Path(root)
     if not root.is_dir():
@@ -197,6 +191,7 @@ def process_all_cubes(
                 crop_percent=crop_percent,
                 tag_prefix=tag_prefix,
                 force=force,
+                buffer_bytes=buffer_bytes,
             )
             if out is None:
                 skipped += 1
@@ -225,6 +220,7 @@ def main() -> int:
     parser.add_argument("--out-subdir", default="", help="Optional subdir to write outputs into")
     parser.add_argument("--limit", type=int, default=0, help="Only process the N newest cube_* folders (0=all)")
     parser.add_argument("--force", action="store_true", help="Overwrite existing output .hdr/.img")
+    parser.add_argument("--buffer-mb", type=float, default=4.0, help="Copy buffer size in MB (default: 4)")
     args = parser.parse_args()
 
     return process_all_cubes(
@@ -235,6 +231,7 @@ def main() -> int:
         out_subdir=args.out_subdir,
         force=args.force,
         limit=args.limit,
+        buffer_bytes=max(1, int(args.buffer_mb * 1024 * 1024)),
     )
 
 
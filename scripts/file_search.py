@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import json
 import os
 import re
-from dataclasses import dataclass
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -16,6 +21,15 @@ _DEFAULT_SEARCH_ROOTS = [
 ]
 
 _search_roots: list[Path] | None = None
+_search_recursive: bool | None = None
+
+# Seconds between checks of the search roots for added/removed files.
+_INDEX_REFRESH_SECONDS = float(os.getenv("SAVVFASTAPI_FILE_INDEX_REFRESH_SECONDS", "2") or 0)
+# Persistent index used in recursive mode (e.g. HSM_CAPTURE/cube_*/detect/*.png).
+_DEFAULT_INDEX_DB = _PROJECT_ROOT / "file_index.db"
+
+# Concurrent stat() calls for batch metadata lookups (overlaps network-share latency).
+FILE_STAT_WORKERS = int(os.getenv("SAVVFASTAPI_FILE_STAT_WORKERS", "16") or 16)
 
 _SAFE_FILENAME_RE = re.compile(r"^[A-Za-z0-9._-]+\.png$", re.IGNORECASE)
 
@@ -28,6 +42,12 @@ class FoundFile:
 	modified_at: datetime
 	created_at: datetime | None
 
+	@property
+	def etag(self) -> str:
+		"""Strong validator from size + mtime (changes whenever the file is rewritten)."""
+		mtime_us = int(self.modified_at.timestamp() * 1_000_000)
+		return f'"{self.size_bytes:x}-{mtime_us:x}"'
+
 
 def _parse_roots_from_env() -> list[Path]:
 	raw = os.getenv("SAVVFASTAPI_FILE_SEARCH_ROOTS", "").strip()
@@ -43,16 +63,27 @@ def get_search_roots() -> list[Path]:
 	return list(_search_roots)
 
 
-def set_search_roots(roots: list[Path | str]) -> None:
+def is_recursive_search() -> bool:
+	"""Whether subdirectories of the search roots are searched too."""
+	if _search_recursive is not None:
+		return _search_recursive
+	return os.getenv("SAVVFASTAPI_FILE_SEARCH_RECURSIVE", "0") == "1"
+
+
+def set_search_roots(roots: list[Path | str], recursive: bool | None = None) -> None:
 	"""Override search roots (used in tests)."""
-	global _search_roots
+	global _search_roots, _search_recursive
 	_search_roots = [Path(root) for root in roots]
+	_search_recursive = recursive
+	_reset_file_index()
 
 
 def reset_search_roots() -> None:
 	"""Restore search roots from environment/default configuration."""
-	global _search_roots
+	global _search_roots, _search_recursive
 	_search_roots = None
+	_search_recursive = None
+	_reset_file_index()
 
 
 def validate_png_filename(filename: str) -> str:
@@ -68,8 +99,8 @@ def validate_png_filename(filename: str) -> str:
 	if not name:
 		raise ValueError("filename is required")
 
-	# Reject any path separators or absolute paths early.
-	if name != Path(name).name:
+	# Reject any path separators or absolute paths early (both styles, whatever the host OS).
+	if "\\" in name or name != Path(name).name:
 		raise ValueError("filename must not contain path separators")
 	if Path(name).is_absolute():
 		raise ValueError("filename must not be an absolute path")
@@ -86,13 +117,354 @@ def _stat_datetime(ts: float) -> datetime:
 	return datetime.fromtimestamp(ts, tz=timezone.utc)
 
 
-def find_png_file(filename: str, roots: list[Path] | None = None) -> FoundFile | None:
+def _found_file(path: Path, root: Path, stat: os.stat_result) -> FoundFile:
+	created_at = None
+	if hasattr(stat, "st_birthtime"):
+		created_at = _stat_datetime(stat.st_birthtime)
+	elif os.name == "nt":
+		created_at = _stat_datetime(stat.st_ctime)
+
+	return FoundFile(
+		path=path,
+		root=root,
+		size_bytes=stat.st_size,
+		modified_at=_stat_datetime(stat.st_mtime),
+		created_at=created_at,
+	)
+
+
+@dataclass
+class _DirState:
+	mtime_ns: int
+	files: list[str] = field(default_factory=list)
+	subdirs: list[str] = field(default_factory=list)
+
+
+class _IndexStore:
+	"""SQLite persistence of scanned directories, so restarts skip the full walk."""
+
+	def __init__(self, path: Path):
+		self.path = Path(path)
+		conn = self._connect()
+		try:
+			conn.execute(
+				"""
+				CREATE TABLE IF NOT EXISTS dirs (
+					root TEXT NOT NULL,
+					dir TEXT NOT NULL,
+					mtime_ns INTEGER NOT NULL,
+					subdirs TEXT NOT NULL,
+					PRIMARY KEY (root, dir)
+				)
+				"""
+			)
+			conn.execute(
+				"""
+				CREATE TABLE IF NOT EXISTS files (
+					root TEXT NOT NULL,
+					dir TEXT NOT NULL,
+					name TEXT NOT NULL,
+					PRIMARY KEY (root, dir, name)
+				)
+				"""
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS idx_files_name ON files(name COLLATE NOCASE)")
+			conn.commit()
+		finally:
+			conn.close()
+
+	def _connect(self) -> sqlite3.Connection:
+		self.path.parent.mkdir(parents=True, exist_ok=True)
+		return sqlite3.connect(self.path)
+
+	def load(self, root: Path) -> dict[Path, _DirState]:
+		tree: dict[Path, _DirState] = {}
+		conn = self._connect()
+		try:
+			for dir_text, mtime_ns, subdirs in conn.execute(
+				"SELECT dir, mtime_ns, subdirs FROM dirs WHERE root = ?", (str(root),)
+			):
+				tree[Path(dir_text)] = _DirState(mtime_ns=mtime_ns, subdirs=json.loads(subdirs))
+			for dir_text, name in conn.execute("SELECT dir, name FROM files WHERE root = ?", (str(root),)):
+				state = tree.get(Path(dir_text))
+				if state is not None:
+					state.files.append(name)
+		finally:
+			conn.close()
+		return tree
+
+	def save(self, root: Path, updated: dict[Path, _DirState], removed: set[Path]) -> None:
+		conn = self._connect()
+		try:
+			with conn:
+				for d in set(updated) | removed:
+					conn.execute("DELETE FROM dirs WHERE root = ? AND dir = ?", (str(root), str(d)))
+					conn.execute("DELETE FROM files WHERE root = ? AND dir = ?", (str(root), str(d)))
+				for d, state in updated.items():
+					conn.execute(
+						"INSERT INTO dirs(root, dir, mtime_ns, subdirs) VALUES(?, ?, ?, ?)",
+						(str(root), str(d), state.mtime_ns, json.dumps(state.subdirs)),
+					)
+					conn.executemany(
+						"INSERT INTO files(root, dir, name) VALUES(?, ?, ?)",
+						[(str(root), str(d), name) for name in state.files],
+					)
+		finally:
+			conn.close()
+
+
+class FileIndex:
 	"""
-	Search roots in order for filename. Return metadata for the first existing file.
+	In-memory filename -> path index over the search roots.
+
+	Lookups are dictionary hits; a miss is answered without touching the
+	filesystem. At most every `refresh_seconds`, a lookup starts a background
+	refresh that checks directory mtimes and rescans only directories that
+	changed (files added/removed/renamed); lookups keep being served from the
+	current index meanwhile. With `recursive=True` every subdirectory is indexed as well
+	(within a root, shallower/lexicographically first paths win on duplicate
+	names), and with a `store_path` the scanned directories are persisted in
+	SQLite so a restart only rescans what changed. A root that is unavailable
+	(e.g. network share down) is indexed as empty and retried on the next refresh.
 	"""
-	safe_name = validate_png_filename(filename)
-	search_roots = roots if roots is not None else get_search_roots()
 
+	def __init__(
+		self,
+		roots: list[Path],
+		refresh_seconds: float = _INDEX_REFRESH_SECONDS,
+		recursive: bool = False,
+		store_path: Path | None = None,
+	):
+		self.roots = [Path(root) for root in roots]
+		self.refresh_seconds = refresh_seconds
+		self.recursive = recursive
+		self._store = _IndexStore(store_path) if store_path is not None else None
+		self._resolved: list[Path | None] = [None] * len(self.roots)
+		self._trees: list[dict[Path, _DirState]] = [{} for _ in self.roots]
+		self._loaded = False
+		self._merged: dict[str, tuple[Path, Path]] = {}
+		self._checked_at: float | None = None
+		self._lock = threading.Lock()
+		self._refresher: threading.Thread | None = None
+		self._refresher_lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.rescans = 0
+
+	def _scan_dir(self, directory: Path, root_resolved: Path, mtime_ns: int) -> _DirState:
+		state = _DirState(mtime_ns=mtime_ns)
+		with os.scandir(directory) as entries:
+			for entry in entries:
+				try:
+					if self.recursive and entry.is_dir(follow_symlinks=False):
+						state.subdirs.append(entry.name)
+						continue
+					if not _SAFE_FILENAME_RE.match(entry.name) or not entry.is_file():
+						continue
+					if entry.is_symlink():
+						# Ensure resolved path stays inside the configured root.
+						Path(entry.path).resolve().relative_to(root_resolved)
+				except (OSError, ValueError):
+					continue
+				state.files.append(entry.name)
+		state.files.sort()
+		state.subdirs.sort()
+		self.rescans += 1
+		return state
+
+	def _refresh_root(self, i: int) -> bool:
+		tree = self._trees[i]
+		try:
+			root_resolved = self.roots[i].resolve()
+			os.stat(root_resolved)
+		except OSError:
+			if not tree:
+				return False
+			removed = set(tree)
+			tree.clear()
+			self._save(i, {}, removed)
+			return True
+		self._resolved[i] = root_resolved
+
+		updated: dict[Path, _DirState] = {}
+		seen: set[Path] = set()
+		stack = [root_resolved]
+		while stack:
+			directory = stack.pop()
+			try:
+				mtime_ns = os.stat(directory).st_mtime_ns
+			except OSError:
+				continue
+			state = tree.get(directory)
+			if state is None or state.mtime_ns != mtime_ns:
+				try:
+					state = self._scan_dir(directory, root_resolved, mtime_ns)
+				except OSError:
+					continue
+				tree[directory] = state
+				updated[directory] = state
+			seen.add(directory)
+			if self.recursive:
+				stack.extend(directory / name for name in state.subdirs)
+
+		removed = set(tree) - seen
+		for directory in removed:
+			del tree[directory]
+		if updated or removed:
+			self._save(i, updated, removed)
+			return True
+		return False
+
+	def _save(self, i: int, updated: dict[Path, _DirState], removed: set[Path]) -> None:
+		root = self._resolved[i]
+		if self._store is None or root is None:
+			return
+		try:
+			self._store.save(root, updated, removed)
+		except sqlite3.Error:
+			# The on-disk copy is only a warm-start cache; the in-memory index stays valid.
+			pass
+
+	def _load_store(self) -> None:
+		if self._store is None:
+			return
+		for i, root in enumerate(self.roots):
+			try:
+				root_resolved = root.resolve()
+				self._trees[i] = self._store.load(root_resolved)
+			except (OSError, sqlite3.Error):
+				continue
+			self._resolved[i] = root_resolved
+
+	def _rebuild_merged(self) -> None:
+		merged: dict[str, tuple[Path, Path]] = {}
+		# Later roots first so earlier roots win (first match in search order).
+		for i in reversed(range(len(self.roots))):
+			root = self._resolved[i] or self.roots[i]
+			per_root: dict[str, tuple[Path, Path]] = {}
+			for directory in sorted(self._trees[i], key=lambda d: (len(d.parts), str(d))):
+				for name in self._trees[i][directory].files:
+					per_root.setdefault(name.lower(), (directory / name, root))
+			merged.update(per_root)
+		self._merged = merged
+
+	def refresh(self, force: bool = False) -> None:
+		"""Pick up added/removed files; `force` checks now instead of waiting for the interval."""
+		with self._lock:
+			now = time.monotonic()
+			if not force and self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+				return
+			changed = False
+			if not self._loaded:
+				self._load_store()
+				self._loaded = True
+				changed = True
+			for i in range(len(self.roots)):
+				changed = self._refresh_root(i) or changed
+			if changed:
+				self._rebuild_merged()
+			self._checked_at = time.monotonic()
+
+	def _warm_start(self) -> bool:
+		"""Load the persisted index once; True when it has directories to serve from."""
+		with self._lock:
+			if not self._loaded:
+				self._load_store()
+				self._loaded = True
+				self._rebuild_merged()
+			return any(self._trees)
+
+	def refresh_if_stale(self) -> None:
+		"""
+		Make sure a refresh is under way once `refresh_seconds` have passed.
+
+		Walks run on a background thread. Only a cold start (no persisted
+		index to serve from) walks the roots on the calling thread.
+		"""
+		if not self._loaded and not self._warm_start():
+			self.refresh()
+			return
+		checked_at = self._checked_at
+		if checked_at is not None and time.monotonic() - checked_at < self.refresh_seconds:
+			return
+		with self._refresher_lock:
+			if self._refresher is not None and self._refresher.is_alive():
+				return
+			self._refresher = threading.Thread(target=self.refresh, name="file-index-refresh", daemon=True)
+			self._refresher.start()
+
+	def _rescan_parent(self, path: Path) -> None:
+		"""Rescan just the directory that held `path` (a file found missing on lookup)."""
+		directory = path.parent
+		with self._lock:
+			changed = False
+			for i, tree in enumerate(self._trees):
+				if directory not in tree or self._resolved[i] is None:
+					continue
+				try:
+					mtime_ns = os.stat(directory).st_mtime_ns
+					state = self._scan_dir(directory, self._resolved[i], mtime_ns)
+				except OSError:
+					# Directory gone: drop its files now, the next refresh prunes the subtree.
+					state = _DirState(mtime_ns=-1)
+				tree[directory] = state
+				self._save(i, {directory: state}, set())
+				changed = True
+			if changed:
+				self._rebuild_merged()
+
+	def lookup(self, safe_name: str) -> FoundFile | None:
+		self.refresh_if_stale()
+		entry = self._merged.get(safe_name.lower())
+		if entry is None:
+			self.misses += 1
+			return None
+		path, root = entry
+		try:
+			stat = path.stat()
+		except OSError:
+			# Deleted since the last scan: rescan its directory now and retry once.
+			self._rescan_parent(path)
+			entry = self._merged.get(safe_name.lower())
+			if entry is None:
+				self.misses += 1
+				return None
+			path, root = entry
+			try:
+				stat = path.stat()
+			except OSError:
+				self.misses += 1
+				return None
+		self.hits += 1
+		return _found_file(path, root, stat)
+
+	def stats(self) -> dict[str, int]:
+		return {"files": len(self._merged), "hits": self.hits, "misses": self.misses, "rescans": self.rescans}
+
+
+_file_index: FileIndex | None = None
+_file_index_lock = threading.Lock()
+
+
+def _reset_file_index() -> None:
+	global _file_index
+	with _file_index_lock:
+		_file_index = None
+
+
+def get_file_index() -> FileIndex:
+	"""Index over the configured search roots (rebuilt when roots change)."""
+	global _file_index
+	with _file_index_lock:
+		if _file_index is None:
+			recursive = is_recursive_search()
+			store = os.getenv("SAVVFASTAPI_FILE_INDEX_DB", "").strip()
+			store_path = Path(store) if store else (_DEFAULT_INDEX_DB if recursive else None)
+			_file_index = FileIndex(get_search_roots(), recursive=recursive, store_path=store_path)
+		return _file_index
+
+
+def _probe_roots(safe_name: str, search_roots: list[Path]) -> FoundFile | None:
 	for root in search_roots:
 		candidate = (root / safe_name).resolve()
 		root_resolved = root.resolve()
@@ -106,19 +478,59 @@ def find_png_file(filename: str, roots: list[Path] | None = None) -> FoundFile |
 		if not candidate.is_file():
 			continue
 
-		stat = candidate.stat()
-		created_at = None
-		if hasattr(stat, "st_birthtime"):
-			created_at = _stat_datetime(stat.st_birthtime)
-		elif os.name == "nt":
-			created_at = _stat_datetime(stat.st_ctime)
-
-		return FoundFile(
-			path=candidate,
-			root=root_resolved,
-			size_bytes=stat.st_size,
-			modified_at=_stat_datetime(stat.st_mtime),
-			created_at=created_at,
-		)
+		return _found_file(candidate, root_resolved, candidate.stat())
 
 	return None
+
+
+def find_png_file(filename: str, roots: list[Path] | None = None) -> FoundFile | None:
+	"""
+	Search roots in order for filename. Return metadata for the first existing file.
+
+	The configured roots are served from the cached FileIndex; explicit `roots`
+	are probed directly on disk.
+	"""
+	safe_name = validate_png_filename(filename)
+	if roots is not None:
+		return _probe_roots(safe_name, roots)
+	return get_file_index().lookup(safe_name)
+
+
+_stat_executor: ThreadPoolExecutor | None = None
+_stat_executor_lock = threading.Lock()
+
+
+def _get_stat_executor() -> ThreadPoolExecutor:
+	global _stat_executor
+	if _stat_executor is None:
+		with _stat_executor_lock:
+			if _stat_executor is None:
+				_stat_executor = ThreadPoolExecutor(max_workers=max(1, FILE_STAT_WORKERS), thread_name_prefix="file-stat")
+	return _stat_executor
+
+
+def shutdown_stat_executor() -> None:
+	global _stat_executor
+	with _stat_executor_lock:
+		executor, _stat_executor = _stat_executor, None
+	if executor is not None:
+		executor.shutdown(wait=True)
+
+
+def find_png_files(filenames: list[str], roots: list[Path] | None = None) -> dict[str, FoundFile | None]:
+	"""
+	Resolve many filenames like find_png_file, with the stat() calls run
+	concurrently on a shared thread pool. Duplicates are resolved once.
+
+	Raises ValueError if any filename is invalid (validate first to report per name).
+	"""
+	names = list(dict.fromkeys(filenames))
+	for name in names:
+		validate_png_filename(name)
+	if roots is None:
+		# One staleness check up front instead of racing workers into it.
+		get_file_index().refresh_if_stale()
+	if len(names) <= 1:
+		return {name: find_png_file(name, roots) for name in names}
+	results = _get_stat_executor().map(lambda name: find_png_file(name, roots), names)
+	return dict(zip(names, results))
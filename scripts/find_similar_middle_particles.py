@@ -3,11 +3,12 @@ from __future__ import annotations
 import argparse
 from fnmatch import fnmatch
 from pathlib import Path
-import shutil
 
 import matplotlib.image as mpimg
 import numpy as np
 
+from cluster_labels import background_stats, copy_with_sidecars, load_summary
+
 DEFAULT_SCAN_DIR = Path(r"C:\Users\1\PycharmProjects\savvfastapi\HSM_detect_2clust\test")
 DEFAULT_REFERENCE = "cube_27_03_18_11_16_cr10p_cheese_1_2cluster0p_1.png"
 DEFAULT_WILDCARD = "_2cluster0p"
@@ -36,6 +37,12 @@ def load_rgb(path: Path) -> np.ndarray:
     return arr
 
 
+def pack_rgb(img: np.ndarray) -> np.ndarray:
+    """HxWx3 uint8 -> HxW uint32 colour keys (r << 16 | g << 8 | b)."""
+    rgb = img[:, :, :3].astype(np.uint32)
+    return (rgb[:, :, 0] << 16) | (rgb[:, :, 1] << 8) | rgb[:, :, 2]
+
+
 def stats_background_and_other(img: np.ndarray) -> tuple[
     tuple[int, int, int],
     float,
@@ -60,28 +67,30 @@ def stats_background_and_other(img: np.ndarray) -> tuple[
     """
     h, w = img.shape[:2]
     total = h * w
-    pix = img.reshape(-1, 3).astype(np.uint8)
-    colors, counts = np.unique(pix, axis=0, return_counts=True)
+    keys = pack_rgb(img)
+    # 1-D sort of uint32 keys; ascending key order == the RGB lexicographic order
+    # np.unique(axis=0) used, so ties still resolve to the same background.
+    colors, counts = np.unique(keys.reshape(-1), return_counts=True)
     if counts.size == 0:
         return (0, 0, 0), 0.0, 0.0, 0, 0.0, 0, 0
 
     i_max = int(np.argmax(counts))
-    bg = tuple(int(x) for x in colors[i_max])
+    bg_key = int(colors[i_max])
+    bg = ((bg_key >> 16) & 0xFF, (bg_key >> 8) & 0xFF, bg_key & 0xFF)
     n_bg = int(counts[i_max])
     n_other = total - n_bg
     bg_pct = (100.0 * n_bg / total) if total else 0.0
     other_pct = (100.0 * n_other / total) if total else 0.0
 
-    bg_arr = np.array(bg, dtype=np.uint8)
-    mask_other = np.any(img != bg_arr, axis=2)
-    if not np.any(mask_other):
-        n_other_colors = 0
+    # Every other distinct key is a non-background colour.
+    n_other_colors = int(colors.size) - 1
+    if n_other == 0:
         off_pct = 0.0
     else:
-        other_pix = img[mask_other]
-        n_other_colors = len(np.unique(other_pix.reshape(-1, 3), axis=0))
-        ys, xs = np.where(mask_other)
-        mx, my = float(xs.mean()), float(ys.mean())
+        # Centroid from row/column counts of the non-background mask.
+        mask_other = keys != bg_key
+        my = float(mask_other.sum(axis=1) @ np.arange(h)) / n_other
+        mx = float(mask_other.sum(axis=0) @ np.arange(w)) / n_other
         cx, cy = (w - 1) / 2.0, (h - 1) / 2.0
         dist = float(np.hypot(mx - cx, my - cy))
         half_diag = 0.5 * float(np.hypot(w, h))
@@ -90,6 +99,25 @@ def stats_background_and_other(img: np.ndarray) -> tuple[
     return bg, bg_pct, other_pct, n_other_colors, off_pct, n_bg, n_other
 
 
+def stats_for_png(path: Path) -> tuple[
+    tuple[int, int, int],
+    float,
+    float,
+    int,
+    float,
+    int,
+    int,
+]:
+    """
+    stats_background_and_other for a cluster map PNG, read from its label
+    summary sidecar when present (no image decode), else from the pixels.
+    """
+    summary = load_summary(path)
+    if summary is not None:
+        return background_stats(summary)
+    return stats_background_and_other(load_rgb(path))
+
+
 def resolve_reference(scan_dir: Path, reference: str) -> Path:
     p = Path(reference)
     if p.is_file():
@@ -162,7 +190,7 @@ def main() -> int:
         ref_n_bg,
         ref_n_other,
     ) = stats_background_and_other(ref_img)
-    uniq_all = len(np.unique(ref_img.reshape(-1, 3), axis=0))
+    uniq_all = len(np.unique(pack_rgb(ref_img)))
 
     candidates = list_candidate_pngs(scan_dir, DEFAULT_WILDCARD)
     if not candidates:
@@ -185,8 +213,7 @@ def main() -> int:
     total = len(candidates)
     step = max(1, int(DEFAULT_PROGRESS_EVERY))
     for idx, p in enumerate(candidates, start=1):
-        img = load_rgb(p)
-        bg, bg_pct, o_pct, n_oc, off_pct, n_bg, n_o = stats_background_and_other(img)
+        bg, bg_pct, o_pct, n_oc, off_pct, n_bg, n_o = stats_for_png(p)
         rows.append((p, bg, bg_pct, o_pct, n_oc, off_pct, n_bg, n_o))
         if idx % step == 0 or idx == total:
             print(f"progress: {idx}/{total}")
@@ -205,7 +232,8 @@ def main() -> int:
     out_dir.mkdir(parents=True, exist_ok=True)
     copied = 0
     for p, _, _, _, _, _, _, _ in similar:
-        shutil.copy2(p, out_dir / p.name)
+        # Sidecars go along so the next stage (analyze on filtered/) skips decoding too.
+        copy_with_sidecars(p, out_dir / p.name)
         copied += 1
 
     print("=== reference image ===")
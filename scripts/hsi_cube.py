@@ -0,0 +1,269 @@
+"""
+Memory-mapped reader for ENVI HSI cubes (.hdr + .img/.dat/.raw/...).
+
+The data file is opened with np.memmap in its native interleave, byte order and
+header offset; callers get lazy (lines, samples, bands) views, so cropping,
+point extraction and region averaging only read the pages they touch instead of
+materializing the whole cube (and then a float64 copy of it).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import spectral.io.envi as envi
+
+# Data-file extensions tried next to the header (same list as spectral's envi.open).
+_DATA_EXTS = ("", ".img", ".dat", ".sli", ".hyspex", ".raw", ".bin")
+
+# Native on-disk axis order per interleave, and the transpose to (lines, samples, bands).
+_LAYOUTS = {
+    "bil": (("lines", "bands", "samples"), (0, 2, 1)),
+    "bip": (("lines", "samples", "bands"), (0, 1, 2)),
+    "bsq": (("bands", "lines", "samples"), (1, 2, 0)),
+}
+
+
+def resolve_hdr_path(path: Path) -> Path:
+    """Accept either the .hdr or the data file and return the header path."""
+    path = Path(path)
+    hdr_path = path if path.suffix.lower() == ".hdr" else path.with_suffix(".hdr")
+    if not hdr_path.is_file():
+        raise FileNotFoundError(f"ENVI header not found: {hdr_path}")
+    return hdr_path
+
+
+def find_data_file(hdr_path: Path, interleave: str = "") -> Path:
+    """Locate the binary data file next to an ENVI header."""
+    exts = list(_DATA_EXTS) + ([f".{interleave}"] if interleave else [])
+    for ext in exts + [e.upper() for e in exts if e]:
+        candidate = hdr_path.with_suffix(ext) if ext else hdr_path.with_suffix("")
+        if candidate.is_file():
+            return candidate
+    raise FileNotFoundError(f"ENVI data file not found for header: {hdr_path}")
+
+
+def _header_int(md: dict, key: str, default: int | None = None) -> int:
+    raw = md.get(key, default)
+    if raw is None:
+        raise ValueError(f"ENVI header is missing '{key}'")
+    return int(raw)
+
+
+@dataclass(frozen=True)
+class RegionStats:
+    """Per-label statistics; arrays are indexed [label] or [label, band]."""
+
+    counts: np.ndarray  # (n_labels,) pixel counts
+    mean: np.ndarray  # (n_labels, bands); NaN for empty labels
+    var: np.ndarray  # population variance
+    min: np.ndarray
+    max: np.ndarray
+
+
+@dataclass
+class EnviCube:
+    hdr_path: Path
+    data_path: Path
+    metadata: dict
+    interleave: str
+    scale_factor: float
+    raw: np.memmap  # native interleave layout
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.raw.dtype
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        lines, samples, bands = self.view().shape
+        return int(lines), int(samples), int(bands)
+
+    @property
+    def lines(self) -> int:
+        return self.shape[0]
+
+    @property
+    def samples(self) -> int:
+        return self.shape[1]
+
+    @property
+    def bands(self) -> int:
+        return self.shape[2]
+
+    def view(self) -> np.ndarray:
+        """Lazy (lines, samples, bands) view of the raw data (no copy, no scaling)."""
+        return self.raw.transpose(_LAYOUTS[self.interleave][1])
+
+    def window(self, top: int, bottom: int, left: int, right: int) -> np.ndarray:
+        """Lazy (lines, samples, bands) view of a rectangular window."""
+        return self.view()[top:bottom, left:right, :]
+
+    def rows(self, start: int, stop: int) -> np.ndarray:
+        return self.view()[start:stop]
+
+    def band(self, index: int) -> np.ndarray:
+        """Lazy (lines, samples) view of one band."""
+        return self.view()[:, :, index]
+
+    def _scaled(self, arr: np.ndarray, dtype: np.dtype | type) -> np.ndarray:
+        out = np.asarray(arr, dtype=dtype)
+        if self.scale_factor != 1:
+            out = out / np.asarray(self.scale_factor, dtype=out.dtype)
+        return out
+
+    def pixel(self, y: int, x: int, dtype: np.dtype | type = np.float32) -> np.ndarray:
+        """Spectrum at (y, x); reads only that pixel's bytes."""
+        if not (0 <= y < self.lines and 0 <= x < self.samples):
+            raise ValueError(f"Coordinates out of bounds: x={x}, y={y}, cube size is {self.samples}x{self.lines}")
+        return self._scaled(self.view()[y, x, :], dtype)
+
+    def pixels(self, ys: np.ndarray, xs: np.ndarray, dtype: np.dtype | type = np.float32) -> np.ndarray:
+        """
+        Spectra at many (y, x) points as (n, bands), gathered in one forward
+        pass over the file (points sorted by file offset, BSQ band by band).
+        """
+        ys = np.asarray(ys, dtype=np.intp)
+        xs = np.asarray(xs, dtype=np.intp)
+        if ys.shape != xs.shape or ys.ndim != 1:
+            raise ValueError("ys and xs must be 1-D arrays of equal length")
+        bad = (ys < 0) | (ys >= self.lines) | (xs < 0) | (xs >= self.samples)
+        if bad.any():
+            i = int(np.argmax(bad))
+            raise ValueError(
+                f"Coordinates out of bounds: x={xs[i]}, y={ys[i]}, cube size is {self.samples}x{self.lines}"
+            )
+
+        order = np.lexsort((xs, ys))
+        out = np.empty((ys.size, self.bands), dtype=self.dtype)
+        if self.interleave == "bsq":
+            for b in range(self.bands):
+                out[order, b] = self.raw[b][ys[order], xs[order]]
+        else:
+            out[order] = self.view()[ys[order], xs[order], :]
+        return self._scaled(out, dtype)
+
+    def region_stats(self, labels: np.ndarray, n_labels: int | None = None, chunk_lines: int = 256) -> RegionStats:
+        """
+        Count, mean, variance, min and max per label for every label at once.
+
+        `labels` is an integer (lines, samples) array; negative labels are
+        ignored. The cube is read once in blocks of lines: each block is
+        grouped by label (stable argsort) and reduced with np.add / np.minimum /
+        np.maximum .reduceat, so no per-label masked copy of the cube is made.
+        """
+        labels = np.asarray(labels)
+        if labels.shape != (self.lines, self.samples):
+            raise ValueError(f"Label shape {labels.shape} does not match cube {(self.lines, self.samples)}")
+        if not np.issubdtype(labels.dtype, np.integer):
+            raise ValueError("labels must be an integer array")
+        if n_labels is None:
+            n_labels = int(labels.max()) + 1 if labels.size else 0
+        bands = self.bands
+
+        counts = np.zeros(n_labels, dtype=np.int64)
+        sums = np.zeros((n_labels, bands), dtype=np.float64)
+        sq_sums = np.zeros((n_labels, bands), dtype=np.float64)
+        mins = np.full((n_labels, bands), np.inf)
+        maxs = np.full((n_labels, bands), -np.inf)
+
+        view = self.view()
+        step = max(1, int(chunk_lines))
+        for start in range(0, self.lines, step):
+            lab = labels[start:start + step].reshape(-1)
+            keep = (lab >= 0) & (lab < n_labels)
+            if not keep.any():
+                continue
+            block = np.asarray(view[start:start + step], dtype=np.float64).reshape(-1, bands)
+            if not keep.all():
+                lab = lab[keep]
+                block = block[keep]
+            order = np.argsort(lab, kind="stable")
+            lab = lab[order]
+            block = block[order]
+
+            block_counts = np.bincount(lab, minlength=n_labels)
+            present = np.flatnonzero(block_counts)
+            starts = np.concatenate(([0], np.cumsum(block_counts)[:-1]))[present]
+            counts += block_counts
+            sums[present] += np.add.reduceat(block, starts, axis=0)
+            sq_sums[present] += np.add.reduceat(block * block, starts, axis=0)
+            mins[present] = np.minimum(mins[present], np.minimum.reduceat(block, starts, axis=0))
+            maxs[present] = np.maximum(maxs[present], np.maximum.reduceat(block, starts, axis=0))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = counts[:, None].astype(np.float64)
+            mean = sums / n
+            var = np.maximum(sq_sums / n - mean * mean, 0.0)
+        empty = counts == 0
+        mins[empty] = np.nan
+        maxs[empty] = np.nan
+
+        scale = self.scale_factor
+        if scale != 1:
+            mean, var, mins, maxs = mean / scale, var / (scale * scale), mins / scale, maxs / scale
+        return RegionStats(counts=counts, mean=mean, var=var, min=mins, max=maxs)
+
+    def load(self, dtype: np.dtype | type = np.float32, scale: bool = True) -> np.ndarray:
+        """Materialize the whole cube as (lines, samples, bands) in one conversion."""
+        arr = np.array(self.view(), dtype=dtype)
+        if scale and self.scale_factor != 1:
+            arr /= np.asarray(self.scale_factor, dtype=arr.dtype)
+        return arr
+
+    def wavelengths(self) -> np.ndarray:
+        """Band centres from the header, or band indices when absent/unparseable."""
+        raw = self.metadata.get("wavelength")
+        bands = self.bands
+        if isinstance(raw, list) and len(raw) == bands:
+            vals: list[float] = []
+            for v in raw:
+                try:
+                    vals.append(float(v))
+                except (TypeError, ValueError):
+                    vals.append(float(len(vals)))
+            return np.asarray(vals, dtype=np.float32)
+        return np.arange(bands, dtype=np.float32)
+
+
+def open_cube(path: Path) -> EnviCube:
+    """Open an ENVI cube (.hdr or its data file) as a read-only memory map."""
+    hdr_path = resolve_hdr_path(path)
+    md = envi.read_envi_header(str(hdr_path))
+
+    interleave = str(md.get("interleave", "bsq")).strip().lower()
+    if interleave not in _LAYOUTS:
+        raise ValueError(f"Unsupported ENVI interleave '{interleave}' ({hdr_path})")
+
+    dtype_code = str(md.get("data type", "4")).strip()
+    base = {code: dt for code, dt in envi.dtype_map}.get(dtype_code)
+    if base is None:
+        raise ValueError(f"Unsupported ENVI data type '{dtype_code}' ({hdr_path})")
+    byte_order = _header_int(md, "byte order", 0)
+    dtype = np.dtype(base).newbyteorder(">" if byte_order == 1 else "<")
+
+    dims = {
+        "lines": _header_int(md, "lines"),
+        "samples": _header_int(md, "samples"),
+        "bands": _header_int(md, "bands", 1),
+    }
+    offset = _header_int(md, "header offset", 0)
+    data_path = find_data_file(hdr_path, interleave)
+
+    native_axes, _ = _LAYOUTS[interleave]
+    native_shape = tuple(dims[a] for a in native_axes)
+    needed = offset + int(np.prod(native_shape)) * dtype.itemsize
+    if data_path.stat().st_size < needed:
+        raise ValueError(f"ENVI data file {data_path} is smaller than its header describes ({needed} bytes)")
+
+    raw = np.memmap(data_path, dtype=dtype, mode="r", offset=offset, shape=native_shape)
+    return EnviCube(
+        hdr_path=hdr_path,
+        data_path=data_path,
+        metadata=md,
+        interleave=interleave,
+        scale_factor=float(md.get("reflectance scale factor", 1.0)),
+        raw=raw,
+    )
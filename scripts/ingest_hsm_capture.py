@@ -117,7 +117,11 @@ def upsert_scan_row(
 	"""
 	Insert a scan row only once for this exact source marker (Msg).
 	Returns True when inserted, False when already exists.
+	Text is normalized like db.insert_palletes_scan, since reads do not repair it.
 	"""
+	id_point, sscc, details, status, result, msg = db.fix_palletes_scan_text(
+		id_point, sscc, details, status, result, msg
+	)
 	conn = get_connection()
 	try:
 		conn.execute("BEGIN IMMEDIATE")
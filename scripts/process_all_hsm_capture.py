@@ -17,6 +17,8 @@ for _p in (_ROOT, _SCRIPTS):
 import ingest_hsm_capture as hsm  # noqa: E402
 from process_hsm_capture import (  # noqa: E402
     DETECT_SUBDIR,
+    add_manifest_args,
+    add_parallel_args,
     process_hsm_capture_dirs,
 )
 
@@ -48,6 +50,8 @@ def main() -> int:
         default=DETECT_SUBDIR,
         help=f"Subfolder under each cube_* for PNGs (default: {DETECT_SUBDIR})",
     )
+    add_manifest_args(parser)
+    add_parallel_args(parser)
     args = parser.parse_args()
 
     return process_hsm_capture_dirs(
@@ -58,6 +62,10 @@ def main() -> int:
         crop_percent=args.crop_percent,
         suffix=args.suffix,
         output_subdir=args.output_subdir or "",
+        workers=args.workers,
+        timeout=args.timeout,
+        blas_threads=args.blas_threads,
+        force=args.force,
     )
 
 
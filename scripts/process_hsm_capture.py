@@ -5,8 +5,18 @@ Process HSM_CAPTURE cube folders (newest first): run batch_cluster only on
 from __future__ import annotations
 
 import argparse
+import importlib.util
+import multiprocessing
+import os
 import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Iterator
 
 _ROOT = Path(__file__).resolve().parents[1]
 _SCRIPTS = Path(__file__).resolve().parent
@@ -15,10 +25,20 @@ for _p in (_ROOT, _SCRIPTS):
         sys.path.insert(0, str(_p))
 
 import batch_cluster  # noqa: E402
+from cluster_manifest import ClusterManifest, full_fingerprint  # noqa: E402
 import ingest_hsm_capture as hsm  # noqa: E402
 
 DETECT_SUBDIR = "detect"
 
+# Thread-count knobs of the BLAS/OpenMP runtimes numpy/spectral may use.
+BLAS_THREAD_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
 
 def list_cheese_hdrs(cube_dir: Path) -> list[Path]:
     """All ENVI headers matching *_cheese_*.hdr in folder, sorted by name."""
@@ -29,6 +49,234 @@ def list_cheese_hdrs(cube_dir: Path) -> list[Path]:
     )
 
 
+@dataclass(frozen=True)
+class ClusterJob:
+    cube: Path
+    hdr: Path
+    out_png: Path
+
+
+@dataclass(frozen=True)
+class ClusterResult:
+    saved: str
+    fingerprint: dict  # input fingerprint taken before clustering (cluster_manifest)
+
+
+def cluster_job(job: ClusterJob, *, clusters: int, max_iter: int, crop_percent: int) -> ClusterResult:
+    """
+    Run batch_cluster for one cheese HDR (top-level so worker processes can unpickle it).
+
+    The input is fingerprinted first, so a cube rewritten during clustering no
+    longer matches the recorded fingerprint and is re-clustered on the next run.
+    """
+    fingerprint = full_fingerprint(job.hdr)
+    saved = batch_cluster.run_pipeline(
+        job.hdr,
+        job.out_png,
+        clusters=clusters,
+        max_iter=max_iter,
+        crop_percent=crop_percent,
+    )
+    return ClusterResult(saved=str(saved), fingerprint=fingerprint)
+
+
+def _job_params(job: ClusterJob, clusters: int, max_iter: int, crop_percent: int) -> dict:
+    """Everything besides the input that determines a job's output."""
+    return {
+        "clusters": clusters,
+        "max_iter": max_iter,
+        "crop_percent": crop_percent,
+        "output_name": job.out_png.name,
+    }
+
+
+@contextmanager
+def _blas_thread_limit(threads: int) -> Iterator[None]:
+    """
+    Cap BLAS/OpenMP threads for worker processes started inside the block
+    (env vars are read when a spawned worker imports numpy). Values the user
+    already set are kept.
+    """
+    previous = {var: os.environ.get(var) for var in BLAS_THREAD_VARS}
+    for var in BLAS_THREAD_VARS:
+        os.environ.setdefault(var, str(threads))
+    try:
+        yield
+    finally:
+        for var, value in previous.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(threads: int) -> None:
+    # Forked workers inherited an already initialised BLAS; limit it at runtime if possible.
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(threads)
+
+
+def _warn_if_blas_limit_unsupported() -> None:
+    """Env vars only reach spawned workers; forked ones need threadpoolctl."""
+    if multiprocessing.get_start_method() == "spawn" or importlib.util.find_spec("threadpoolctl") is not None:
+        return
+    print(
+        "warning: threadpoolctl is not installed; the BLAS thread limit is not applied to forked workers",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def _terminate_pool(executor: ProcessPoolExecutor) -> None:
+    """
+    Stop a pool whose workers may be stuck in a job (a timed-out item).
+
+    Uses ProcessPoolExecutor.terminate_workers() where available (Python 3.14+).
+    Older versions have no public way to kill a busy worker, so this falls back
+    to CPython's private `_processes` map; without it, shutdown() waits for the
+    stuck job to finish on its own.
+    """
+    terminate_workers = getattr(executor, "terminate_workers", None)
+    if terminate_workers is not None:
+        terminate_workers()
+        return
+    processes = getattr(executor, "_processes", None) or {}
+    for proc in list(processes.values()):
+        proc.terminate()
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_pool(
+    fn: Callable[..., ClusterResult],
+    jobs: list[ClusterJob],
+    kwargs: dict,
+    *,
+    workers: int,
+    timeout: float | None,
+    blas_threads: int,
+    poll_s: float = 0.2,
+) -> Iterator[tuple[ClusterJob, ClusterResult | None, str | None]]:
+    """
+    Run fn(job, **kwargs) for all jobs on a process pool and yield
+    (job, result, error) in job order as soon as each prefix is complete.
+
+    At most `workers` jobs are in flight, so a running future is a running job.
+    A job exceeding `timeout` seconds fails on its own: the pool is torn down
+    and the other in-flight jobs are restarted on a fresh one. When a worker
+    dies, the jobs caught in the broken pool are retried one at a time, so only
+    the job that kills its worker again is reported as failed.
+    """
+    results: dict[int, tuple[ClusterResult | None, str | None]] = {}
+    attempts = [0] * len(jobs)
+    queue = deque(range(len(jobs)))
+    suspects: set[int] = set()
+    futures: dict[Future, int] = {}
+    started: dict[Future, float] = {}
+    executor: ProcessPoolExecutor | None = None
+    next_report = 0
+    warned = False
+
+    try:
+        while queue or futures:
+            while queue and len(futures) < workers:
+                if queue[0] in suspects and futures:
+                    break
+                i = queue.popleft()
+                if executor is None:
+                    if not warned:
+                        _warn_if_blas_limit_unsupported()
+                        warned = True
+                    executor = ProcessPoolExecutor(
+                        max_workers=workers, initializer=_init_worker, initargs=(blas_threads,)
+                    )
+                # Workers are spawned on submit; they pick up the BLAS limits then.
+                with _blas_thread_limit(blas_threads):
+                    futures[executor.submit(fn, jobs[i], **kwargs)] = i
+                attempts[i] += 1
+                if i in suspects:
+                    break
+
+            done, _ = wait(futures, timeout=poll_s, return_when=FIRST_COMPLETED)
+            broken = False
+            for fut in done:
+                i = futures.pop(fut)
+                started.pop(fut, None)
+                try:
+                    results[i] = (fut.result(), None)
+                except BrokenProcessPool:
+                    broken = True
+                    if attempts[i] >= 2:
+                        results[i] = (None, "worker process died")
+                    else:
+                        suspects.add(i)
+                        queue.appendleft(i)
+                except Exception as exc:
+                    results[i] = (None, str(exc))
+
+            now = time.monotonic()
+            timed_out = False
+            for fut, i in list(futures.items()):
+                if not fut.running():
+                    continue
+                started.setdefault(fut, now)
+                if timeout is not None and now - started[fut] > timeout:
+                    results[i] = (None, f"timeout after {timeout:g}s")
+                    del futures[fut]
+                    timed_out = True
+
+            if (timed_out or broken) and executor is not None:
+                # Restart the other in-flight jobs from scratch (not counted as attempts).
+                for fut, i in futures.items():
+                    attempts[i] -= 1
+                    queue.appendleft(i)
+                futures.clear()
+                started.clear()
+                _terminate_pool(executor)
+                executor = None
+
+            while next_report in results:
+                yield jobs[next_report], *results[next_report]
+                next_report += 1
+    finally:
+        if executor is not None:
+            if futures:
+                _terminate_pool(executor)
+            else:
+                executor.shutdown(wait=True)
+
+
+def run_cluster_jobs(
+    jobs: list[ClusterJob],
+    *,
+    clusters: int,
+    max_iter: int,
+    crop_percent: int,
+    workers: int = 1,
+    timeout: float | None = None,
+    blas_threads: int | None = None,
+) -> Iterator[tuple[ClusterJob, ClusterResult | None, str | None]]:
+    """
+    Yield (job, result, error) in job order. workers <= 1 without a timeout
+    runs in-process; otherwise jobs go to a ProcessPoolExecutor.
+    """
+    kwargs = {"clusters": clusters, "max_iter": max_iter, "crop_percent": crop_percent}
+    if workers <= 1 and timeout is None:
+        for job in jobs:
+            try:
+                yield job, cluster_job(job, **kwargs), None
+            except Exception as e:
+                yield job, None, str(e)
+        return
+
+    workers = max(1, int(workers))
+    if blas_threads is None:
+        blas_threads = max(1, (os.cpu_count() or 1) // workers)
+    yield from _run_pool(cluster_job, jobs, kwargs, workers=workers, timeout=timeout, blas_threads=blas_threads)
+
+
 def process_hsm_capture_dirs(
     root: Path,
     *,
@@ -38,13 +286,22 @@ def process_hsm_capture_dirs(
     crop_percent: int = 10,
     suffix: str = ".png",
     output_subdir: str = DETECT_SUBDIR,
+    workers: int = 1,
+    timeout: float | None = None,
+    blas_threads: int | None = None,
+    force: bool = False,
 ) -> int:
     """
     Scan `root` for cube_* directories (newest first by folder timestamp).
     `limit`: 0 = process all; else only the N newest.
+    HDRs whose cluster_manifest.json entry still matches (same input, same
+    parameters, output present) are skipped unless `force` is set.
+    `workers` > 1 clusters HDRs in parallel processes; results are still
+    reported newest-first. `timeout` (seconds) fails a single stuck HDR.
     Returns 0 if OK, 1 if root missing.
     """
-    root = Path(root)
+    # run_pipeline returns resolved paths; resolve the root too so outputs are relative to it.
+    root = Path(root).resolve()
     if not root.is_dir():
         print(f"HSM_CAPTURE root not found: {root}")
         return 1
@@ -54,31 +311,84 @@ def process_hsm_capture_dirs(
     if limit > 0:
         cube_dirs = cube_dirs[:limit]
 
+    # Per cube: (job, up_to_date) in cheese HDR order.
+    plan: list[tuple[Path, list[tuple[ClusterJob, bool]]]] = []
+    manifests: dict[Path, ClusterManifest] = {}
     for cube in cube_dirs:
         cheese_hdrs = list_cheese_hdrs(cube)
-        if not cheese_hdrs:
+        cube_jobs: list[tuple[ClusterJob, bool]] = []
+        if cheese_hdrs:
+            detect_dir = cube / output_subdir if output_subdir else cube
+            detect_dir.mkdir(parents=True, exist_ok=True)
+            manifest = manifests[cube] = ClusterManifest.for_dir(detect_dir)
+            for hdr in cheese_hdrs:
+                job = ClusterJob(cube, hdr, detect_dir / f"{hdr.stem}{suffix}")
+                params = _job_params(job, clusters, max_iter, crop_percent)
+                cube_jobs.append((job, not force and manifest.is_up_to_date(hdr, detect_dir, params)))
+            manifest.save()
+        plan.append((cube, cube_jobs))
+
+    results = run_cluster_jobs(
+        [job for _cube, cube_jobs in plan for job, up_to_date in cube_jobs if not up_to_date],
+        clusters=clusters,
+        max_iter=max_iter,
+        crop_percent=crop_percent,
+        workers=workers,
+        timeout=timeout,
+        blas_threads=blas_threads,
+    )
+    for cube, cube_jobs in plan:
+        if not cube_jobs:
             print(f"{cube.name}: skip (no *_cheese_*.hdr)")
             continue
-        detect_dir = cube / output_subdir if output_subdir else cube
-        detect_dir.mkdir(parents=True, exist_ok=True)
-        for hdr in cheese_hdrs:
-            out_png = detect_dir / f"{hdr.stem}{suffix}"
-            try:
-                saved = batch_cluster.run_pipeline(
-                    hdr,
-                    out_png,
-                    clusters=clusters,
-                    max_iter=max_iter,
-                    crop_percent=crop_percent,
-                )
-                rel = Path(saved).relative_to(cube)
-                print(f"{cube.name}: OK -> {rel} ({hdr.name})")
-            except Exception as e:
-                print(f"{cube.name}: FAIL ({hdr.name}): {e}")
+        for job, up_to_date in cube_jobs:
+            if up_to_date:
+                print(f"{cube.name}: up to date ({job.hdr.name})", flush=True)
+                continue
+            job, result, error = next(results)
+            if error is None:
+                saved = Path(result.saved)
+                manifest = manifests[cube]
+                params = _job_params(job, clusters, max_iter, crop_percent)
+                manifest.record(job.hdr, saved, params, result.fingerprint)
+                manifest.save()
+                rel = saved.relative_to(cube) if saved.is_relative_to(cube) else saved
+                print(f"{cube.name}: OK -> {rel} ({job.hdr.name})", flush=True)
+            else:
+                print(f"{cube.name}: FAIL ({job.hdr.name}): {error}", flush=True)
 
     return 0
 
 
+def add_manifest_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-cluster every HDR even if cluster_manifest.json says it is up to date",
+    )
+
+
+def add_parallel_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parallel clustering processes (default: 1 = sequential, in-process)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Per-HDR time limit in seconds; a stuck HDR is reported FAIL and skipped",
+    )
+    parser.add_argument(
+        "--blas-threads",
+        type=int,
+        default=None,
+        help="BLAS/OpenMP threads per worker (default: CPU count // workers)",
+    )
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(
         description="Scan HSM_CAPTURE cube_* dirs (newest first), run batch_cluster, write PNG in each subdir."
@@ -112,6 +422,8 @@ def main() -> int:
         default=DETECT_SUBDIR,
         help=f"Subfolder under each cube_* for PNGs (default: {DETECT_SUBDIR}; empty = cube root)",
     )
+    add_manifest_args(parser)
+    add_parallel_args(parser)
     args = parser.parse_args()
 
     return process_hsm_capture_dirs(
@@ -122,6 +434,10 @@ def main() -> int:
         crop_percent=args.crop_percent,
         suffix=args.suffix,
         output_subdir=args.output_subdir or "",
+        workers=args.workers,
+        timeout=args.timeout,
+        blas_threads=args.blas_threads,
+        force=args.force,
     )
 
 
@@ -9,7 +9,9 @@ from pathlib import Path
 
 import matplotlib.image as mpimg
 import numpy as np
-import spectral.io.envi as envi
+
+from cluster_labels import labels_by_count, load_labels
+from hsi_cube import EnviCube, open_cube
 
 
 def _parse_coord(value: str) -> tuple[int, int]:
@@ -24,19 +26,6 @@ def _parse_coord(value: str) -> tuple[int, int]:
     return x, y
 
 
-def _parse_wavelengths(metadata: dict, bands: int) -> np.ndarray:
-    raw = metadata.get("wavelength")
-    if isinstance(raw, list) and len(raw) == bands:
-        vals: list[float] = []
-        for v in raw:
-            try:
-                vals.append(float(v))
-            except (TypeError, ValueError):
-                vals.append(float(len(vals)))
-        return np.asarray(vals, dtype=np.float32)
-    return np.arange(bands, dtype=np.float32)
-
-
 def _resolve_hdr_path(cube_path: Path) -> Path:
     hdr_path = cube_path
     if cube_path.suffix.lower() == ".img":
@@ -46,18 +35,13 @@ def _resolve_hdr_path(cube_path: Path) -> Path:
     return hdr_path
 
 
-def _load_cube(hdr_path: Path) -> tuple[np.ndarray, np.ndarray]:
-    img = envi.open(str(hdr_path))
-    cube = np.asarray(img.load(), dtype=np.float32)
-    if cube.ndim != 3:
-        raise ValueError(f"Expected 3D HSI cube, got shape {cube.shape}")
-    _, _, bands = cube.shape
-    wavelengths = _parse_wavelengths(getattr(img, "metadata", {}) or {}, bands)
-    return cube, wavelengths
+def _load_cube(hdr_path: Path) -> EnviCube:
+    """Memory-mapped cube; spectra are read on demand."""
+    return open_cube(hdr_path)
 
 
-def _write_spectrum_to_db(
-    db_path: Path,
+def _insert_spectrum(
+    cur: sqlite3.Cursor,
     name: str,
     description: str,
     measurement: str,
@@ -66,55 +50,88 @@ def _write_spectrum_to_db(
     x_unit: str,
     y_unit: str,
 ) -> tuple[int, int]:
+    cur.execute(
+        """
+        INSERT INTO Samples (Name, Type, Class, SubClass, Description)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            name,
+            "HSI_POINT" if measurement == "point-spectrum" else "HSI_REGION",
+            "USER_DATA",
+            "POINT_SPECTRUM" if measurement == "point-spectrum" else "REGION_AVERAGE",
+            description,
+        ),
+    )
+    sample_id = int(cur.lastrowid)
+
+    cur.execute(
+        """
+        INSERT INTO Spectra (
+            SampleID, SensorCalibrationID, Instrument, Environment, Measurement,
+            XUnit, YUnit, MinWavelength, MaxWavelength, NumValues, XData, YData
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            sample_id,
+            0,
+            "hsi-cube",
+            "unknown",
+            measurement,
+            x_unit,
+            y_unit,
+            float(wavelengths.min()) if wavelengths.size else 0.0,
+            float(wavelengths.max()) if wavelengths.size else 0.0,
+            int(spectrum.size),
+            sqlite3.Binary(wavelengths.astype(np.float32).tobytes()),
+            sqlite3.Binary(spectrum.astype(np.float32).tobytes()),
+        ),
+    )
+    return sample_id, int(cur.lastrowid)
+
+
+def _write_spectra_to_db(db_path: Path, records: list[dict]) -> list[tuple[int, int]]:
+    """
+    Insert several spectra (kwargs of _insert_spectrum) in one transaction;
+    either all of them are saved or none. Returns (sample_id, spectrum_id) per record.
+    """
     db_path.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(str(db_path))
     try:
-        cur = con.cursor()
-        cur.execute(
-            """
-            INSERT INTO Samples (Name, Type, Class, SubClass, Description)
-            VALUES (?, ?, ?, ?, ?)
-            """,
-            (
-                name,
-                "HSI_POINT" if measurement == "point-spectrum" else "HSI_REGION",
-                "USER_DATA",
-                "POINT_SPECTRUM" if measurement == "point-spectrum" else "REGION_AVERAGE",
-                description,
-            ),
-        )
-        sample_id = int(cur.lastrowid)
-
-        cur.execute(
-            """
-            INSERT INTO Spectra (
-                SampleID, SensorCalibrationID, Instrument, Environment, Measurement,
-                XUnit, YUnit, MinWavelength, MaxWavelength, NumValues, XData, YData
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                sample_id,
-                0,
-                "hsi-cube",
-                "unknown",
-                measurement,
-                x_unit,
-                y_unit,
-                float(wavelengths.min()) if wavelengths.size else 0.0,
-                float(wavelengths.max()) if wavelengths.size else 0.0,
-                int(spectrum.size),
-                sqlite3.Binary(wavelengths.astype(np.float32).tobytes()),
-                sqlite3.Binary(spectrum.astype(np.float32).tobytes()),
-            ),
-        )
-        spectrum_id = int(cur.lastrowid)
-        con.commit()
-        return sample_id, spectrum_id
+        with con:
+            cur = con.cursor()
+            return [_insert_spectrum(cur, **rec) for rec in records]
     finally:
         con.close()
 
 
+def _write_spectrum_to_db(
+    db_path: Path,
+    name: str,
+    description: str,
+    measurement: str,
+    wavelengths: np.ndarray,
+    spectrum: np.ndarray,
+    x_unit: str,
+    y_unit: str,
+) -> tuple[int, int]:
+    return _write_spectra_to_db(
+        db_path,
+        [
+            {
+                "name": name,
+                "description": description,
+                "measurement": measurement,
+                "wavelengths": wavelengths,
+                "spectrum": spectrum,
+                "x_unit": x_unit,
+                "y_unit": y_unit,
+            }
+        ],
+    )[0]
+
+
 def save_point_spectrum(
     cube_path: Path,
     db_path: Path,
@@ -125,13 +142,11 @@ def save_point_spectrum(
     y_unit: str = "reflectance",
 ) -> tuple[int, int]:
     hdr_path = _resolve_hdr_path(cube_path)
-    cube, wavelengths = _load_cube(hdr_path)
+    cube = _load_cube(hdr_path)
+    wavelengths = cube.wavelengths()
 
-    h, w, bands = cube.shape
-    if x < 0 or y < 0 or x >= w or y >= h:
-        raise ValueError(f"Coordinates out of bounds: x={x}, y={y}, cube size is {w}x{h}")
-
-    spectrum = cube[y, x, :].astype(np.float32)
+    # Reads only this pixel's bands from the memory map.
+    spectrum = cube.pixel(y, x)
     name = sample_name or f"{hdr_path.stem}_x{x}_y{y}"
     return _write_spectrum_to_db(
         db_path=db_path,
@@ -145,6 +160,67 @@ def save_point_spectrum(
     )
 
 
+def read_coords_csv(csv_path: Path) -> list[tuple[int, int, str | None]]:
+    """
+    Read points from CSV rows `x,y[,name]`; a header row (x,y,...) is skipped.
+    """
+    points: list[tuple[int, int, str | None]] = []
+    with Path(csv_path).open("r", encoding="utf-8-sig", newline="") as f:
+        for line_no, row in enumerate(csv.reader(f), start=1):
+            row = [c.strip() for c in row]
+            if not row or not any(row):
+                continue
+            if line_no == 1 and row[0].lower() == "x":
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{csv_path}:{line_no}: expected x,y[,name]")
+            try:
+                x, y = int(row[0]), int(row[1])
+            except ValueError as exc:
+                raise ValueError(f"{csv_path}:{line_no}: coords must be integers") from exc
+            name = row[2] if len(row) > 2 and row[2] else None
+            points.append((x, y, name))
+    return points
+
+
+def save_point_spectra(
+    cube_path: Path,
+    db_path: Path,
+    points: list[tuple[int, int, str | None]],
+    x_unit: str = "micrometers",
+    y_unit: str = "reflectance",
+) -> list[tuple[int, int]]:
+    """
+    Extract the spectra at all (x, y[, name]) points in one pass over the cube
+    and save them in a single DB transaction. Returns (sample_id, spectrum_id) per point.
+    """
+    hdr_path = _resolve_hdr_path(cube_path)
+    cube = _load_cube(hdr_path)
+    wavelengths = cube.wavelengths()
+    if not points:
+        return []
+
+    xs = np.array([p[0] for p in points])
+    ys = np.array([p[1] for p in points])
+    spectra = cube.pixels(ys, xs)
+
+    records = []
+    for (x, y, *rest), spectrum in zip(points, spectra):
+        name = rest[0] if rest and rest[0] else f"{hdr_path.stem}_x{x}_y{y}"
+        records.append(
+            {
+                "name": name,
+                "description": f"cube={hdr_path.name}; x={x}; y={y}",
+                "measurement": "point-spectrum",
+                "wavelengths": wavelengths,
+                "spectrum": spectrum,
+                "x_unit": x_unit,
+                "y_unit": y_unit,
+            }
+        )
+    return _write_spectra_to_db(db_path, records)
+
+
 def _auto_detect_cube_hdr_from_map(map_path: Path) -> Path:
     if map_path.suffix.lower() != ".png":
         raise ValueError("Map must be a PNG file.")
@@ -167,7 +243,26 @@ def _auto_detect_cube_hdr_from_map(map_path: Path) -> Path:
     raise FileNotFoundError(f"Could not auto-detect cube HDR for map: {map_path}")
 
 
-def _load_two_color_masks(map_path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+def _load_two_color_labels(map_path: Path) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode a cluster map PNG once into int8 labels: 0 = most frequent colour
+    (background), 1 = second most frequent (defects), -1 = anything else.
+    The clustering step's label sidecar is used when present; otherwise
+    colours are packed into one uint32 key per pixel, so grouping is a 1-D
+    unique instead of a row-wise sort over RGB triples.
+    """
+    sidecar = load_labels(map_path)
+    if sidecar is not None:
+        raw_labels, summary = sidecar
+        ranked = labels_by_count(summary)
+        if len(ranked) < 2:
+            raise ValueError(f"Expected at least 2 colors in map, got {len(ranked)}")
+        remap = np.full(len(summary["labels"]), -1, dtype=np.int8)
+        remap[ranked[0]["label"]] = 0
+        remap[ranked[1]["label"]] = 1
+        colors = [np.array(e["color"], dtype=np.uint8) for e in ranked[:2]]
+        return remap[raw_labels], colors[0], colors[1]
+
     arr = mpimg.imread(str(map_path))
     if arr.ndim != 3:
         raise ValueError(f"Expected RGB/RGBA PNG, got shape {arr.shape}")
@@ -177,22 +272,22 @@ def _load_two_color_masks(map_path: Path) -> tuple[np.ndarray, np.ndarray, np.nd
     else:
         rgb = rgb.astype(np.uint8)
 
-    flat = rgb.reshape(-1, 3)
-    colors, counts = np.unique(flat, axis=0, return_counts=True)
-    if colors.shape[0] < 2:
-        raise ValueError(f"Expected at least 2 colors in map, got {colors.shape[0]}")
-    if colors.shape[0] > 2:
-        idx = np.argsort(counts)[::-1][:2]
-        colors = colors[idx]
-        counts = counts[idx]
+    keys = (rgb[:, :, 0].astype(np.uint32) << 16) | (rgb[:, :, 1].astype(np.uint32) << 8) | rgb[:, :, 2]
+    palette, inverse, counts = np.unique(keys.reshape(-1), return_inverse=True, return_counts=True)
+    if palette.size < 2:
+        raise ValueError(f"Expected at least 2 colors in map, got {palette.size}")
 
-    order = np.argsort(counts)[::-1]
-    bg_color = colors[order[0]]
-    defect_color = colors[order[1]]
+    order = np.argsort(counts, kind="stable")[::-1]
+    remap = np.full(palette.size, -1, dtype=np.int8)
+    remap[order[0]] = 0
+    remap[order[1]] = 1
+    labels = remap[inverse].reshape(keys.shape)
 
-    bg_mask = np.all(rgb == bg_color, axis=2)
-    defect_mask = np.all(rgb == defect_color, axis=2)
-    return bg_mask, defect_mask, bg_color, defect_color
+    def _rgb(key: np.uint32) -> np.ndarray:
+        k = int(key)
+        return np.array([(k >> 16) & 0xFF, (k >> 8) & 0xFF, k & 0xFF], dtype=np.uint8)
+
+    return labels, _rgb(palette[order[0]]), _rgb(palette[order[1]])
 
 
 def save_two_region_averages(
@@ -204,47 +299,54 @@ def save_two_region_averages(
 ) -> dict[str, object]:
     map_path = Path(map_path)
     hdr_path = _resolve_hdr_path(Path(cube_path) if cube_path else _auto_detect_cube_hdr_from_map(map_path))
-    cube, wavelengths = _load_cube(hdr_path)
+    cube = _load_cube(hdr_path)
+    wavelengths = cube.wavelengths()
     h, w, bands = cube.shape
 
-    bg_mask, defect_mask, bg_color, defect_color = _load_two_color_masks(map_path)
-    if bg_mask.shape != (h, w):
+    labels, bg_color, defect_color = _load_two_color_labels(map_path)
+    if labels.shape != (h, w):
         raise ValueError(
-            f"Map/cube size mismatch: map={bg_mask.shape[1]}x{bg_mask.shape[0]}, cube={w}x{h}"
+            f"Map/cube size mismatch: map={labels.shape[1]}x{labels.shape[0]}, cube={w}x{h}"
         )
 
+    # One pass over the memory-mapped cube for both regions.
+    stats = cube.region_stats(labels, n_labels=2)
     total = h * w
-    bg_count = int(bg_mask.sum())
-    defect_count = int(defect_mask.sum())
+    bg_count = int(stats.counts[0])
+    defect_count = int(stats.counts[1])
     if bg_count == 0 or defect_count == 0:
         raise ValueError("One of regions has zero pixels; cannot compute two averages.")
 
-    bg_avg = cube[bg_mask].reshape(bg_count, bands).mean(axis=0).astype(np.float32)
-    defect_avg = cube[defect_mask].reshape(defect_count, bands).mean(axis=0).astype(np.float32)
+    bg_avg = stats.mean[0].astype(np.float32)
+    defect_avg = stats.mean[1].astype(np.float32)
 
     base_name = map_path.stem
     bg_name = f"{base_name}_background_avg"
     defect_name = f"{base_name}_defects_avg"
 
-    bg_sample_id, bg_spectrum_id = _write_spectrum_to_db(
-        db_path=db_path,
-        name=bg_name,
-        description=f"cube={hdr_path.name}; map={map_path.name}; region=background;num = {bg_count}",
-        measurement="region-average",
-        wavelengths=wavelengths,
-        spectrum=bg_avg,
-        x_unit=x_unit,
-        y_unit=y_unit,
-    )
-    defect_sample_id, defect_spectrum_id = _write_spectrum_to_db(
-        db_path=db_path,
-        name=defect_name,
-        description=f"cube={hdr_path.name}; map={map_path.name}; region=defects; num = {defect_count}",
-        measurement="region-average",
-        wavelengths=wavelengths,
-        spectrum=defect_avg,
-        x_unit=x_unit,
-        y_unit=y_unit,
+    # Both region spectra in one transaction: never only one of them in the DB.
+    (bg_sample_id, bg_spectrum_id), (defect_sample_id, defect_spectrum_id) = _write_spectra_to_db(
+        db_path,
+        [
+            {
+                "name": bg_name,
+                "description": f"cube={hdr_path.name}; map={map_path.name}; region=background;num = {bg_count}",
+                "measurement": "region-average",
+                "wavelengths": wavelengths,
+                "spectrum": bg_avg,
+                "x_unit": x_unit,
+                "y_unit": y_unit,
+            },
+            {
+                "name": defect_name,
+                "description": f"cube={hdr_path.name}; map={map_path.name}; region=defects; num = {defect_count}",
+                "measurement": "region-average",
+                "wavelengths": wavelengths,
+                "spectrum": defect_avg,
+                "x_unit": x_unit,
+                "y_unit": y_unit,
+            },
+        ],
     )
 
     out_base = map_path.with_name(f"{base_name}_region_averages")
@@ -272,6 +374,9 @@ def save_two_region_averages(
                 "sample_id": bg_sample_id,
                 "spectrum_id": bg_spectrum_id,
                 "avg_spectrum": [float(v) for v in bg_avg],
+                "std_spectrum": [float(v) for v in np.sqrt(stats.var[0])],
+                "min_spectrum": [float(v) for v in stats.min[0]],
+                "max_spectrum": [float(v) for v in stats.max[0]],
             },
             "defects": {
                 "pixels": defect_count,
@@ -280,6 +385,9 @@ def save_two_region_averages(
                 "sample_id": defect_sample_id,
                 "spectrum_id": defect_spectrum_id,
                 "avg_spectrum": [float(v) for v in defect_avg],
+                "std_spectrum": [float(v) for v in np.sqrt(stats.var[1])],
+                "min_spectrum": [float(v) for v in stats.min[1]],
+                "max_spectrum": [float(v) for v in stats.max[1]],
             },
         },
     }
@@ -327,6 +435,15 @@ def main() -> int:
     p_point.add_argument("--x-unit", default="micrometers", help="Wavelength unit.")
     p_point.add_argument("--y-unit", default="reflectance", help="Spectral value unit.")
 
+    p_points = sub.add_parser("points", help="Save spectra for many points in one pass / one transaction.")
+    p_points.add_argument("--cube", required=True, type=Path, help="Path to ENVI cube .hdr (or .img).")
+    p_points.add_argument("--db", required=True, type=Path, help="Path to SQLite DB.")
+    src = p_points.add_mutually_exclusive_group(required=True)
+    src.add_argument("--coords", nargs="+", type=_parse_coord, help="Point coordinates: x,y [x,y ...]")
+    src.add_argument("--coords-csv", type=Path, help="CSV with rows x,y[,name] (optional header).")
+    p_points.add_argument("--x-unit", default="micrometers", help="Wavelength unit.")
+    p_points.add_argument("--y-unit", default="reflectance", help="Spectral value unit.")
+
     p_regions = sub.add_parser("regions2", help="Save 2 region-average spectra from 2-color map PNG.")
     p_regions.add_argument("--map", required=True, type=Path, help="Path to 2-color cluster map PNG.")
     p_regions.add_argument("--db", required=True, type=Path, help="Path to SQLite DB.")
@@ -358,6 +475,23 @@ def main() -> int:
         )
         return 0
 
+    if args.mode == "points":
+        if args.coords_csv is not None:
+            points = read_coords_csv(args.coords_csv)
+        else:
+            points = [(x, y, None) for x, y in args.coords]
+        ids = save_point_spectra(
+            cube_path=args.cube,
+            db_path=args.db,
+            points=points,
+            x_unit=args.x_unit,
+            y_unit=args.y_unit,
+        )
+        print(f"Saved {len(ids)} point spectra: cube={args.cube}, db={args.db}")
+        for (x, y, _name), (sample_id, spectrum_id) in zip(points, ids):
+            print(f"  ({x},{y}) sample_id={sample_id}, spectrum_id={spectrum_id}")
+        return 0
+
     res = save_two_region_averages(
         map_path=args.map,
         db_path=args.db,
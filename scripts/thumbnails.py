@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from file_search import FoundFile
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Downscaled variants are cached here, named by a hash of source validators + parameters.
+_DEFAULT_CACHE_DIR = _PROJECT_ROOT / "thumbnail_cache"
+_DEFAULT_CACHE_BUDGET_MB = 256.0
+# Variants handed out this recently may still be streaming; eviction leaves them
+# alone even if that keeps the cache over budget for a while.
+_EVICT_GRACE_SECONDS = 300.0
+
+THUMBNAIL_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+_cache_dir: Path | None = None
+_cache_budget_bytes: int | None = None
+_evict_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+	path: Path
+	etag: str
+	media_type: str
+	filename: str
+
+
+def get_cache_dir() -> Path:
+	if _cache_dir is not None:
+		return _cache_dir
+	raw = os.getenv("SAVVFASTAPI_THUMBNAIL_DIR", "").strip()
+	return Path(raw) if raw else _DEFAULT_CACHE_DIR
+
+
+def get_cache_budget_bytes() -> int:
+	if _cache_budget_bytes is not None:
+		return _cache_budget_bytes
+	raw = os.getenv("SAVVFASTAPI_THUMBNAIL_CACHE_MB", "").strip()
+	return int(float(raw or _DEFAULT_CACHE_BUDGET_MB) * 1024 * 1024)
+
+
+def set_cache(cache_dir: Path | str | None, budget_bytes: int | None = None) -> None:
+	"""Override cache location/budget (used in tests); None restores env/defaults."""
+	global _cache_dir, _cache_budget_bytes
+	_cache_dir = Path(cache_dir) if cache_dir is not None else None
+	_cache_budget_bytes = budget_bytes
+
+
+def validate_thumbnail_params(max_width: int | None, scale: float | None, image_format: str) -> None:
+	"""Raises ValueError for out-of-range resize parameters."""
+	if max_width is not None and max_width < 1:
+		raise ValueError("max_width must be >= 1")
+	if scale is not None and not (0 < scale <= 1):
+		raise ValueError("scale must be in (0, 1]")
+	if image_format not in THUMBNAIL_FORMATS:
+		raise ValueError(f"format must be one of: {', '.join(sorted(THUMBNAIL_FORMATS))}")
+
+
+def _target_size(width: int, height: int, max_width: int | None, scale: float | None) -> tuple[int, int]:
+	target_w = width
+	if scale is not None:
+		target_w = min(target_w, max(1, round(width * scale)))
+	if max_width is not None:
+		target_w = min(target_w, max_width)
+	target_h = max(1, round(height * target_w / width))
+	return target_w, target_h
+
+
+def _evict(cache_dir: Path, budget: int, keep: Path) -> None:
+	"""
+	Delete least recently used variants until the cache fits the size budget.
+	Variants used within _EVICT_GRACE_SECONDS are kept: another request may be
+	about to stream them.
+	"""
+	in_use_after = time.time_ns() - int(_EVICT_GRACE_SECONDS * 1e9)
+	with _evict_lock:
+		entries = []
+		total = 0
+		with os.scandir(cache_dir) as it:
+			for entry in it:
+				if not entry.is_file() or entry.name.endswith(".tmp"):
+					continue
+				st = entry.stat()
+				entries.append((st.st_mtime_ns, st.st_size, Path(entry.path)))
+				total += st.st_size
+		if total <= budget:
+			return
+		for mtime, size, path in sorted(entries):
+			if mtime >= in_use_after:
+				break
+			if path == keep:
+				continue
+			try:
+				path.unlink()
+			except OSError:
+				continue
+			total -= size
+			if total <= budget:
+				break
+
+
+def _cache_key(found: FoundFile, max_width: int | None, scale: float | None, image_format: str) -> str:
+	key_text = f"{found.path}|{found.etag}|{max_width}|{scale}|{image_format}"
+	return hashlib.sha256(key_text.encode("utf-8")).hexdigest()[:32]
+
+
+def thumbnail_etag(found: FoundFile, max_width: int | None, scale: float | None, image_format: str) -> str:
+	"""ETag of a variant, computable without decoding or generating anything."""
+	return f'"{_cache_key(found, max_width, scale, image_format)}"'
+
+
+def get_thumbnail(
+	found: FoundFile,
+	max_width: int | None = None,
+	scale: float | None = None,
+	image_format: str = "png",
+) -> Thumbnail:
+	"""
+	Return a cached downscaled variant of `found`, generating it on first use.
+
+	The cache key is derived from the source path, its ETag (size + mtime) and
+	the resize parameters, so a rewritten source yields a new variant and the
+	ETag is known before any image is decoded. Variants never upscale. Cache hits
+	are touched (mtime) so eviction is least-recently-used by size budget.
+	"""
+	validate_thumbnail_params(max_width, scale, image_format)
+	digest = _cache_key(found, max_width, scale, image_format)
+	cache_dir = get_cache_dir()
+	target = cache_dir / f"{digest}.{image_format}"
+	thumb = Thumbnail(
+		path=target,
+		etag=thumbnail_etag(found, max_width, scale, image_format),
+		media_type=THUMBNAIL_FORMATS[image_format],
+		filename=f"{found.path.stem}.{image_format}",
+	)
+
+	if target.is_file():
+		try:
+			os.utime(target)
+		except OSError:
+			pass
+		return thumb
+
+	from PIL import Image
+
+	cache_dir.mkdir(parents=True, exist_ok=True)
+	tmp = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+	with Image.open(found.path) as img:
+		size = _target_size(img.width, img.height, max_width, scale)
+		if size != (img.width, img.height):
+			img.thumbnail(size, resample=Image.Resampling.LANCZOS, reducing_gap=2.0)
+		if image_format == "webp":
+			img.save(tmp, format="WEBP", quality=85, method=4)
+		else:
+			img.save(tmp, format="PNG", optimize=False, compress_level=6)
+	os.replace(tmp, target)
+
+	_evict(cache_dir, get_cache_budget_bytes(), keep=target)
+	return thumb
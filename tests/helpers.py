@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from pathlib import Path
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+	return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def write_minimal_png(path: Path, color: tuple[int, int, int] = (0, 0, 0), size: int = 1) -> bytes:
+	"""Write a tiny solid-colour RGB PNG and return its bytes."""
+	header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+	row = b"\x00" + bytes(color) * size
+	data = (
+		b"\x89PNG\r\n\x1a\n"
+		+ _png_chunk(b"IHDR", header)
+		+ _png_chunk(b"IDAT", zlib.compress(row * size))
+		+ _png_chunk(b"IEND", b"")
+	)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	path.write_bytes(data)
+	return data
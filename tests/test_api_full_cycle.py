@@ -56,3 +56,176 @@ def test_logs_endpoint_gets_rows(app_client):
 	assert len(rows) >= 1
 	assert "created_at" in rows[0]
 
+
+
+def test_getcamerares_cache_hits_and_invalidates_on_new_scan(app_client, tmp_db_path):
+	import main
+
+	db.set_db_path(tmp_db_path)
+	db.insert_palletes_scan("ID1", "CACHE1", "first", "Scanned", "Ok", "m1")
+	before = main.camera_res_cache.stats()
+
+	r1 = app_client.post("/api/getcamerares", json={"SSCC": "CACHE1"})
+	r2 = app_client.post("/api/getcamerares", json={"SSCC": "CACHE1"})
+	assert r1.json() == r2.json()
+	after = main.camera_res_cache.stats()
+	assert after["misses"] == before["misses"] + 1
+	assert after["hits"] == before["hits"] + 1
+
+	# A write from another connection (e.g. an ingest script) bumps the version.
+	conn = db.get_connection()
+	try:
+		conn.execute(
+			"INSERT INTO palletes_scan(IDPoint, SSCC, Details, Status, Result, Msg) VALUES(?,?,?,?,?,?)",
+			("ID2", "CACHE1", "second", "Scanned", "Bad", "m2"),
+		)
+		conn.commit()
+	finally:
+		conn.close()
+
+	r3 = app_client.post("/api/getcamerares", json={"SSCC": "CACHE1"})
+	data = r3.json()
+	assert data["Count"] == 2
+	assert data["Records"][0]["Details"] == "second"
+
+	# Each poll is still persisted.
+	assert len(db.fetch_get_camera_res_requests(limit=10)) == 3
+
+
+def test_getcamerares_long_poll_wakes_on_insert(app_client, tmp_db_path):
+	import threading
+	import time
+
+	db.set_db_path(tmp_db_path)
+
+	def insert_later():
+		time.sleep(0.3)
+		db.insert_palletes_scan("ID1", "WAIT1", "late", "Scanned", "Ok", "m")
+
+	t = threading.Thread(target=insert_later)
+	t.start()
+	start = time.monotonic()
+	r = app_client.post("/api/getcamerares", json={"SSCC": "WAIT1", "wait_seconds": 10})
+	elapsed = time.monotonic() - start
+	t.join()
+
+	assert r.status_code == 200
+	assert r.json()["Count"] == 1
+	assert elapsed < 5
+
+
+def test_getcamerares_long_poll_sees_rows_from_other_processes(app_client, tmp_db_path):
+	import threading
+	import time
+
+	db.set_db_path(tmp_db_path)
+
+	def external_insert_later():
+		time.sleep(0.3)
+		conn = db.get_connection()
+		try:
+			conn.execute(
+				"INSERT INTO palletes_scan(IDPoint, SSCC, Details, Status, Result, Msg) VALUES(?,?,?,?,?,?)",
+				("ID1", "WAIT2", "external", "Scanned", "Ok", "m"),
+			)
+			conn.commit()
+		finally:
+			conn.close()
+
+	t = threading.Thread(target=external_insert_later)
+	t.start()
+	r = app_client.post("/api/getcamerares", json={"SSCC": "WAIT2", "wait_seconds": 10})
+	t.join()
+	assert r.json()["Count"] == 1
+
+
+def test_getcamerares_long_poll_waits_past_since_version(app_client, tmp_db_path):
+	import threading
+	import time
+
+	db.set_db_path(tmp_db_path)
+	db.insert_palletes_scan("ID1", "WAIT3", "ingested", "Scanned", "", "m1")
+	first = app_client.post("/api/getcamerares", json={"SSCC": "WAIT3"}).json()
+	assert first["Count"] == 1
+	version = first["Version"]
+	assert version > 0
+
+	def analyzed_later():
+		time.sleep(0.5)
+		db.insert_palletes_scan("ID1", "WAIT3", "analyzed", "Scanned", "Ok", "m2")
+
+	t = threading.Thread(target=analyzed_later)
+	t.start()
+	start = time.monotonic()
+	r = app_client.post("/api/getcamerares", json={"SSCC": "WAIT3", "wait_seconds": 10, "since_version": version})
+	elapsed = time.monotonic() - start
+	t.join()
+
+	data = r.json()
+	assert elapsed >= 0.4
+	assert elapsed < 5
+	assert data["Count"] == 2
+	assert data["Records"][0]["Details"] == "analyzed"
+	assert data["Version"] > version
+
+
+def test_getcamerares_long_poll_times_out_with_not_found(app_client):
+	r = app_client.post("/api/getcamerares", json={"SSCC": "NEVER", "wait_seconds": 0.2})
+	assert r.status_code == 200
+	assert r.json()["Count"] == 0
+
+
+def test_setpallet_batch_persists_valid_items_and_reports_invalid(app_client, tmp_db_path):
+	items = [
+		{"SSCC": "B1", "IDPoint": "ID1", "Message": "PalletOnID", "Weight": 1.5},
+		{"SSCC": "B2", "IDPoint": "ID1", "Message": "Wrong", "Weight": 1.5},
+		{"SSCC": "B3", "IDPoint": "ID2", "Message": "PalletOnID", "Weight": 2},
+	]
+	r = app_client.post("/api/setpallet/batch", json=items)
+	assert r.status_code == 200
+	data = r.json()
+	assert data["Count"] == 3
+	assert data["Accepted"] == 2
+	assert data["Rejected"] == 1
+	assert [res["Status"] for res in data["Results"]] == ["Ok", "Invalid", "Ok"]
+	assert "Message" in data["Results"][1]["Detail"]
+
+	db.set_db_path(tmp_db_path)
+	assert sorted(r["SSCC"] for r in db.fetch_set_pallet_requests()) == ["B1", "B3"]
+	assert len(db.fetch_set_pallet_responses()) == 2
+
+
+def test_setpallet_batch_handles_10k_items(app_client, tmp_db_path):
+	items = [
+		{"SSCC": f"{i:018d}", "IDPoint": "ID1", "Message": "PalletOnID", "Weight": float(i)}
+		for i in range(10_000)
+	]
+	r = app_client.post("/api/setpallet/batch", json=items)
+	assert r.status_code == 200
+	assert r.json()["Accepted"] == 10_000
+
+	db.set_db_path(tmp_db_path)
+	conn = db.get_connection()
+	try:
+		count = conn.execute("SELECT COUNT(*) FROM set_pallet_requests").fetchone()[0]
+	finally:
+		conn.close()
+	assert count == 10_000
+
+
+def test_setpallet_batch_reports_non_object_items_as_invalid(app_client, tmp_db_path):
+	items = [
+		{"SSCC": "N1", "IDPoint": "ID1", "Message": "PalletOnID", "Weight": 1.5},
+		"junk",
+		None,
+		{"SSCC": "N2", "IDPoint": "ID1", "Message": "PalletOnID", "Weight": 2},
+	]
+	r = app_client.post("/api/setpallet/batch", json=items)
+	assert r.status_code == 200
+	data = r.json()
+	assert [res["Status"] for res in data["Results"]] == ["Ok", "Invalid", "Invalid", "Ok"]
+	assert [res["Index"] for res in data["Results"] if res["Status"] == "Invalid"] == [1, 2]
+	assert data["Accepted"] == 2
+
+	db.set_db_path(tmp_db_path)
+	assert sorted(row["SSCC"] for row in db.fetch_set_pallet_requests()) == ["N1", "N2"]
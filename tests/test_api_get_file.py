@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import io
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -102,6 +103,196 @@ class TestFindPngFile:
 		assert isinstance(found.modified_at, datetime)
 
 
+class TestFileIndex:
+	def test_new_file_visible_after_refresh(self, file_search_roots):
+		root1, _, _ = file_search_roots
+		index = file_search.get_file_index()
+		assert file_search.find_png_file("late.png") is None
+
+		write_minimal_png(root1 / "late.png")
+		index.refresh(force=True)
+		found = file_search.find_png_file("late.png")
+		assert found is not None
+		assert found.root == root1.resolve()
+
+	def test_misses_are_served_from_index_without_rescans(self, file_search_roots):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "present.png")
+		index = file_search.get_file_index()
+		index.refresh_seconds = 3600
+		assert file_search.find_png_file("present.png") is not None
+		rescans = index.stats()["rescans"]
+
+		for _ in range(20):
+			assert file_search.find_png_file("absent.png") is None
+		stats = index.stats()
+		assert stats["rescans"] == rescans
+		assert stats["misses"] >= 20
+
+	def test_deleted_file_triggers_rescan(self, file_search_roots):
+		root1, root2, _ = file_search_roots
+		write_minimal_png(root1 / "moving.png")
+		write_minimal_png(root2 / "moving.png")
+		index = file_search.get_file_index()
+		index.refresh_seconds = 3600
+		assert file_search.find_png_file("moving.png").root == root1.resolve()
+
+		(root1 / "moving.png").unlink()
+		found = file_search.find_png_file("moving.png")
+		assert found is not None
+		assert found.root == root2.resolve()
+
+	def test_missing_root_is_indexed_as_empty(self, tmp_path: Path):
+		existing = tmp_path / "exists"
+		existing.mkdir()
+		write_minimal_png(existing / "ok.png")
+		file_search.set_search_roots([tmp_path / "offline_share", existing])
+		try:
+			found = file_search.find_png_file("ok.png")
+			assert found is not None
+			assert found.root == existing.resolve()
+		finally:
+			file_search.reset_search_roots()
+
+
+class TestRecursiveFileIndex:
+	def test_finds_nested_detect_png(self, tmp_path: Path):
+		root = tmp_path / "HSM_CAPTURE"
+		nested = root / "cube_11_08_11_20_24" / "detect"
+		expected = write_minimal_png(nested / "cube_11_08_11_20_24_cheese_2_detect.png")
+
+		index = file_search.FileIndex([root], recursive=True)
+		found = index.lookup("cube_11_08_11_20_24_cheese_2_detect.png")
+		assert found is not None
+		assert found.path == (nested / "cube_11_08_11_20_24_cheese_2_detect.png").resolve()
+		assert found.root == root.resolve()
+		assert found.size_bytes == len(expected)
+
+	def test_non_recursive_ignores_subdirectories(self, tmp_path: Path):
+		root = tmp_path / "HSM_CAPTURE"
+		write_minimal_png(root / "cube_1" / "detect" / "nested.png")
+
+		index = file_search.FileIndex([root], recursive=False)
+		assert index.lookup("nested.png") is None
+
+	def test_incremental_refresh_only_rescans_changed_dirs(self, tmp_path: Path):
+		root = tmp_path / "HSM_CAPTURE"
+		for i in range(5):
+			write_minimal_png(root / f"cube_{i}" / "detect" / f"cube_{i}_detect.png")
+
+		index = file_search.FileIndex([root], recursive=True)
+		index.refresh(force=True)
+		full = index.stats()["rescans"]
+		assert full == 11  # root + 5 cube dirs + 5 detect dirs
+
+		write_minimal_png(root / "cube_3" / "detect" / "cube_3_extra.png")
+		index.refresh(force=True)
+		assert index.stats()["rescans"] == full + 1
+		assert index.lookup("cube_3_extra.png") is not None
+
+	def test_stale_index_refreshes_in_background(self, tmp_path: Path, monkeypatch):
+		import threading
+		import time
+
+		root = tmp_path / "HSM_CAPTURE"
+		write_minimal_png(root / "cube_0" / "detect" / "cube_0_detect.png")
+		index = file_search.FileIndex([root], recursive=True, refresh_seconds=0)
+		assert index.lookup("cube_0_detect.png") is not None
+
+		write_minimal_png(root / "cube_1" / "detect" / "cube_1_detect.png")
+		walking = threading.Event()
+		release = threading.Event()
+		real_refresh_root = index._refresh_root
+
+		def slow_refresh_root(i: int) -> bool:
+			walking.set()
+			release.wait(5)
+			return real_refresh_root(i)
+
+		monkeypatch.setattr(index, "_refresh_root", slow_refresh_root)
+		start = time.monotonic()
+		# Served from the current index while the walk is stuck.
+		assert index.lookup("cube_1_detect.png") is None
+		assert walking.wait(5)
+		assert index.lookup("cube_0_detect.png") is not None
+		assert time.monotonic() - start < 1
+
+		release.set()
+		index._refresher.join(5)
+		assert index.lookup("cube_1_detect.png") is not None
+
+	def test_warm_start_serves_store_and_walks_in_background(self, tmp_path: Path, monkeypatch):
+		import threading
+
+		root = tmp_path / "HSM_CAPTURE"
+		for i in range(3):
+			write_minimal_png(root / f"cube_{i}" / "detect" / f"cube_{i}_detect.png")
+		store = tmp_path / "file_index.db"
+		file_search.FileIndex([root], recursive=True, store_path=store).refresh()
+
+		index = file_search.FileIndex([root], recursive=True, store_path=store)
+		walker = []
+		real_refresh_root = index._refresh_root
+
+		def record_walker(i: int) -> bool:
+			walker.append(threading.current_thread())
+			return real_refresh_root(i)
+
+		monkeypatch.setattr(index, "_refresh_root", record_walker)
+		assert index.lookup("cube_2_detect.png") is not None
+		index._refresher.join(5)
+		assert walker and threading.current_thread() not in walker
+
+	def test_deleted_file_rescans_only_its_directory(self, tmp_path: Path):
+		root = tmp_path / "HSM_CAPTURE"
+		for i in range(4):
+			write_minimal_png(root / f"cube_{i}" / "detect" / f"cube_{i}_detect.png")
+		index = file_search.FileIndex([root], recursive=True, refresh_seconds=3600)
+		assert index.lookup("cube_2_detect.png") is not None
+		rescans = index.stats()["rescans"]
+
+		(root / "cube_2" / "detect" / "cube_2_detect.png").unlink()
+		assert index.lookup("cube_2_detect.png") is None
+		assert index.stats()["rescans"] == rescans + 1
+		assert index.lookup("cube_3_detect.png") is not None
+
+	def test_persistent_store_warm_starts_without_rescanning(self, tmp_path: Path):
+		root = tmp_path / "HSM_CAPTURE"
+		for i in range(3):
+			write_minimal_png(root / f"cube_{i}" / "detect" / f"cube_{i}_detect.png")
+		store = tmp_path / "file_index.db"
+
+		first = file_search.FileIndex([root], recursive=True, store_path=store)
+		assert first.lookup("cube_2_detect.png") is not None
+
+		second = file_search.FileIndex([root], recursive=True, store_path=store)
+		found = second.lookup("cube_2_detect.png")
+		assert found is not None
+		assert second.stats()["rescans"] == 0
+
+		# Removed directories are dropped from the store as well.
+		import shutil
+
+		shutil.rmtree(root / "cube_1")
+		third = file_search.FileIndex([root], recursive=True, store_path=store)
+		assert third.lookup("cube_1_detect.png") is None
+		fourth = file_search.FileIndex([root], recursive=True, store_path=store)
+		assert fourth.lookup("cube_1_detect.png") is None
+		assert fourth.lookup("cube_0_detect.png") is not None
+
+	def test_get_file_endpoint_serves_nested_file(self, app_client, tmp_path: Path, monkeypatch):
+		root = tmp_path / "HSM_CAPTURE"
+		expected = write_minimal_png(root / "cube_9" / "detect" / "cube_9_detect.png")
+		monkeypatch.setenv("SAVVFASTAPI_FILE_INDEX_DB", str(tmp_path / "idx.db"))
+		file_search.set_search_roots([root], recursive=True)
+		try:
+			response = app_client.get("/api/get_file", params={"filename": "cube_9_detect.png"})
+			assert response.status_code == 200
+			assert response.content == expected
+		finally:
+			file_search.reset_search_roots()
+
+
 class TestSearchRootConfiguration:
 	def test_set_and_reset_search_roots(self, tmp_path: Path):
 		custom = tmp_path / "custom"
@@ -240,3 +431,219 @@ class TestGetFileEndpoint:
 		logs = app_client.get("/api/logs?limit=10").json()
 		paths = [row["path"] for row in logs]
 		assert "/api/get_file" in paths
+
+
+class TestGetFileHttpCaching:
+	def test_sends_etag_and_last_modified(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "cached.png")
+
+		response = app_client.get("/api/get_file", params={"filename": "cached.png"})
+		assert response.status_code == 200
+		assert response.headers["etag"].startswith('"')
+		assert response.headers["last-modified"].endswith("GMT")
+
+	def test_if_none_match_returns_304(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "cached.png")
+		etag = app_client.get("/api/get_file", params={"filename": "cached.png"}).headers["etag"]
+
+		response = app_client.get(
+			"/api/get_file", params={"filename": "cached.png"}, headers={"If-None-Match": etag}
+		)
+		assert response.status_code == 304
+		assert response.content == b""
+		assert response.headers["etag"] == etag
+
+	def test_stale_etag_returns_full_body(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		expected = write_minimal_png(root1 / "cached.png")
+
+		response = app_client.get(
+			"/api/get_file", params={"filename": "cached.png"}, headers={"If-None-Match": '"stale"'}
+		)
+		assert response.status_code == 200
+		assert response.content == expected
+
+	def test_if_modified_since_returns_304(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "cached.png")
+		last_modified = app_client.get("/api/get_file", params={"filename": "cached.png"}).headers["last-modified"]
+
+		response = app_client.get(
+			"/api/get_file", params={"filename": "cached.png"}, headers={"If-Modified-Since": last_modified}
+		)
+		assert response.status_code == 304
+
+	def test_range_request_returns_partial_content(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		expected = write_minimal_png(root1 / "ranged.png")
+
+		response = app_client.get(
+			"/api/get_file", params={"filename": "ranged.png"}, headers={"Range": "bytes=0-7"}
+		)
+		assert response.status_code == 206
+		assert response.content == expected[:8]
+
+
+class TestGetFileThumbnails:
+	@pytest.fixture(autouse=True)
+	def thumbnail_cache(self, tmp_path: Path):
+		import thumbnails
+
+		cache_dir = tmp_path / "thumbs"
+		thumbnails.set_cache(cache_dir)
+		yield cache_dir
+		thumbnails.set_cache(None)
+
+	def test_max_width_downscales_preserving_aspect(self, app_client, file_search_roots):
+		from PIL import Image
+
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", color=(200, 10, 10), size=64)
+
+		response = app_client.get("/api/get_file", params={"filename": "big.png", "max_width": 16})
+		assert response.status_code == 200
+		assert response.headers["content-type"] == "image/png"
+		with Image.open(io.BytesIO(response.content)) as img:
+			assert img.size == (16, 16)
+
+	def test_webp_variant_and_distinct_etag(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", size=64)
+
+		original = app_client.get("/api/get_file", params={"filename": "big.png"})
+		response = app_client.get("/api/get_file", params={"filename": "big.png", "scale": 0.5, "format": "webp"})
+		assert response.status_code == 200
+		assert response.headers["content-type"] == "image/webp"
+		assert response.content[8:12] == b"WEBP"
+		assert response.headers["etag"] != original.headers["etag"]
+
+	def test_variant_is_cached_and_revalidates(self, app_client, file_search_roots, thumbnail_cache):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", size=64)
+		params = {"filename": "big.png", "max_width": 8}
+
+		first = app_client.get("/api/get_file", params=params)
+		cached = list(thumbnail_cache.iterdir())
+		assert len(cached) == 1
+		mtime = cached[0].stat().st_mtime_ns
+
+		second = app_client.get("/api/get_file", params=params)
+		assert second.content == first.content
+		assert list(thumbnail_cache.iterdir()) == cached
+		assert cached[0].stat().st_mtime_ns >= mtime
+
+		not_modified = app_client.get("/api/get_file", params=params, headers={"If-None-Match": first.headers["etag"]})
+		assert not_modified.status_code == 304
+
+	def test_cache_evicts_to_budget(self, app_client, file_search_roots, thumbnail_cache, monkeypatch):
+		import thumbnails
+
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", size=64)
+		thumbnails.set_cache(thumbnail_cache, budget_bytes=1)
+		monkeypatch.setattr(thumbnails, "_EVICT_GRACE_SECONDS", 0.0)
+
+		for width in (4, 8, 16):
+			response = app_client.get("/api/get_file", params={"filename": "big.png", "max_width": width})
+			assert response.status_code == 200
+		# Only the variant just generated survives a budget smaller than one file.
+		assert len(list(thumbnail_cache.iterdir())) == 1
+
+	def test_eviction_spares_recently_served_variants(self, app_client, file_search_roots, thumbnail_cache):
+		import thumbnails
+
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", size=64)
+		thumbnails.set_cache(thumbnail_cache, budget_bytes=1)
+
+		for width in (4, 8, 16):
+			response = app_client.get("/api/get_file", params={"filename": "big.png", "max_width": width})
+			assert response.status_code == 200
+		# Each variant may still be streaming to its client, so none is deleted yet.
+		assert len(list(thumbnail_cache.iterdir())) == 3
+
+	def test_variant_evicted_before_streaming_is_regenerated(
+		self, app_client, file_search_roots, thumbnail_cache, monkeypatch
+	):
+		import main
+
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", size=64)
+		real_get_thumbnail = main.get_thumbnail
+		calls = []
+
+		def evicted_once(*args, **kwargs):
+			thumb = real_get_thumbnail(*args, **kwargs)
+			calls.append(thumb.path)
+			if len(calls) == 1:
+				thumb.path.unlink()
+			return thumb
+
+		monkeypatch.setattr(main, "get_thumbnail", evicted_once)
+		response = app_client.get("/api/get_file", params={"filename": "big.png", "max_width": 8})
+		assert response.status_code == 200
+		assert response.content[:8] == b"\x89PNG\r\n\x1a\n"
+		assert len(calls) == 2
+
+	@pytest.mark.parametrize(
+		"params",
+		[{"scale": 0}, {"scale": 1.5}, {"max_width": 0}, {"format": "gif"}],
+	)
+	def test_400_for_bad_resize_params(self, app_client, file_search_roots, params):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "big.png", size=4)
+
+		response = app_client.get("/api/get_file", params={"filename": "big.png", **params})
+		assert response.status_code == 400
+
+
+class TestGetFileMetadataBatch:
+	def test_returns_metadata_in_request_order(self, app_client, file_search_roots):
+		root1, root2, _ = file_search_roots
+		write_minimal_png(root1 / "a.png")
+		write_minimal_png(root2 / "b.png", size=3)
+
+		response = app_client.post(
+			"/api/get_file/metadata",
+			json={"filenames": ["b.png", "missing.png", "../x.png", "a.png"]},
+		)
+		assert response.status_code == 200
+		body = response.json()
+		assert body["Count"] == 4
+		assert body["Found"] == 2
+		records = body["Records"]
+		assert [r["Filename"] for r in records] == ["b.png", "missing.png", "../x.png", "a.png"]
+		assert [r["Status"] for r in records] == ["Found", "NotFound", "Invalid", "Found"]
+		assert records[0]["SearchRoot"] == str(root2.resolve())
+		assert records[0]["SizeBytes"] == (root2 / "b.png").stat().st_size
+		assert records[2]["Detail"]
+
+	def test_matches_get_file_headers(self, app_client, file_search_roots):
+		root1, _, _ = file_search_roots
+		write_minimal_png(root1 / "same.png")
+
+		single = app_client.get("/api/get_file", params={"filename": "same.png"})
+		record = app_client.post("/api/get_file/metadata", json={"filenames": ["same.png"]}).json()["Records"][0]
+		assert record["ETag"] == single.headers["etag"]
+		assert record["SizeBytes"] == int(single.headers["x-file-size"])
+		assert record["Modified"] == single.headers["x-file-modified"]
+
+	def test_find_png_files_resolves_concurrently(self, file_search_roots):
+		root1, _, _ = file_search_roots
+		names = [f"f{i}.png" for i in range(40)]
+		for name in names[::2]:
+			write_minimal_png(root1 / name)
+
+		found = file_search.find_png_files(names + names[:5])
+		assert list(found) == names
+		assert all(found[name] is not None for name in names[::2])
+		assert all(found[name] is None for name in names[1::2])
+
+	def test_413_when_batch_too_large(self, app_client, file_search_roots, monkeypatch):
+		import main
+
+		monkeypatch.setattr(main, "MAX_FILE_METADATA_BATCH", 2)
+		response = app_client.post("/api/get_file/metadata", json={"filenames": ["a.png", "b.png", "c.png"]})
+		assert response.status_code == 413
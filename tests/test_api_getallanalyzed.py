@@ -30,3 +30,95 @@ def test_getallanalyzed_limit_and_offset(app_client, tmp_db_path):
 	assert r2.status_code == 200
 	assert r2.json()["Count"] == 2
 
+
+
+def test_getallanalyzed_cursor_pages_through_all_rows(app_client, tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	for i in range(5):
+		db.insert_palletes_scan("ID1", f"SSCC{i}", "d", "analyzed", "r", f"m{i}")
+	db.insert_palletes_scan("ID1", "SSCC_X", "d", "Scanned", "r", "mx")
+
+	seen = []
+	r = app_client.get("/api/getanalyzed?limit=2")
+	data = r.json()
+	seen.extend(rec["SSCC"] for rec in data["Records"])
+	while data["next_cursor"] is not None:
+		r = app_client.get(f"/api/getanalyzed?limit=2&after_id={data['next_cursor']}")
+		assert r.status_code == 200
+		data = r.json()
+		seen.extend(rec["SSCC"] for rec in data["Records"])
+
+	assert seen == ["SSCC4", "SSCC3", "SSCC2", "SSCC1", "SSCC0"]
+
+
+def test_getallanalyzed_last_page_has_no_cursor(app_client, tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.insert_palletes_scan("ID1", "SSCC_A", "d", "analyzed", "r", "m")
+
+	data = app_client.get("/api/getanalyzed?limit=10").json()
+	assert data["Count"] == 1
+	assert data["next_cursor"] is None
+
+
+def test_getanalyzed_stream_returns_all_rows_as_ndjson(app_client, tmp_db_path):
+	import json
+
+	db.set_db_path(tmp_db_path)
+	for i in range(1200):
+		db.insert_palletes_scan("ID1", f"SSCC{i}", "d", "analyzed", "r", f"m{i}")
+	db.insert_palletes_scan("ID1", "SSCC_X", "d", "Scanned", "r", "mx")
+
+	r = app_client.get("/api/getanalyzed/stream")
+	assert r.status_code == 200
+	assert r.headers["content-type"].startswith("application/x-ndjson")
+	lines = [json.loads(line) for line in r.text.splitlines()]
+	assert len(lines) == 1200
+	assert lines[0]["SSCC"] == "SSCC1199"
+	assert lines[-1]["Msg"] == "m0"
+
+
+def test_getanalyzed_stream_since_filter(app_client, tmp_db_path):
+	import json
+
+	db.set_db_path(tmp_db_path)
+	db.insert_palletes_scan("ID1", "OLD", "d", "analyzed", "r", "m")
+	conn = db.get_connection()
+	try:
+		conn.execute("UPDATE palletes_scan SET created_at = '2020-01-01 00:00:00' WHERE SSCC = 'OLD'")
+		conn.commit()
+	finally:
+		conn.close()
+	db.insert_palletes_scan("ID1", "NEW", "d", "analyzed", "r", "m")
+
+	r = app_client.get("/api/getanalyzed/stream", params={"since": "2021-01-01T00:00:00"})
+	assert r.status_code == 200
+	lines = [json.loads(line) for line in r.text.splitlines()]
+	assert [rec["SSCC"] for rec in lines] == ["NEW"]
+
+
+def test_getanalyzed_stream_since_converts_utc_offset_to_local_time(app_client, tmp_db_path):
+	import json
+	from datetime import datetime, timedelta, timezone
+
+	db.set_db_path(tmp_db_path)
+	db.insert_palletes_scan("ID1", "EDGE", "d", "analyzed", "r", "m")
+	local_now = datetime.now().replace(microsecond=0)
+	conn = db.get_connection()
+	try:
+		conn.execute(
+			"UPDATE palletes_scan SET created_at = ? WHERE SSCC = 'EDGE'",
+			(local_now.strftime("%Y-%m-%d %H:%M:%S"),),
+		)
+		conn.commit()
+	finally:
+		conn.close()
+
+	# The same instant one second later, written in a +05:00 offset: excludes the row.
+	after = (local_now + timedelta(seconds=1)).astimezone().astimezone(timezone(timedelta(hours=5)))
+	r = app_client.get("/api/getanalyzed/stream", params={"since": after.isoformat()})
+	assert r.status_code == 200
+	assert r.text == ""
+
+	before = (local_now - timedelta(seconds=1)).astimezone().astimezone(timezone(timedelta(hours=5)))
+	r = app_client.get("/api/getanalyzed/stream", params={"since": before.isoformat()})
+	assert [json.loads(line)["SSCC"] for line in r.text.splitlines()] == ["EDGE"]
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+_root = Path(__file__).resolve().parents[1]
+_scripts = _root / "scripts"
+if str(_scripts) not in sys.path:
+    sys.path.insert(0, str(_scripts))
+
+import bench_background_stats as bench  # noqa: E402
+import find_similar_middle_particles as fsmp  # noqa: E402
+
+
+def _assert_same(new: tuple, old: tuple) -> None:
+    assert new[0] == old[0]
+    assert new[3] == old[3]
+    assert new[5:] == old[5:]
+    np.testing.assert_allclose([new[1], new[2], new[4]], [old[1], old[2], old[4]], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_packed_kernel_matches_legacy_on_synthetic_maps(seed: int) -> None:
+    img = bench.synthetic_map(64, n_colors=4, other_fraction=0.2, seed=seed)
+    _assert_same(fsmp.stats_background_and_other(img), bench.stats_background_and_other_legacy(img))
+
+
+def test_tie_breaks_to_lowest_rgb_like_legacy() -> None:
+    img = np.zeros((4, 4, 3), dtype=np.uint8)
+    img[:2] = (200, 0, 0)
+    img[2:] = (10, 250, 0)
+    _assert_same(fsmp.stats_background_and_other(img), bench.stats_background_and_other_legacy(img))
+    assert fsmp.stats_background_and_other(img)[0] == (10, 250, 0)
+
+
+def test_single_colour_image_has_no_other() -> None:
+    img = np.full((5, 7, 3), 42, dtype=np.uint8)
+    bg, bg_pct, other_pct, n_other_colors, off_pct, n_bg, n_other = fsmp.stats_background_and_other(img)
+    assert bg == (42, 42, 42)
+    assert (bg_pct, other_pct, n_other_colors, off_pct, n_bg, n_other) == (100.0, 0.0, 0, 0.0, 35, 0)
+
+
+def test_pack_rgb_keys() -> None:
+    img = np.array([[[1, 2, 3], [255, 255, 255]]], dtype=np.uint8)
+    np.testing.assert_array_equal(fsmp.pack_rgb(img), [[0x010203, 0xFFFFFF]])
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import spectral.io.envi as envi
+
+_root = Path(__file__).resolve().parents[1]
+_scripts = _root / "scripts"
+if str(_scripts) not in sys.path:
+    sys.path.insert(0, str(_scripts))
+
+import batch_cluster  # noqa: E402
+import cluster_labels  # noqa: E402
+import find_similar_middle_particles as fsmp  # noqa: E402
+import save_point_spectrum_to_ecostress_db as sps  # noqa: E402
+
+
+@pytest.fixture()
+def cube_hdr(tmp_path: Path) -> Path:
+    # Two well separated spectra: a "defect" blob on a uniform background.
+    data = np.full((24, 20, 4), 0.1, dtype=np.float32)
+    data[5:11, 12:17, :] = 0.9
+    data += np.random.default_rng(0).normal(0, 0.005, data.shape).astype(np.float32)
+    cube_dir = tmp_path / "cube_1"
+    cube_dir.mkdir()
+    hdr = cube_dir / "cube_1_cheese_1.hdr"
+    envi.save_image(str(hdr), data, dtype=np.float32, interleave="bil", force=True)
+    return hdr
+
+
+def test_full_frame_sidecars_match_png_decode(cube_hdr: Path) -> None:
+    png = batch_cluster.run_pipeline(
+        cube_hdr, cube_hdr.parent / "detect" / "cube_1_cheese_1.png", clusters=2, max_iter=10, crop_percent=0
+    )
+    labels_path, summary_path = cluster_labels.sidecar_paths(png)
+    assert labels_path.is_file() and summary_path.is_file()
+
+    labels, summary = cluster_labels.load_labels(png)
+    assert labels.dtype == np.uint8
+    assert summary["shape"] == [24, 20]
+
+    from_summary = cluster_labels.background_stats(cluster_labels.load_summary(png))
+    from_pixels = fsmp.stats_background_and_other(fsmp.load_rgb(png))
+    assert from_summary[0] == from_pixels[0]
+    assert from_summary[3] == from_pixels[3]
+    assert from_summary[5:] == from_pixels[5:]
+    np.testing.assert_allclose(from_summary[1:3] + (from_summary[4],), from_pixels[1:3] + (from_pixels[4],))
+
+
+def test_region_labels_from_sidecar_match_png_decode(cube_hdr: Path) -> None:
+    png = batch_cluster.run_pipeline(
+        cube_hdr, cube_hdr.parent / "detect" / "cube_1_cheese_1.png", clusters=2, max_iter=10, crop_percent=0
+    )
+    via_sidecar = sps._load_two_color_labels(png)
+    for path in cluster_labels.sidecar_paths(png):
+        path.unlink()
+    via_png = sps._load_two_color_labels(png)
+
+    np.testing.assert_array_equal(via_sidecar[0], via_png[0])
+    np.testing.assert_array_equal(via_sidecar[1], via_png[1])
+    np.testing.assert_array_equal(via_sidecar[2], via_png[2])
+
+
+def test_overlay_and_stale_sidecars_fall_back_to_png(cube_hdr: Path) -> None:
+    overlay = batch_cluster.run_pipeline(
+        cube_hdr, cube_hdr.parent / "detect" / "overlay.png", clusters=2, max_iter=10, crop_percent=10
+    )
+    # Overlay edges are RGB preview, not labels: no sidecars are written at all.
+    assert not any(path.exists() for path in cluster_labels.sidecar_paths(overlay))
+    assert cluster_labels.load_summary(overlay) is None
+
+    png = batch_cluster.run_pipeline(
+        cube_hdr, cube_hdr.parent / "detect" / "full.png", clusters=2, max_iter=10, crop_percent=0
+    )
+    assert cluster_labels.load_summary(png) is not None
+    summary_path = cluster_labels.sidecar_paths(png)[1]
+    stat = summary_path.stat()
+    os.utime(png, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cluster_labels.load_summary(png) is None
+
+
+def test_copied_png_keeps_usable_sidecars(cube_hdr: Path, tmp_path: Path) -> None:
+    png = batch_cluster.run_pipeline(
+        cube_hdr, cube_hdr.parent / "detect" / "cube_1_cheese_1.png", clusters=2, max_iter=10, crop_percent=0
+    )
+    filtered = tmp_path / "filtered"
+    filtered.mkdir()
+    copied = filtered / png.name
+    cluster_labels.copy_with_sidecars(png, copied)
+
+    assert all(path.is_file() for path in cluster_labels.sidecar_paths(copied))
+    assert cluster_labels.load_summary(copied) == cluster_labels.load_summary(png)
+    assert fsmp.stats_for_png(copied) == fsmp.stats_for_png(png)
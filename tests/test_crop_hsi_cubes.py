@@ -4,6 +4,7 @@ import sys
 from pathlib import Path
 
 import numpy as np
+import pytest
 import spectral.io.envi as envi
 
 _root = Path(__file__).resolve().parents[1]
@@ -58,3 +59,39 @@ def test_crop_and_save_envi_cube_writes_expected_shape(tmp_path: Path) -> None:
     out_arr = out_img.load()
     assert out_arr.shape == (16, 16, 5)
 
+
+
+@pytest.mark.parametrize("interleave", ["bil", "bip", "bsq"])
+@pytest.mark.parametrize("byteorder", [0, 1])
+def test_streaming_crop_matches_in_memory_crop(tmp_path: Path, interleave: str, byteorder: int) -> None:
+    in_hdr = tmp_path / "cube_1.hdr"
+    data = np.arange(20 * 18 * 3, dtype=np.int16).reshape(20, 18, 3)
+    envi.save_image(
+        str(in_hdr),
+        data,
+        dtype=np.int16,
+        interleave=interleave,
+        byteorder=byteorder,
+        force=True,
+        metadata={"wavelength": ["400", "500", "600"]},
+    )
+
+    out_hdr = tmp_path / "cube_1_cr10p.hdr"
+    # A tiny buffer forces many blocks (one line / band-line each).
+    crop.crop_and_save_envi_cube(in_hdr, out_hdr, crop_percent=10, buffer_bytes=1)
+
+    out_img = envi.open(str(out_hdr))
+    assert out_img.metadata["interleave"] == interleave
+    assert int(out_img.metadata["byte order"]) == byteorder
+    assert out_img.metadata["wavelength"] == ["400", "500", "600"]
+    np.testing.assert_array_equal(np.asarray(out_img.load(dtype=np.int16)), data[2:18, 1:17, :])
+    assert (tmp_path / "cube_1_cr10p.img").stat().st_size == 16 * 16 * 3 * 2
+
+
+def test_existing_output_is_skipped_without_force(tmp_path: Path) -> None:
+    in_hdr = tmp_path / "cube_1.hdr"
+    envi.save_image(str(in_hdr), np.zeros((10, 10, 2), dtype=np.float32), dtype=np.float32, force=True)
+    out_hdr = tmp_path / "cube_1_cr10p.hdr"
+
+    assert crop.crop_and_save_envi_cube(in_hdr, out_hdr, crop_percent=10) == out_hdr
+    assert crop.crop_and_save_envi_cube(in_hdr, out_hdr, crop_percent=10) is None
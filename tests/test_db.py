@@ -52,3 +52,214 @@ def test_request_logs_roundtrip(tmp_db_path):
 	assert rows[0][1] == "GET"
 	assert rows[0][2] == "/x"
 
+
+
+def test_pooled_connection_is_reused_and_tuned(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	conn1 = db.get_pooled_connection()
+	conn2 = db.get_pooled_connection()
+	assert conn1 is conn2
+	assert conn1.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+	# NORMAL == 1
+	assert conn1.execute("PRAGMA synchronous").fetchone()[0] == 1
+
+
+def test_set_db_path_resets_pool(tmp_path):
+	db.set_db_path(tmp_path / "a.db")
+	db.init_db()
+	conn_a = db.get_pooled_connection()
+	db.insert_palletes_scan("ID1", "SSCC_A", "d", "Scanned", "Ok", "m")
+
+	db.set_db_path(tmp_path / "b.db")
+	db.init_db()
+	conn_b = db.get_pooled_connection()
+	assert conn_b is not conn_a
+	assert db.fetch_latest_palletes_scan_by_sscc("SSCC_A") is None
+
+
+def test_init_db_creates_palletes_scan_indexes_once(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	db.init_db()
+
+	conn = db.get_connection()
+	try:
+		indexes = {
+			r["name"]
+			for r in conn.execute(
+				"SELECT name FROM sqlite_master WHERE type='index' AND tbl_name='palletes_scan'"
+			).fetchall()
+		}
+		version = db.get_schema_version(conn)
+	finally:
+		conn.close()
+
+	assert {"idx_palletes_scan_sscc_id", "idx_palletes_scan_status_id"} <= indexes
+	assert version == db.SCHEMA_VERSION
+
+
+def test_init_db_upgrades_existing_database_without_indexes(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	conn = db.get_connection()
+	try:
+		conn.execute("DROP INDEX idx_palletes_scan_sscc_id")
+		conn.execute("DROP INDEX idx_palletes_scan_status_id")
+		conn.execute("PRAGMA user_version = 0")
+		conn.commit()
+	finally:
+		conn.close()
+
+	db.init_db()
+	conn = db.get_connection()
+	try:
+		count = conn.execute(
+			"SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND name LIKE 'idx_palletes_scan_%'"
+		).fetchone()[0]
+	finally:
+		conn.close()
+	assert count == 2
+
+
+def _query_plans(tmp_db_path, call):
+	"""Run `call` and return EXPLAIN QUERY PLAN details for each SELECT it issued."""
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	statements = []
+	conn = db.get_pooled_connection()
+	conn.set_trace_callback(statements.append)
+	try:
+		call()
+	finally:
+		conn.set_trace_callback(None)
+
+	plans = []
+	for sql in statements:
+		if not sql.lstrip().upper().startswith("SELECT"):
+			continue
+		rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+		plans.append(" | ".join(r["detail"] for r in rows))
+	assert plans
+	return plans
+
+
+def test_palletes_scan_sscc_lookups_use_index(tmp_db_path):
+	for call in (
+		lambda: db.fetch_palletes_scan_by_sscc("SSCC1", limit=50),
+		lambda: db.fetch_latest_palletes_scan_by_sscc("SSCC1"),
+	):
+		for plan in _query_plans(tmp_db_path, call):
+			assert "idx_palletes_scan_sscc_id" in plan
+			assert "TEMP B-TREE" not in plan
+
+
+def test_palletes_scan_analyzed_lookup_uses_index(tmp_db_path):
+	for plan in _query_plans(tmp_db_path, lambda: db.fetch_palletes_scan_analyzed(limit=10, offset=0)):
+		assert "idx_palletes_scan_status_id" in plan
+		assert "TEMP B-TREE" not in plan
+
+
+def test_palletes_scan_analyzed_keyset_lookup_uses_index(tmp_db_path):
+	for plan in _query_plans(tmp_db_path, lambda: db.fetch_palletes_scan_analyzed(limit=10, after_id=100)):
+		assert "idx_palletes_scan_status_id" in plan
+		assert "id<?" in plan.replace(" ", "")
+		assert "TEMP B-TREE" not in plan
+
+
+def test_run_db_executes_off_the_event_loop_thread(tmp_db_path):
+	import asyncio
+	import threading
+
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	db.insert_palletes_scan("ID1", "SSCC1", "d", "Scanned", "Ok", "m")
+
+	async def scenario():
+		loop_thread = threading.get_ident()
+		worker_thread = await db.run_db(threading.get_ident)
+		rows = await db.run_db(db.fetch_palletes_scan_by_sscc, "SSCC1", limit=5)
+		return loop_thread, worker_thread, rows
+
+	loop_thread, worker_thread, rows = asyncio.run(scenario())
+	assert worker_thread != loop_thread
+	assert [r["SSCC"] for r in rows] == ["SSCC1"]
+
+
+def test_palletes_scan_version_tracks_writes(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	assert db.fetch_palletes_scan_version("V1") == 0
+
+	db.insert_palletes_scan("ID1", "V1", "d", "Scanned", "Ok", "m")
+	assert db.fetch_palletes_scan_version("V1") == 1
+
+	conn = db.get_connection()
+	try:
+		conn.execute("UPDATE palletes_scan SET SSCC = 'V2' WHERE SSCC = 'V1'")
+		conn.commit()
+	finally:
+		conn.close()
+	assert db.fetch_palletes_scan_version("V1") == 2
+	assert db.fetch_palletes_scan_version("V2") == 1
+
+
+def test_insert_palletes_scan_repairs_mojibake(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	garbled = "Сыр".encode("utf-8").decode("latin1")
+	db.insert_palletes_scan("ID1", "MOJI", garbled, "Scanned", "Ok", garbled)
+
+	row = db.fetch_latest_palletes_scan_by_sscc("MOJI")
+	assert row["Details"] == "Сыр"
+	assert row["Msg"] == "Сыр"
+
+
+def test_fix_mojibake_repairs_cp1252_fully_or_not_at_all():
+	garbled = "Сыр Белый".encode("utf-8").decode("cp1252")
+	assert db.fix_mojibake_text(garbled) == "Сыр Белый"
+
+	# 0x81 ("с" = D1 81) has no cp1252 character, so a Windows tool replaced it:
+	# no lossless repair exists and the stored text must stay as it was.
+	lossy = "Чистый сыр с".encode("utf-8").decode("cp1252", errors="replace")
+	assert db.fix_mojibake_text(lossy) == lossy
+
+	# Partially dropped bytes are not "repaired" into shorter Cyrillic either.
+	truncated = "Сыр Белый".encode("utf-8").decode("cp1252", errors="ignore")[:-1]
+	assert db.fix_mojibake_text(truncated) == truncated
+
+
+def test_set_pallet_requests_are_normalized_on_write(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	garbled = "Сыр".encode("utf-8").decode("latin1")
+	db.insert_set_pallet_request("S1", garbled, "PalletOnID", 1.0)
+	db.insert_set_pallets([("S2", garbled, "PalletOnID", 2.0)])
+
+	rows = db.fetch_set_pallet_requests(limit=10)
+	assert sorted(row["IDPoint"] for row in rows) == ["Сыр", "Сыр"]
+
+
+def test_migration_repairs_existing_mojibake_rows(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	garbled = "Сыр".encode("utf-8").decode("latin1")
+	conn = db.get_connection()
+	try:
+		conn.execute(
+			"INSERT INTO palletes_scan(IDPoint, SSCC, Details, Status, Result, Msg) VALUES(?,?,?,?,?,?)",
+			("ID1", "MOJI", "plain", "Scanned", "Ok", garbled),
+		)
+		conn.execute("PRAGMA user_version = 2")
+		conn.commit()
+	finally:
+		conn.close()
+
+	db.init_db()
+	row = db.fetch_latest_palletes_scan_by_sscc("MOJI")
+	assert row["Msg"] == "Сыр"
+	assert row["Details"] == "plain"
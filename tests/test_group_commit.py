@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+import db
+from group_commit import GroupCommitter
+
+
+def test_transaction_commits_all_rows_once(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	with db.transaction():
+		db.insert_set_pallet_request("S1", "ID1", "PalletOnID", 1.0)
+		db.insert_set_pallet_response("S1", "Ok")
+		db.insert_log("POST", "/api/setpallet", 200, 1.0, None, None)
+
+	assert len(db.fetch_set_pallet_requests()) == 1
+	assert len(db.fetch_set_pallet_responses()) == 1
+	assert len(list(db.fetch_logs())) == 1
+
+
+def test_transaction_rolls_back_every_row_on_error(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	with pytest.raises(RuntimeError):
+		with db.transaction():
+			db.insert_set_pallet_request("S1", "ID1", "PalletOnID", 1.0)
+			raise RuntimeError("boom")
+
+	assert db.fetch_set_pallet_requests() == []
+
+
+def test_group_committer_coalesces_concurrent_units(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	committer = GroupCommitter(window_ms=200)
+	barrier = threading.Barrier(10)
+
+	def worker(i: int) -> None:
+		barrier.wait()
+		committer.submit(lambda: db.insert_set_pallet_request(f"S{i}", "ID1", "PalletOnID", 1.0))
+
+	threads = [threading.Thread(target=worker, args=(i,)) for i in range(10)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	committer.stop()
+
+	assert len(db.fetch_set_pallet_requests()) == 10
+	stats = committer.stats()
+	assert stats["units"] == 10
+	assert stats["batches"] < 10
+
+
+def test_group_committer_isolates_failing_unit(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	committer = GroupCommitter(window_ms=100)
+	results = {}
+
+	def good() -> None:
+		committer.submit(lambda: db.insert_set_pallet_request("GOOD", "ID1", "PalletOnID", 1.0))
+		results["good"] = True
+
+	def bad() -> None:
+		def work() -> None:
+			db.insert_set_pallet_request("BAD", "ID1", "PalletOnID", 1.0)
+			raise ValueError("invalid")
+
+		try:
+			committer.submit(work)
+		except ValueError:
+			results["bad"] = "raised"
+
+	threads = [threading.Thread(target=good), threading.Thread(target=bad)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	committer.stop()
+
+	assert results == {"good": True, "bad": "raised"}
+	assert [r["SSCC"] for r in db.fetch_set_pallet_requests()] == ["GOOD"]
+
+
+def test_group_committer_timeout_cancels_queued_unit(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+	committer = GroupCommitter(window_ms=0)
+	started = threading.Event()
+	release = threading.Event()
+
+	def slow() -> str:
+		started.set()
+		release.wait(5)
+		db.insert_set_pallet_request("SLOW", "ID1", "PalletOnID", 1.0)
+		return "slow"
+
+	slow_result = {}
+	t = threading.Thread(target=lambda: slow_result.setdefault("r", committer.submit(slow, timeout=0.05)))
+	t.start()
+	assert started.wait(5)
+
+	# Queued behind the running unit: the timeout cancels it, so it is never written.
+	with pytest.raises(TimeoutError):
+		committer.submit(lambda: db.insert_set_pallet_request("LATE", "ID1", "PalletOnID", 1.0), timeout=0.1)
+
+	release.set()
+	t.join()
+	committer.stop()
+
+	# The running unit outlived its timeout but was committed, so its caller got the result.
+	assert slow_result == {"r": "slow"}
+	assert [r["SSCC"] for r in db.fetch_set_pallet_requests()] == ["SLOW"]
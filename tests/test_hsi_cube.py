@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import spectral.io.envi as envi
+
+_root = Path(__file__).resolve().parents[1]
+_scripts = _root / "scripts"
+if str(_scripts) not in sys.path:
+    sys.path.insert(0, str(_scripts))
+
+import hsi_cube  # noqa: E402
+
+
+def _cube_data() -> np.ndarray:
+    return np.arange(6 * 5 * 4, dtype=np.float32).reshape(6, 5, 4)
+
+
+@pytest.mark.parametrize("interleave", ["bil", "bip", "bsq"])
+@pytest.mark.parametrize("byteorder", [0, 1])
+def test_memmap_view_matches_spectral_load(tmp_path: Path, interleave: str, byteorder: int) -> None:
+    hdr = tmp_path / f"cube_{interleave}_{byteorder}.hdr"
+    data = _cube_data()
+    envi.save_image(str(hdr), data, dtype=np.float32, interleave=interleave, byteorder=byteorder, force=True)
+
+    cube = hsi_cube.open_cube(hdr)
+    assert isinstance(cube.raw, np.memmap)
+    assert cube.shape == (6, 5, 4)
+    np.testing.assert_array_equal(np.asarray(cube.view()), np.asarray(envi.open(str(hdr)).load()))
+    np.testing.assert_array_equal(cube.window(1, 4, 2, 5), data[1:4, 2:5, :])
+    np.testing.assert_array_equal(cube.band(3), data[:, :, 3])
+    np.testing.assert_array_equal(cube.pixel(5, 4), data[5, 4, :])
+
+
+def test_header_offset_and_img_path(tmp_path: Path) -> None:
+    data = _cube_data().astype(np.uint16)
+    hdr = tmp_path / "offset.hdr"
+    hdr.write_text(
+        "ENVI\nsamples = 5\nlines = 6\nbands = 4\nheader offset = 128\n"
+        "file type = ENVI Standard\ndata type = 12\ninterleave = bip\nbyte order = 0\n"
+        "wavelength = {400, 500, 600, 700}\n",
+        encoding="ascii",
+    )
+    (tmp_path / "offset.img").write_bytes(b"\xff" * 128 + data.astype("<u2").tobytes())
+
+    cube = hsi_cube.open_cube(tmp_path / "offset.img")
+    assert cube.hdr_path == hdr
+    np.testing.assert_array_equal(cube.view(), data)
+    np.testing.assert_array_equal(cube.wavelengths(), [400, 500, 600, 700])
+
+
+def test_region_stats_match_masked_numpy_and_apply_scale(tmp_path: Path) -> None:
+    hdr = tmp_path / "scaled.hdr"
+    data = np.random.default_rng(1).random((9, 5, 4), dtype=np.float32)
+    envi.save_image(
+        str(hdr), data, dtype=np.float32, interleave="bil", force=True,
+        metadata={"reflectance scale factor": 10.0},
+    )
+    cube = hsi_cube.open_cube(hdr)
+
+    labels = np.full((9, 5), -1, dtype=np.int16)
+    labels[:3] = 0
+    labels[6:, 1:4] = 2
+    labels[8, 0] = 0
+    # Small blocks: label 0 spans several blocks, label 1 is empty, -1 ignored.
+    stats = cube.region_stats(labels, n_labels=3, chunk_lines=2)
+
+    np.testing.assert_array_equal(stats.counts, [16, 0, 9])
+    for label in (0, 2):
+        region = data[labels == label] / 10.0
+        np.testing.assert_allclose(stats.mean[label], region.mean(axis=0), rtol=1e-5)
+        np.testing.assert_allclose(stats.var[label], region.var(axis=0), rtol=1e-4, atol=1e-9)
+        np.testing.assert_allclose(stats.min[label], region.min(axis=0), rtol=1e-6)
+        np.testing.assert_allclose(stats.max[label], region.max(axis=0), rtol=1e-6)
+    assert np.isnan(stats.mean[1]).all()
+    np.testing.assert_allclose(cube.load(), np.asarray(envi.open(str(hdr)).load()), rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        cube.region_stats(labels.astype(float))
+
+
+def test_truncated_data_file_is_rejected(tmp_path: Path) -> None:
+    hdr = tmp_path / "short.hdr"
+    envi.save_image(str(hdr), _cube_data(), dtype=np.float32, interleave="bsq", force=True)
+    img = tmp_path / "short.img"
+    img.write_bytes(img.read_bytes()[:-4])
+
+    with pytest.raises(ValueError):
+        hsi_cube.open_cube(hdr)
@@ -234,6 +234,29 @@ def test_upsert_scan_row_updates_unknown(tmp_db_path: Path) -> None:
     assert row["Details"] == "d2"
 
 
+def test_upsert_scan_row_reads_back_clean_without_read_repair(app_client, monkeypatch) -> None:
+    import main
+
+    monkeypatch.setattr(main, "FIX_MOJIBAKE_ON_READ", False)
+    garbled = "Сыр".encode("utf-8").decode("latin1")
+    for _ in range(2):
+        ingest_hsm_capture.upsert_scan_row(
+            id_point=f"ID {garbled}",
+            sscc="MOJI1",
+            details=garbled,
+            status="Scanned",
+            result="Ok",
+            msg=f"hsm_ingest:{garbled}/cheese_1.hdr",
+        )
+
+    data = app_client.post("/api/getcamerares", json={"SSCC": "MOJI1"}).json()
+    assert data["Count"] == 1
+    record = data["Records"][0]
+    assert record["IDPoint"] == "ID Сыр"
+    assert record["Details"] == "Сыр"
+    assert record["Msg"] == "hsm_ingest:Сыр/cheese_1.hdr"
+
+
 # --- process_folder ---
 
 
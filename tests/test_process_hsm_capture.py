@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import spectral.io.envi as envi
+
+_root = Path(__file__).resolve().parents[1]
+_scripts = _root / "scripts"
+if str(_scripts) not in sys.path:
+    sys.path.insert(0, str(_scripts))
+
+import process_hsm_capture as phc  # noqa: E402
+
+
+def _fake_job(job: phc.ClusterJob, **_kwargs) -> str:
+    """Module-level so pool workers can unpickle it."""
+    name = job.hdr.name
+    if name.startswith("hang"):
+        time.sleep(60)
+    if name.startswith("die"):
+        os._exit(3)
+    if name.startswith("err"):
+        raise ValueError(f"bad cube {name}")
+    return name.upper()
+
+
+def _jobs(tmp_path: Path, names: list[str]) -> list[phc.ClusterJob]:
+    return [phc.ClusterJob(tmp_path, tmp_path / name, tmp_path / f"{name}.png") for name in names]
+
+
+def test_pool_reports_in_job_order_and_isolates_failures(tmp_path: Path) -> None:
+    names = ["a.hdr", "err.hdr", "hang.hdr", "die.hdr", "b.hdr", "c.hdr"]
+    out = list(
+        phc._run_pool(_fake_job, _jobs(tmp_path, names), {}, workers=2, timeout=2.0, blas_threads=1, poll_s=0.05)
+    )
+
+    assert [job.hdr.name for job, _res, _err in out] == names
+    by_name = {job.hdr.name: (res, err) for job, res, err in out}
+    assert by_name["a.hdr"] == ("A.HDR", None)
+    assert by_name["b.hdr"] == ("B.HDR", None)
+    assert by_name["c.hdr"] == ("C.HDR", None)
+    assert by_name["err.hdr"] == (None, "bad cube err.hdr")
+    assert by_name["hang.hdr"][1].startswith("timeout")
+    assert by_name["die.hdr"] == (None, "worker process died")
+
+
+def test_blas_thread_limit_keeps_user_values(monkeypatch) -> None:
+    monkeypatch.setenv("OMP_NUM_THREADS", "7")
+    monkeypatch.delenv("OPENBLAS_NUM_THREADS", raising=False)
+    with phc._blas_thread_limit(2):
+        assert os.environ["OMP_NUM_THREADS"] == "7"
+        assert os.environ["OPENBLAS_NUM_THREADS"] == "2"
+    assert "OPENBLAS_NUM_THREADS" not in os.environ
+
+
+def test_parallel_run_writes_same_outputs_newest_first(tmp_path: Path, capsys) -> None:
+    root = tmp_path / "HSM_CAPTURE"
+    older = root / "cube_24_03_16_20_37"
+    newer = root / "cube_25_03_10_36_04"
+    empty = root / "cube_25_03_11_00_00"
+    rng = np.random.default_rng(0)
+    for cube in (older, newer):
+        cube.mkdir(parents=True)
+        for n in (1, 2):
+            data = rng.random((12, 10, 3), dtype=np.float32)
+            envi.save_image(str(cube / f"{cube.name}_cheese_{n}.hdr"), data, dtype=np.float32, force=True)
+    empty.mkdir()
+
+    rc = phc.process_hsm_capture_dirs(root, clusters=2, max_iter=3, crop_percent=0, workers=2, blas_threads=1)
+    assert rc == 0
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("cube_")]
+    assert lines[0] == "cube_25_03_11_00_00: skip (no *_cheese_*.hdr)"
+    assert [line.split(":")[0] for line in lines[1:]] == [newer.name, newer.name, older.name, older.name]
+    assert all(": OK -> " in line for line in lines[1:])
+    for cube in (older, newer):
+        for n in (1, 2):
+            assert (cube / "detect" / f"{cube.name}_cheese_{n}_2cluster0p.png").is_file()
+
+
+def test_second_run_skips_up_to_date_hdrs(tmp_path: Path, capsys) -> None:
+    root = tmp_path / "HSM_CAPTURE"
+    cube = root / "cube_25_03_10_36_04"
+    cube.mkdir(parents=True)
+    hdr = cube / f"{cube.name}_cheese_1.hdr"
+    data = np.random.default_rng(1).random((12, 10, 3), dtype=np.float32)
+    envi.save_image(str(hdr), data, dtype=np.float32, force=True)
+    out_png = cube / "detect" / f"{cube.name}_cheese_1_2cluster0p.png"
+
+    def run(max_iter: int = 3, force: bool = False) -> list[str]:
+        assert phc.process_hsm_capture_dirs(root, clusters=2, max_iter=max_iter, crop_percent=0, force=force) == 0
+        return [line for line in capsys.readouterr().out.splitlines() if line.startswith("cube_")]
+
+    assert ": OK -> " in run()[0]
+    assert (cube / "detect" / "cluster_manifest.json").is_file()
+    first_mtime = out_png.stat().st_mtime_ns
+
+    assert run() == [f"{cube.name}: up to date ({hdr.name})"]
+
+    # Same bytes, new timestamp (e.g. copied to the share): settled by the hash.
+    img = hdr.with_suffix(".img")
+    os.utime(img, ns=(img.stat().st_atime_ns, img.stat().st_mtime_ns + 5_000_000_000))
+    assert run() == [f"{cube.name}: up to date ({hdr.name})"]
+    assert out_png.stat().st_mtime_ns == first_mtime
+
+    assert ": OK -> " in run(force=True)[0]
+
+    # Other parameters, or other data, re-cluster.
+    assert ": OK -> " in run(max_iter=4)[0]
+    envi.save_image(str(hdr), data[::-1].copy(), dtype=np.float32, force=True)
+    assert ": OK -> " in run(max_iter=4)[0]
+    assert run(max_iter=4) == [f"{cube.name}: up to date ({hdr.name})"]
+
+    out_png.unlink()
+    assert ": OK -> " in run(max_iter=4)[0]
+
+
+def test_cube_rewritten_during_clustering_is_not_marked_up_to_date(tmp_path: Path, capsys, monkeypatch) -> None:
+    root = tmp_path / "HSM_CAPTURE"
+    cube = root / "cube_25_03_10_36_04"
+    cube.mkdir(parents=True)
+    hdr = cube / f"{cube.name}_cheese_1.hdr"
+    data = np.random.default_rng(2).random((12, 10, 3), dtype=np.float32)
+    envi.save_image(str(hdr), data, dtype=np.float32, force=True)
+
+    real_pipeline = phc.batch_cluster.run_pipeline
+
+    def pipeline_then_rewrite(*args, **kwargs):
+        saved = real_pipeline(*args, **kwargs)
+        # The capture tool replaces the cube while k-means is still running.
+        envi.save_image(str(hdr), data[::-1].copy(), dtype=np.float32, force=True)
+        return saved
+
+    monkeypatch.setattr(phc.batch_cluster, "run_pipeline", pipeline_then_rewrite)
+    assert phc.process_hsm_capture_dirs(root, clusters=2, max_iter=3, crop_percent=0) == 0
+    monkeypatch.setattr(phc.batch_cluster, "run_pipeline", real_pipeline)
+    capsys.readouterr()
+
+    assert phc.process_hsm_capture_dirs(root, clusters=2, max_iter=3, crop_percent=0) == 0
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("cube_")]
+    assert ": OK -> " in lines[0]
+
+
+def test_results_keep_cheese_hdr_order_when_some_are_up_to_date(tmp_path: Path, capsys) -> None:
+    root = tmp_path / "HSM_CAPTURE"
+    cube = root / "cube_25_03_10_36_04"
+    cube.mkdir(parents=True)
+    rng = np.random.default_rng(3)
+    hdrs = [cube / f"{cube.name}_cheese_{n}.hdr" for n in (1, 2, 3)]
+    for hdr in hdrs:
+        envi.save_image(str(hdr), rng.random((12, 10, 3), dtype=np.float32), dtype=np.float32, force=True)
+    assert phc.process_hsm_capture_dirs(root, clusters=2, max_iter=3, crop_percent=0) == 0
+
+    # Only the first HDR changes; it must still be reported first.
+    envi.save_image(str(hdrs[0]), rng.random((12, 10, 3), dtype=np.float32), dtype=np.float32, force=True)
+    capsys.readouterr()
+    assert phc.process_hsm_capture_dirs(root, clusters=2, max_iter=3, crop_percent=0, workers=2, blas_threads=1) == 0
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("cube_")]
+    assert [line.rsplit("(", 1)[1] for line in lines] == [f"{hdr.name})" for hdr in hdrs]
+    assert ": OK -> " in lines[0]
+    assert lines[1:] == [f"{cube.name}: up to date ({hdr.name})" for hdr in hdrs[1:]]
+
+
+def test_relative_root_reports_and_records_outputs(tmp_path: Path, capsys, monkeypatch) -> None:
+    cube = tmp_path / "HSM_CAPTURE" / "cube_25_03_10_36_04"
+    cube.mkdir(parents=True)
+    hdr = cube / f"{cube.name}_cheese_1.hdr"
+    envi.save_image(str(hdr), np.random.default_rng(4).random((12, 10, 3), dtype=np.float32), dtype=np.float32)
+    monkeypatch.chdir(tmp_path)
+
+    assert phc.process_hsm_capture_dirs(Path("HSM_CAPTURE"), clusters=2, max_iter=3, crop_percent=0) == 0
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("cube_")]
+    rel = Path("detect") / f"{cube.name}_cheese_1_2cluster0p.png"
+    assert lines == [f"{cube.name}: OK -> {rel} ({hdr.name})"]
+
+    assert phc.process_hsm_capture_dirs(Path("HSM_CAPTURE"), clusters=2, max_iter=3, crop_percent=0) == 0
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("cube_")]
+    assert lines == [f"{cube.name}: up to date ({hdr.name})"]
+
+
+def test_warns_when_blas_limit_cannot_reach_forked_workers(monkeypatch, capsys) -> None:
+    real_find_spec = phc.importlib.util.find_spec
+    monkeypatch.setattr(
+        phc.importlib.util, "find_spec", lambda name: None if name == "threadpoolctl" else real_find_spec(name)
+    )
+    monkeypatch.setattr(phc.multiprocessing, "get_start_method", lambda: "fork")
+    phc._warn_if_blas_limit_unsupported()
+    assert "threadpoolctl is not installed" in capsys.readouterr().err
+
+    monkeypatch.setattr(phc.multiprocessing, "get_start_method", lambda: "spawn")
+    phc._warn_if_blas_limit_unsupported()
+    assert capsys.readouterr().err == ""
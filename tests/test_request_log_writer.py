@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+
+import db
+from request_log_writer import RequestLogWriter
+
+
+def test_writer_batches_rows_and_flushes(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	writer = RequestLogWriter(batch_size=3, flush_interval_ms=10_000)
+	for i in range(7):
+		assert writer.submit("GET", f"/p{i}", 200, 1.0, "127.0.0.1", "pytest")
+	assert writer.flush()
+
+	rows = list(db.fetch_logs(limit=20))
+	assert len(rows) == 7
+	stats = writer.stats()
+	assert stats["written"] == 7
+	# Two full batches of 3 + the remainder written by flush().
+	assert stats["batches"] == 3
+	writer.stop()
+
+
+def test_writer_drops_when_queue_full(tmp_db_path, monkeypatch):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	writer = RequestLogWriter(max_queue=2)
+	# Keep the writer thread from draining so the queue stays full.
+	monkeypatch.setattr(writer, "start", lambda: None)
+
+	assert writer.submit("GET", "/a", 200, 1.0, None, None)
+	assert writer.submit("GET", "/b", 200, 1.0, None, None)
+	assert writer.submit("GET", "/c", 200, 1.0, None, None) is False
+	assert writer.stats()["dropped"] == 1
+
+
+def test_stop_flushes_pending_rows(tmp_db_path):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	writer = RequestLogWriter(batch_size=1000, flush_interval_ms=60_000)
+	writer.submit("POST", "/api/setpallet", 200, 2.5, None, None)
+	writer.stop()
+
+	rows = list(db.fetch_logs(limit=5))
+	assert [r[2] for r in rows] == ["/api/setpallet"]
+
+
+def test_stop_with_full_queue_drains_and_joins(tmp_db_path, monkeypatch):
+	db.set_db_path(tmp_db_path)
+	db.init_db()
+
+	writer = RequestLogWriter(max_queue=3, batch_size=2, flush_interval_ms=60_000)
+	real_write = writer._write
+	busy = threading.Event()
+	release = threading.Event()
+
+	def slow_write(batch):
+		busy.set()
+		release.wait(5)
+		real_write(batch)
+
+	monkeypatch.setattr(writer, "_write", slow_write)
+	writer.submit("GET", "/a", 200, 1.0, None, None)
+	writer.submit("GET", "/b", 200, 1.0, None, None)
+	assert busy.wait(5)
+	# The writer is stuck on the first batch while the queue fills up.
+	for i in range(3):
+		assert writer.submit("GET", f"/p{i}", 200, 1.0, None, None)
+	assert writer._queue.full()
+
+	# stop() gives up waiting before the writer is free, but the stop still lands.
+	writer.stop(timeout=0.05)
+	release.set()
+	writer._thread.join(5)
+
+	assert not writer._thread.is_alive()
+	stats = writer.stats()
+	assert stats["queued"] == 0
+	assert stats["written"] == 5
+	assert len(list(db.fetch_logs(limit=50))) == 5
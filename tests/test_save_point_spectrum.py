@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import matplotlib.image as mpimg
+import numpy as np
+import pytest
+import spectral.io.envi as envi
+
+_root = Path(__file__).resolve().parents[1]
+_scripts = _root / "scripts"
+if str(_scripts) not in sys.path:
+    sys.path.insert(0, str(_scripts))
+
+import hsi_cube  # noqa: E402
+import save_point_spectrum_to_ecostress_db as sps  # noqa: E402
+
+
+def _make_db(path: Path) -> Path:
+    con = sqlite3.connect(str(path))
+    con.executescript(
+        """
+        CREATE TABLE Samples (
+            SampleID INTEGER PRIMARY KEY, Name TEXT, Type TEXT, Class TEXT, SubClass TEXT, Description TEXT
+        );
+        CREATE TABLE Spectra (
+            SpectrumID INTEGER PRIMARY KEY, SampleID INTEGER, SensorCalibrationID INTEGER,
+            Instrument TEXT, Environment TEXT, Measurement TEXT, XUnit TEXT, YUnit TEXT,
+            MinWavelength REAL, MaxWavelength REAL, NumValues INTEGER, XData BLOB, YData BLOB
+        );
+        """
+    )
+    con.close()
+    return path
+
+
+@pytest.fixture()
+def cube_data() -> np.ndarray:
+    return np.random.default_rng(0).random((8, 7, 5), dtype=np.float32)
+
+
+@pytest.mark.parametrize("interleave", ["bil", "bip", "bsq"])
+def test_pixels_gathers_unsorted_points(tmp_path: Path, cube_data: np.ndarray, interleave: str) -> None:
+    hdr = tmp_path / "cube.hdr"
+    envi.save_image(str(hdr), cube_data, dtype=np.float32, interleave=interleave, force=True)
+    cube = hsi_cube.open_cube(hdr)
+
+    ys = np.array([7, 0, 3, 3])
+    xs = np.array([6, 1, 2, 2])
+    np.testing.assert_array_equal(cube.pixels(ys, xs), cube_data[ys, xs, :])
+    with pytest.raises(ValueError):
+        cube.pixels(np.array([8]), np.array([0]))
+
+
+def test_save_point_spectra_writes_all_points_in_one_transaction(tmp_path: Path, cube_data: np.ndarray) -> None:
+    hdr = tmp_path / "cube.hdr"
+    envi.save_image(str(hdr), cube_data, dtype=np.float32, interleave="bil", force=True)
+    db_path = _make_db(tmp_path / "eco.db")
+    csv_path = tmp_path / "points.csv"
+    csv_path.write_text("x,y,name\n1,2,first\n6,7,\n", encoding="utf-8")
+
+    points = sps.read_coords_csv(csv_path)
+    assert points == [(1, 2, "first"), (6, 7, None)]
+    ids = sps.save_point_spectra(hdr, db_path, points)
+    assert len(ids) == 2
+
+    con = sqlite3.connect(str(db_path))
+    rows = con.execute(
+        "SELECT s.Name, p.YData FROM Samples s JOIN Spectra p ON p.SampleID = s.SampleID ORDER BY s.SampleID"
+    ).fetchall()
+    con.close()
+    assert [r[0] for r in rows] == ["first", "cube_x6_y7"]
+    np.testing.assert_array_equal(np.frombuffer(rows[0][1], dtype=np.float32), cube_data[2, 1, :])
+    np.testing.assert_array_equal(np.frombuffer(rows[1][1], dtype=np.float32), cube_data[7, 6, :])
+
+
+def test_out_of_bounds_point_saves_nothing(tmp_path: Path, cube_data: np.ndarray) -> None:
+    hdr = tmp_path / "cube.hdr"
+    envi.save_image(str(hdr), cube_data, dtype=np.float32, interleave="bip", force=True)
+    db_path = _make_db(tmp_path / "eco.db")
+
+    with pytest.raises(ValueError):
+        sps.save_point_spectra(hdr, db_path, [(0, 0, None), (99, 0, None)])
+
+    con = sqlite3.connect(str(db_path))
+    assert con.execute("SELECT COUNT(*) FROM Samples").fetchone()[0] == 0
+    con.close()
+
+
+def _two_region_map(tmp_path: Path, cube_data: np.ndarray) -> tuple[Path, np.ndarray]:
+    """Cube plus a two-colour cluster map next to it; returns (map path, defect mask)."""
+    cube_dir = tmp_path / "cube_1"
+    hdr = cube_dir / "cube_1.hdr"
+    cube_dir.mkdir()
+    envi.save_image(str(hdr), cube_data, dtype=np.float32, interleave="bsq", force=True)
+
+    rgb = np.zeros((8, 7, 3), dtype=np.uint8)
+    rgb[:] = (31, 119, 180)
+    defects = np.zeros((8, 7), dtype=bool)
+    defects[2:4, 3:6] = True
+    rgb[defects] = (255, 127, 14)
+    map_path = cube_dir / "detect" / "cube_1_2cluster0p.png"
+    map_path.parent.mkdir()
+    mpimg.imsave(str(map_path), rgb)
+    return map_path, defects
+
+
+def test_two_region_averages_from_cluster_map(tmp_path: Path, cube_data: np.ndarray) -> None:
+    map_path, defects = _two_region_map(tmp_path, cube_data)
+    db_path = _make_db(tmp_path / "eco.db")
+
+    res = sps.save_two_region_averages(map_path=map_path, db_path=db_path)
+    assert res["background_pixels"] == 50
+    assert res["defects_pixels"] == 6
+
+    payload = json.loads(Path(res["json"]).read_text(encoding="utf-8"))
+    np.testing.assert_allclose(payload["regions"]["defects"]["avg_spectrum"], cube_data[defects].mean(axis=0), rtol=1e-5)
+    np.testing.assert_allclose(payload["regions"]["background"]["max_spectrum"], cube_data[~defects].max(axis=0), rtol=1e-6)
+    assert payload["regions"]["background"]["color_rgb"] == [31, 119, 180]
+
+
+def test_two_region_averages_save_both_spectra_or_neither(tmp_path: Path, cube_data: np.ndarray, monkeypatch) -> None:
+    map_path, _defects = _two_region_map(tmp_path, cube_data)
+    db_path = _make_db(tmp_path / "eco.db")
+    real_insert = sps._insert_spectrum
+
+    def fail_on_defects(cur, **rec):
+        if rec["name"].endswith("_defects_avg"):
+            raise sqlite3.OperationalError("disk I/O error")
+        return real_insert(cur, **rec)
+
+    monkeypatch.setattr(sps, "_insert_spectrum", fail_on_defects)
+    with pytest.raises(sqlite3.OperationalError):
+        sps.save_two_region_averages(map_path=map_path, db_path=db_path)
+
+    con = sqlite3.connect(str(db_path))
+    assert con.execute("SELECT COUNT(*) FROM Samples").fetchone()[0] == 0
+    assert con.execute("SELECT COUNT(*) FROM Spectra").fetchone()[0] == 0
+    con.close()
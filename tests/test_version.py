@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import json
+
+import version
+
+
+def test_cached_version_info_computed_once(monkeypatch, tmp_path):
+	calls = []
+
+	def fake_info():
+		calls.append(1)
+		return {"version": f"1.0.{len(calls)}"}
+
+	monkeypatch.setattr(version, "VERSION_FILE", tmp_path / "missing.json")
+	monkeypatch.setattr(version, "get_version_info", fake_info)
+	version.clear_version_cache()
+	try:
+		assert version.get_cached_version_info(ttl_seconds=0)["version"] == "1.0.1"
+		assert version.get_cached_version_info(ttl_seconds=0)["version"] == "1.0.1"
+		assert len(calls) == 1
+
+		# Expired TTL triggers a refresh.
+		assert version.get_cached_version_info(ttl_seconds=1e-9)["version"] == "1.0.2"
+	finally:
+		version.clear_version_cache()
+
+
+def test_cached_version_info_prefers_version_file(monkeypatch, tmp_path):
+	path = tmp_path / "version.json"
+	path.write_text(json.dumps({"version": "9.9.9"}), encoding="utf-8")
+
+	def fail():
+		raise AssertionError("git must not be queried when version file exists")
+
+	monkeypatch.setattr(version, "VERSION_FILE", path)
+	monkeypatch.setattr(version, "get_version_info", fail)
+	version.clear_version_cache()
+	try:
+		assert version.get_cached_version_info()["version"] == "9.9.9"
+	finally:
+		version.clear_version_cache()
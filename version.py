@@ -1,9 +1,22 @@
 import subprocess
 import json
 from datetime import datetime
-from typing import Dict, Any
+from pathlib import Path
+from typing import Dict, Any, Optional
 import os
 import re
+import threading
+import time
+
+
+# Optional build-time snapshot (see `python version.py --write`); used instead of git when present.
+VERSION_FILE = Path(os.getenv("SAVVFASTAPI_VERSION_FILE", str(Path(__file__).resolve().parent / "version.json")))
+# Seconds before cached version info is recomputed (0 = compute once per process).
+VERSION_TTL_SECONDS = float(os.getenv("SAVVFASTAPI_VERSION_TTL_SECONDS", "0") or 0)
+
+_cache_lock = threading.Lock()
+_cached_info: Optional[Dict[str, Any]] = None
+_cached_at = 0.0
 
 
 def get_git_commit_count() -> int:
@@ -126,12 +139,68 @@ def get_version_info() -> Dict[str, Any]:
     """
     git_info = get_git_commit_info()
     commit_count = get_git_commit_count()
+    dirty_suffix = "-dirty" if git_info.get("is_dirty", False) else ""
     
     return {
-        "version": get_auto_increment_version(),
-        "semantic_version": get_semantic_version(),
+        "version": f"1.0.{commit_count}",
+        "semantic_version": f"1.0.{commit_count}{dirty_suffix}",
         "build_date": datetime.now().isoformat(),
         "commit_count": commit_count,
         "git": git_info,
         "api_name": "FastAPI Palette Cheese API"
     }
+
+
+def _load_version_file(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def get_cached_version_info(ttl_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Version info without forking git on every call.
+
+    Prefers the build-time VERSION_FILE; otherwise runs git once and caches the
+    result for `ttl_seconds` (default VERSION_TTL_SECONDS, 0 = forever).
+    """
+    global _cached_info, _cached_at
+    ttl = VERSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+    now = time.monotonic()
+    info = _cached_info
+    if info is not None and (ttl <= 0 or now - _cached_at < ttl):
+        return info
+
+    with _cache_lock:
+        if _cached_info is not None and (ttl <= 0 or time.monotonic() - _cached_at < ttl):
+            return _cached_info
+        info = _load_version_file(VERSION_FILE) or get_version_info()
+        _cached_info = info
+        _cached_at = time.monotonic()
+        return info
+
+
+def clear_version_cache() -> None:
+    global _cached_info
+    with _cache_lock:
+        _cached_info = None
+
+
+def write_version_file(path: Path = VERSION_FILE) -> Dict[str, Any]:
+    """
+    Snapshot git version info into a JSON file (run at build/deploy time).
+    """
+    info = get_version_info()
+    path.write_text(json.dumps(info, indent=2), encoding="utf-8")
+    return info
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print or snapshot API version info.")
+    parser.add_argument("--write", action="store_true", help=f"Write version info to {VERSION_FILE.name}")
+    args = parser.parse_args()
+    data = write_version_file() if args.write else get_version_info()
+    print(json.dumps(data, indent=2))